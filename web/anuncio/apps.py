@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AnuncioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'anuncio'
+
+    def ready(self):
+        from anuncio import signals  # noqa: F401
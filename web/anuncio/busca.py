@@ -0,0 +1,58 @@
+"""
+Busca textual de anúncios.
+
+Ponto de entrada único da busca por palavra-chave da listagem web e da API.
+Usa o vetor ``Anuncio.busca`` (descrição, modelo e marca do veículo), mantido
+por trigger no PostgreSQL com a configuração ``portugues_sem_acento``
+(português com remoção de acentos) e indexado por GIN.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+CONFIGURACAO = 'portugues_sem_acento'
+
+
+def consulta_busca(termo):
+    """
+    Consulta textual do termo, com a sintaxe de buscadores (aspas, ``or``, ``-palavra``)
+
+    Returns:
+        SearchQuery: Consulta aplicável ao vetor ``busca``
+    """
+    return SearchQuery(termo, config=CONFIGURACAO, search_type='websearch')
+
+
+def buscar_anuncios(queryset, termo):
+    """
+    Filtra os anúncios que correspondem ao termo e anota a relevância.
+
+    O termo aceita a sintaxe de buscadores (aspas, ``or``, ``-palavra``).
+
+    Returns:
+        QuerySet: Anúncios encontrados, com a anotação ``relevancia``
+    """
+    consulta = consulta_busca(termo)
+    return queryset.filter(busca=consulta).annotate(
+        relevancia=SearchRank(F('busca'), consulta)
+    )
+
+
+class BuscaAnunciosFilter(BaseFilterBackend):
+    """
+    Filtro do DRF que aplica a busca textual pelo parâmetro ``search``.
+
+    Sem ordenação explícita na requisição, os resultados saem por relevância;
+    por isso deve vir depois do OrderingFilter em ``filter_backends``.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        termo = request.query_params.get(self.search_param, '').strip()
+        if not termo:
+            return queryset
+        queryset = buscar_anuncios(queryset, termo)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-relevancia', '-created_at')
+        return queryset
@@ -0,0 +1,133 @@
+"""
+Cache das páginas públicas da listagem de anúncios.
+
+Para visitantes anônimos a página de ``ListarAnuncios`` depende apenas dos
+filtros e do número da página, então o HTML renderizado é guardado no cache
+compartilhado (``CACHES``) com uma chave formada por:
+
+* a geração atual da listagem;
+* os filtros normalizados da view (``ListarAnuncios.filtros``), de modo que
+  URLs equivalentes ou com parâmetros desconhecidos usam a mesma entrada;
+* o número da página e a data atual (``ativos()`` depende do dia).
+
+As facetas da listagem (``anuncio.facetas``) usam a mesma geração e validade.
+
+Salvar ou apagar um ``Anuncio`` ou ``Veiculo`` incrementa a geração
+(``anuncio.signals``), o que torna todas as entradas anteriores inalcançáveis
+sem precisar apagá-las; elas expiram pela validade
+(``ANUNCIO_LISTAGEM_CACHE_VALIDADE``, 0 desliga o cache). A importação de
+veículos também (sinal ``veiculos_importados``); atualizações em lote que não
+disparam sinais chamam ``invalidar()`` diretamente.
+"""
+import hashlib
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+CHAVE_GERACAO = 'anuncio:listagem:geracao'
+
+
+def validade():
+    return getattr(settings, 'ANUNCIO_LISTAGEM_CACHE_VALIDADE', 300)
+
+
+def geracao():
+    """
+    Returns:
+        int: Geração atual das páginas em cache (criada na primeira leitura)
+    """
+    return cache.get_or_set(CHAVE_GERACAO, time.time_ns, None)
+
+
+def _incrementar():
+    try:
+        cache.incr(CHAVE_GERACAO)
+    except ValueError:
+        # Chave ausente (cache reiniciado ou despejado): qualquer valor novo serve
+        cache.set(CHAVE_GERACAO, time.time_ns(), None)
+
+
+def invalidar():
+    """
+    Descarta todas as páginas em cache passando para uma nova geração
+    """
+    _incrementar()
+    # De novo após o commit: uma leitura concorrente pode ter guardado a página
+    # antiga antes da transação terminar
+    transaction.on_commit(_incrementar)
+
+
+def _chave(prefixo, *partes):
+    dados = json.dumps([*partes, timezone.localdate().isoformat()], sort_keys=True)
+    return '{}:{}:{}'.format(prefixo, geracao(), hashlib.md5(dados.encode('utf-8')).hexdigest())
+
+
+def chave_pagina(filtros, pagina):
+    """
+    Args:
+        filtros (dict): Filtros normalizados da listagem
+        pagina (str): Número da página pedido na URL
+
+    Returns:
+        str: Chave da página no cache, ou None com o cache desligado
+    """
+    if validade() <= 0:
+        return None
+    return _chave('anuncio:listagem', filtros, str(pagina).strip())
+
+
+def chave_facetas(filtros):
+    """
+    Returns:
+        str: Chave das facetas dos filtros no cache, ou None com o cache desligado
+    """
+    if validade() <= 0:
+        return None
+    # A ordem não muda as contagens
+    return _chave('anuncio:facetas', {nome: valor for nome, valor in filtros.items() if nome != 'ordem'})
+
+
+def obter_pagina(chave):
+    """
+    Returns:
+        HttpResponse: Página guardada, ou None se não estiver em cache
+    """
+    guardada = cache.get(chave)
+    if guardada is None:
+        return None
+    conteudo, tipo = guardada
+    resposta = HttpResponse(conteudo, content_type=tipo)
+    patch_vary_headers(resposta, ('Cookie',))
+    return resposta
+
+
+def guardar_pagina(chave, resposta):
+    """
+    Guarda o conteúdo renderizado de uma resposta bem-sucedida
+    """
+    if resposta.status_code != 200:
+        return
+    cache.set(chave, (resposta.content, resposta['Content-Type']), validade())
+    patch_vary_headers(resposta, ('Cookie',))
+
+
+def normalizar_preco(valor):
+    """
+    Returns:
+        str: Preço normalizado (``'50000'`` e ``'50000.00'`` são iguais), ou
+        vazio se ausente ou inválido
+    """
+    try:
+        preco = Decimal((valor or '').strip().replace(',', '.'))
+    except InvalidOperation:
+        return ''
+    if not preco.is_finite() or preco < 0:
+        return ''
+    return '{:f}'.format(preco.normalize())
@@ -0,0 +1,151 @@
+"""
+Contador de visualizações com escrita adiada (write-behind).
+
+Cada visualização é acumulada em um buffer do processo e o total é gravado
+periodicamente com um único UPDATE por descarga::
+
+    UPDATE anuncio_anuncio
+       SET visualizacoes = visualizacoes + CASE id WHEN ... THEN delta ... END
+     WHERE id IN (...)
+
+O incremento é feito pelo banco, então não há perda de visualizações entre
+processos concorrentes. Configurações:
+
+* ``ANUNCIO_VISUALIZACOES_MODO``: ``'buffer'`` (padrão) ou ``'sincrono'``, que
+  grava cada visualização imediatamente (útil nos testes);
+* ``ANUNCIO_VISUALIZACOES_INTERVALO``: segundos entre descargas automáticas.
+  Com valor menor ou igual a zero a descarga só ocorre ao chamar
+  ``descarregar()`` ou no encerramento do processo.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, Value, When
+
+from anuncio.models import Anuncio
+
+logger = logging.getLogger('anuncio')
+
+MODO_BUFFER = 'buffer'
+MODO_SINCRONO = 'sincrono'
+
+
+class ContadorVisualizacoes:
+    """
+    Buffer de visualizações por anúncio, descarregado em lote no banco
+    """
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._pendentes = Counter()
+        self._thread = None
+        self._pid = os.getpid()
+        self.descarregadas = 0
+        self.descargas = 0
+
+    @property
+    def modo(self):
+        return getattr(settings, 'ANUNCIO_VISUALIZACOES_MODO', MODO_BUFFER)
+
+    @property
+    def intervalo(self):
+        return getattr(settings, 'ANUNCIO_VISUALIZACOES_INTERVALO', 10)
+
+    def registrar(self, pk, quantidade=1):
+        """
+        Registra visualizações de um anúncio
+        """
+        if self.modo == MODO_SINCRONO:
+            self.gravar({pk: quantidade})
+            return
+
+        with self._trava:
+            self._verificar_fork()
+            self._pendentes[pk] += quantidade
+        self._iniciar_descarga_periodica()
+
+    def descarregar(self):
+        """
+        Grava no banco todas as visualizações pendentes
+
+        Returns:
+            int: Quantidade de visualizações gravadas
+        """
+        with self._trava:
+            self._verificar_fork()
+            pendentes, self._pendentes = self._pendentes, Counter()
+        if not pendentes:
+            return 0
+
+        try:
+            return self.gravar(pendentes)
+        except Exception:
+            logger.exception('Falha ao gravar visualizações; elas voltam para o buffer')
+            with self._trava:
+                self._pendentes.update(pendentes)
+            return 0
+
+    def gravar(self, deltas):
+        """
+        Soma os deltas às visualizações dos anúncios em um único UPDATE
+        """
+        Anuncio.objects.filter(pk__in=list(deltas)).update(
+            visualizacoes=F('visualizacoes') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                default=Value(0)
+            )
+        )
+        total = sum(deltas.values())
+        with self._trava:
+            self.descarregadas += total
+            self.descargas += 1
+        return total
+
+    def metricas(self):
+        """
+        Retorna as métricas do contador neste processo
+
+        Returns:
+            dict: Visualizações pendentes, anúncios pendentes, visualizações
+            descarregadas e número de descargas
+        """
+        with self._trava:
+            return {
+                'pendentes': sum(self._pendentes.values()),
+                'anuncios_pendentes': len(self._pendentes),
+                'descarregadas': self.descarregadas,
+                'descargas': self.descargas,
+            }
+
+    def _verificar_fork(self):
+        # Um processo filho (fork do servidor de aplicação) não herda a thread
+        # de descarga e não deve gravar o buffer copiado do processo pai.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pendentes = Counter()
+            self._thread = None
+
+    def _iniciar_descarga_periodica(self):
+        if self.intervalo <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        with self._trava:
+            if self._thread and self._thread.is_alive():
+                return
+            self._parar = threading.Event()
+            self._thread = threading.Thread(
+                target=self._descarga_periodica, name='contador-visualizacoes', daemon=True
+            )
+            self._thread.start()
+
+    def _descarga_periodica(self):
+        while not self._parar.wait(self.intervalo):
+            close_old_connections()
+            self.descarregar()
+
+
+contador_visualizacoes = ContadorVisualizacoes()
+atexit.register(contador_visualizacoes.descarregar)
@@ -0,0 +1,70 @@
+"""
+Estatísticas de mercado dos anúncios.
+
+As agregações ficam em visões materializadas (migração
+``0005_estatisticas``), lidas pelos modelos não gerenciados
+``EstatisticaPreco`` e ``OfertaDiaria``:
+
+* ``anuncio_estatistica_preco``: percentis 10, 50 e 90 do preço, preço médio,
+  quantidade e quilometragem média dos anúncios ativos por marca, modelo e ano;
+* ``anuncio_oferta_diaria``: anúncios publicados por dia e marca, nos últimos
+  90 dias, e quantos deles continuam ativos.
+
+As consultas de preço (API, página de detalhe) leem uma linha pronta, sem
+agregar por requisição. Os números valem para o momento da última
+atualização (``calculado_em``); ``atualizar()`` as recalcula e é chamada pelo
+comando ``atualizar_estatisticas``, agendado como a expiração. A atualização
+é concorrente: as leituras continuam com os dados anteriores enquanto ela roda.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from anuncio.models import EstatisticaPreco
+
+VISOES = ('anuncio_estatistica_preco', 'anuncio_oferta_diaria')
+
+
+def minimo_amostra():
+    return getattr(settings, 'ANUNCIO_ESTATISTICAS_MINIMO', 3)
+
+
+def chave_modelo(modelo):
+    """
+    Returns:
+        str: Modelo como agrupado na visão (minúsculas, sem espaços nas pontas)
+    """
+    return modelo.strip(' ').lower()
+
+
+def atualizar(concorrente=True, using='default'):
+    """
+    Recalcula as visões materializadas
+
+    Args:
+        concorrente (bool): Mantém as visões legíveis durante a atualização
+            (mais lento; exige que a visão já tenha sido preenchida)
+
+    Returns:
+        dict: Visão → segundos gastos
+    """
+    tempos = {}
+    with connections[using].cursor() as cursor:
+        for visao in VISOES:
+            inicio = time.monotonic()
+            cursor.execute('REFRESH MATERIALIZED VIEW {}{}'.format('CONCURRENTLY ' if concorrente else '', visao))
+            tempos[visao] = time.monotonic() - inicio
+    return tempos
+
+
+def preco_mercado(veiculo):
+    """
+    Returns:
+        EstatisticaPreco: Preços dos anúncios ativos do mesmo modelo e ano, ou
+        None se houver menos de ``ANUNCIO_ESTATISTICAS_MINIMO`` anúncios
+    """
+    return EstatisticaPreco.objects.filter(
+        marca=veiculo.marca, modelo=chave_modelo(veiculo.modelo), ano=veiculo.ano,
+        quantidade__gte=minimo_amostra(),
+    ).first()
@@ -0,0 +1,67 @@
+"""
+Motor de expiração de anúncios.
+
+Marca como EXPIRADO os anúncios ativos cuja data de expiração já passou. A
+varredura roda fora do ciclo das requisições (comando ``expirar_anuncios``)
+em lotes limitados, para não segurar bloqueios de linha por muito tempo.
+Entre uma varredura e outra as listagens escondem os anúncios vencidos com
+``Anuncio.objects.ativos()``.
+"""
+from django.db import transaction
+from django.db.models import Subquery
+from django.utils import timezone
+
+from anuncio.cache_listagem import invalidar
+from anuncio.models import Anuncio, StatusAnuncio
+
+LOTE_PADRAO = 1000
+
+
+def selecionar_lote(lote=LOTE_PADRAO, hoje=None, pks=None):
+    """
+    Consulta dos ids do próximo lote da varredura, bloqueados para atualização
+
+    Returns:
+        QuerySet: Até ``lote`` ids de anúncios vencidos, sem os bloqueados
+        por outras transações
+    """
+    alvos = Anuncio.objects.vencidos(hoje).order_by()
+    if pks is not None:
+        alvos = alvos.filter(pk__in=pks)
+    return alvos.select_for_update(skip_locked=True).values('pk')[:lote]
+
+
+def expirar_anuncios(lote=LOTE_PADRAO, hoje=None, pks=None, max_lotes=None):
+    """
+    Expira anúncios vencidos em lotes de até ``lote`` linhas.
+
+    Cada lote é uma transação própria que seleciona os alvos pelo índice parcial
+    ``anuncio_expiracao_ativo_idx`` e ignora linhas bloqueadas por outras
+    transações (elas ficam para a próxima varredura).
+
+    Args:
+        lote (int): Quantidade máxima de anúncios por lote
+        hoje (date): Data de referência, por padrão a data atual
+        pks (list): Restringe a varredura a estes anúncios
+        max_lotes (int): Limite de lotes nesta execução
+
+    Returns:
+        int: Quantidade de anúncios expirados
+    """
+    total = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        with transaction.atomic():
+            ids = selecionar_lote(lote, hoje, pks)
+            quantidade = Anuncio.objects.filter(pk__in=Subquery(ids)).update(
+                status=StatusAnuncio.EXPIRADO,
+                updated_at=timezone.now()
+            )
+        total += quantidade
+        lotes += 1
+        if quantidade < lote:
+            break
+    if total:
+        # O update() em lote não dispara sinais
+        invalidar()
+    return total
@@ -0,0 +1,145 @@
+"""
+Facetas da listagem de anúncios: quantos anúncios cada opção de filtro traria.
+
+Para os filtros atuais (``anuncio.filtros``), conta os anúncios por marca,
+combustível, faixa de ano, faixa de preço e status. Como esperado em filtros
+facetados, cada dimensão é contada sem a sua própria condição: com
+``marca=fiat``, a faceta de marca mostra quantos anúncios cada marca teria
+com os demais filtros, e as outras facetas já consideram a Fiat.
+
+Todas as contagens saem de uma única consulta na tabela de leitura da
+listagem (``anuncio.listagem``), com um ``COUNT(*) FILTER (WHERE ...)`` por
+opção, e ficam no cache pela chave dos filtros normalizados, com a geração e
+a validade das páginas da listagem (``anuncio.cache_listagem``).
+
+As faixas devolvem os parâmetros que as selecionam na listagem
+(``ano_min``/``ano_max`` e ``preco_min``/``preco_max``).
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from anuncio.busca import consulta_busca
+from anuncio.cache_listagem import chave_facetas, validade
+from anuncio.filtros import condicoes
+from anuncio.listagem import na_listagem
+from anuncio.models import ListagemAnuncio, StatusAnuncio, filtro_status
+from veiculo.catalogo import COMBUSTIVEIS, MARCAS
+
+# (valor, rótulo, mínimo, máximo), limites inclusivos
+FAIXAS_ANO = (
+    ('ate-2004', 'Até 2004', None, 2004),
+    ('2005-2009', '2005 a 2009', 2005, 2009),
+    ('2010-2014', '2010 a 2014', 2010, 2014),
+    ('2015-2019', '2015 a 2019', 2015, 2019),
+    ('2020-', '2020 ou mais novo', 2020, None),
+)
+
+FAIXAS_PRECO = (
+    ('ate-20000', 'Até R$ 20 mil', None, Decimal('19999.99')),
+    ('20000-40000', 'R$ 20 mil a R$ 40 mil', Decimal('20000'), Decimal('39999.99')),
+    ('40000-70000', 'R$ 40 mil a R$ 70 mil', Decimal('40000'), Decimal('69999.99')),
+    ('70000-120000', 'R$ 70 mil a R$ 120 mil', Decimal('70000'), Decimal('119999.99')),
+    ('120000-', 'Acima de R$ 120 mil', Decimal('120000'), None),
+)
+
+
+def condicao_faixa(campo, minimo, maximo):
+    condicao = Q()
+    if minimo is not None:
+        condicao &= Q(**{campo + '__gte': minimo})
+    if maximo is not None:
+        condicao &= Q(**{campo + '__lte': maximo})
+    return condicao
+
+
+def opcoes_facetas(hoje=None):
+    """
+    Returns:
+        dict: Dimensão → lista de pares (opção, condição), em que a opção é o
+        dicionário devolvido pela API, ainda sem o total
+    """
+    return {
+        'marca': [
+            ({'valor': valor, 'rotulo': rotulo}, Q(veiculo__marca=valor)) for valor, rotulo in MARCAS.opcoes
+        ],
+        'combustivel': [
+            ({'valor': valor, 'rotulo': rotulo}, Q(veiculo__combustivel=valor))
+            for valor, rotulo in COMBUSTIVEIS.opcoes
+        ],
+        'ano': [
+            ({'valor': valor, 'rotulo': rotulo, 'ano_min': minimo, 'ano_max': maximo},
+             condicao_faixa('veiculo__ano', minimo, maximo))
+            for valor, rotulo, minimo, maximo in FAIXAS_ANO
+        ],
+        'preco': [
+            ({'valor': valor, 'rotulo': rotulo,
+              'preco_min': None if minimo is None else str(minimo),
+              'preco_max': None if maximo is None else str(maximo)},
+             condicao_faixa('preco', minimo, maximo))
+            for valor, rotulo, minimo, maximo in FAIXAS_PRECO
+        ],
+        'status': [
+            ({'valor': valor, 'rotulo': str(rotulo)}, filtro_status(valor, hoje))
+            for valor, rotulo in StatusAnuncio.choices
+        ],
+    }
+
+
+def calcular_facetas(filtros, hoje=None):
+    """
+    Conta os anúncios de cada opção com uma única consulta
+
+    Args:
+        filtros (dict): Filtros normalizados (``anuncio.filtros.ler_filtros``)
+
+    Returns:
+        dict: ``total`` (anúncios com todos os filtros) e ``facetas``
+        (dimensão → opções com ``total``)
+    """
+    # Contagem na tabela de leitura da listagem, sem join com o veículo
+    queryset = ListagemAnuncio.objects.all()
+    if filtros['keyword']:
+        queryset = queryset.filter(anuncio__busca=consulta_busca(filtros['keyword']))
+
+    ativas = {dimensao: na_listagem(condicao, '') for dimensao, condicao in condicoes(filtros, hoje).items()}
+    opcoes = {
+        dimensao: [(opcao, na_listagem(condicao, '')) for opcao, condicao in pares]
+        for dimensao, pares in opcoes_facetas(hoje).items()
+    }
+    agregados = {'total': Count('pk', filter=Q(*ativas.values()))}
+    for dimensao, pares in opcoes.items():
+        # A faceta não se filtra pela própria dimensão
+        outras = Q(*[condicao for nome, condicao in ativas.items() if nome != dimensao])
+        for indice, (_, condicao) in enumerate(pares):
+            agregados['{}_{}'.format(dimensao, indice)] = Count('pk', filter=outras & condicao)
+    totais = queryset.aggregate(**agregados)
+
+    return {
+        'total': totais['total'],
+        'facetas': {
+            dimensao: [
+                dict(opcao, total=totais['{}_{}'.format(dimensao, indice)])
+                for indice, (opcao, _) in enumerate(pares)
+            ]
+            for dimensao, pares in opcoes.items()
+        },
+    }
+
+
+def obter_facetas(filtros):
+    """
+    Facetas dos filtros, do cache quando possível
+
+    Returns:
+        dict: Ver ``calcular_facetas``
+    """
+    chave = chave_facetas(filtros)
+    if chave is None:
+        return calcular_facetas(filtros)
+    facetas = cache.get(chave)
+    if facetas is None:
+        facetas = calcular_facetas(filtros)
+        cache.set(chave, facetas, validade())
+    return facetas
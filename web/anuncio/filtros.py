@@ -0,0 +1,83 @@
+"""
+Filtros da listagem pública de anúncios.
+
+Usados por ``ListarAnuncios`` e pelas facetas (``anuncio.facetas``). Os
+parâmetros da URL são normalizados por ``ler_filtros``, de modo que URLs
+equivalentes levam ao mesmo filtro (e à mesma chave de cache), e cada
+dimensão filtrável vira uma condição separada em ``condicoes``: as facetas
+contam cada dimensão sem a sua própria condição.
+"""
+from django.db.models import Q
+
+from anuncio.cache_listagem import normalizar_preco
+from anuncio.models import StatusAnuncio, filtro_status
+from veiculo.catalogo import COMBUSTIVEIS, MARCAS
+
+
+def normalizar_ano(valor):
+    """
+    Returns:
+        str: Ano sem zeros à esquerda, ou vazio se ausente ou inválido
+    """
+    valor = (valor or '').strip()
+    if not valor.isdigit() or int(valor) > 9999:
+        return ''
+    return str(int(valor))
+
+
+def ler_filtros(parametros):
+    """
+    Filtros da URL normalizados: valores inválidos são descartados
+
+    Returns:
+        dict: keyword, status, preco_min, preco_max, marca, combustivel,
+        ano_min, ano_max e ordem
+    """
+    status = parametros.get('status', '')
+    ordem = parametros.get('ordem')
+    if ordem is not None and ordem not in ('preco', '-preco'):
+        ordem = '-created_at'
+
+    return {
+        'keyword': ' '.join(parametros.get('keyword', '').split()),
+        'status': status if status in StatusAnuncio.values else '',
+        'preco_min': normalizar_preco(parametros.get('preco_min')),
+        'preco_max': normalizar_preco(parametros.get('preco_max')),
+        'marca': ' '.join(parametros.get('marca', '').split()),
+        'combustivel': ' '.join(parametros.get('combustivel', '').split()),
+        'ano_min': normalizar_ano(parametros.get('ano_min')),
+        'ano_max': normalizar_ano(parametros.get('ano_max')),
+        # Vazio: ordem não escolhida (relevância, se houver busca)
+        'ordem': ordem or '',
+    }
+
+
+def condicoes(filtros, hoje=None):
+    """
+    Condições dos filtros por dimensão (a busca textual fica de fora)
+
+    Returns:
+        dict: Dimensão (status, preco, marca, combustivel, ano) → Q
+    """
+    # Por padrão, apenas anúncios ativos
+    resultado = {'status': filtro_status(filtros['status'] or StatusAnuncio.ATIVO, hoje)}
+
+    preco = Q()
+    if filtros['preco_min']:
+        preco &= Q(preco__gte=filtros['preco_min'])
+    if filtros['preco_max']:
+        preco &= Q(preco__lte=filtros['preco_max'])
+    resultado['preco'] = preco
+
+    resultado['marca'] = Q(veiculo__marca__in=MARCAS.resolver(filtros['marca'])) if filtros['marca'] else Q()
+    resultado['combustivel'] = (
+        Q(veiculo__combustivel__in=COMBUSTIVEIS.resolver(filtros['combustivel'])) if filtros['combustivel'] else Q()
+    )
+
+    ano = Q()
+    if filtros['ano_min']:
+        ano &= Q(veiculo__ano__gte=int(filtros['ano_min']))
+    if filtros['ano_max']:
+        ano &= Q(veiculo__ano__lte=int(filtros['ano_max']))
+    resultado['ano'] = ano
+    return resultado
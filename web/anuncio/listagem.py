@@ -0,0 +1,116 @@
+"""
+Tabela de leitura das listagens de anúncios.
+
+``ListagemAnuncio`` guarda, por anúncio, as colunas filtradas e ordenadas nas
+listagens (status, validade, destaque, preço, data de criação e os dados do
+veículo: marca, modelo, ano, quilometragem, combustível e foto). Filtrar por
+``veiculo__marca`` e ordenar por ``preco`` na tabela de anúncios exige o join
+com ``veiculo_veiculo`` antes da ordenação; na listagem o mesmo filtro e a
+mesma ordem saem de um único índice (parcial, dos anúncios ativos).
+
+As linhas são gravadas por triggers (migração ``0006_listagem``), na mesma
+transação das gravações de ``Anuncio`` e ``Veiculo``, inclusive atualizações
+em lote como a varredura de expiração. ``reconstruir()`` refaz a tabela a
+partir das tabelas de origem e é chamada pelo comando ``reconstruir_listagem``.
+
+As views continuam consultando ``Anuncio`` e filtram pela relação
+``listagem``: ``na_listagem`` traduz as condições de ``anuncio.filtros`` e de
+``anuncio.models`` para as colunas da listagem.
+"""
+from django.db import connections, transaction
+from django.db.models import Q
+from rest_framework.filters import OrderingFilter
+
+from anuncio.models import ListagemAnuncio
+
+# Caminho a partir de Anuncio → coluna da listagem
+CAMPOS = {
+    'status': 'status',
+    'data_expiracao': 'data_expiracao',
+    'destaque': 'destaque',
+    'preco': 'preco',
+    'usuario_id': 'usuario_id',
+    'created_at': 'created_at',
+    'veiculo__marca': 'marca',
+    'veiculo__modelo': 'modelo',
+    'veiculo__ano': 'ano',
+    'veiculo__quilometragem': 'quilometragem',
+    'veiculo__combustivel': 'combustivel',
+}
+
+
+def campo_listagem(caminho, prefixo='listagem__'):
+    """
+    Traduz um caminho de consulta de Anuncio (com ou sem lookup)
+
+    Args:
+        caminho (str): Ex.: ``veiculo__marca__in``
+        prefixo (str): Caminho até a listagem; vazio para consultar
+            ``ListagemAnuncio`` diretamente
+
+    Returns:
+        str: Ex.: ``listagem__marca__in``
+    """
+    for origem, coluna in CAMPOS.items():
+        if caminho == origem or caminho.startswith(origem + '__'):
+            return prefixo + coluna + caminho[len(origem):]
+    raise ValueError('Campo fora da listagem de anúncios: {}'.format(caminho))
+
+
+def na_listagem(condicao, prefixo='listagem__'):
+    """
+    Reescreve uma condição sobre Anuncio para as colunas da listagem
+
+    Returns:
+        Q: Mesma condição, com os campos traduzidos por ``campo_listagem``
+    """
+    filhos = [
+        na_listagem(filho, prefixo) if isinstance(filho, Q) else (campo_listagem(filho[0], prefixo), filho[1])
+        for filho in condicao.children
+    ]
+    return Q(*filhos, _connector=condicao.connector, _negated=condicao.negated)
+
+
+def ordem_listagem(*campos):
+    """
+    Returns:
+        list: Ordenação equivalente sobre a listagem, ex.: ``-preco`` →
+        ``-listagem__preco``; campos fora da listagem ficam como estão
+    """
+    traduzidos = []
+    for campo in campos:
+        sinal, nome = ('-', campo[1:]) if campo.startswith('-') else ('', campo)
+        traduzidos.append(sinal + campo_listagem(nome) if nome in CAMPOS else campo)
+    return traduzidos
+
+
+class OrdenacaoListagemFilter(OrderingFilter):
+    """
+    ``OrderingFilter`` que ordena pelas colunas da listagem quando possível.
+
+    Os nomes aceitos em ``ordering`` continuam os da view (``preco``,
+    ``created_at``); o resultado é o mesmo, mas filtro e ordem usam os índices
+    da listagem.
+    """
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if ordering:
+            return queryset.order_by(*ordem_listagem(*ordering))
+        return queryset
+
+
+def reconstruir(using='default'):
+    """
+    Refaz a listagem a partir de anúncios e veículos
+
+    A tabela fica bloqueada até o fim: gravações de anúncios esperam e são
+    aplicadas sobre a tabela nova.
+
+    Returns:
+        int: Quantidade de linhas gravadas
+    """
+    colunas = ', '.join(campo.column for campo in ListagemAnuncio._meta.concrete_fields)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute('TRUNCATE anuncio_listagem')
+        cursor.execute('INSERT INTO anuncio_listagem ({0}) SELECT {0} FROM anuncio_listagem_origem'.format(colunas))
+        return cursor.rowcount
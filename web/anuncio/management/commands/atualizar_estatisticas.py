@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from anuncio.estatisticas import atualizar
+
+
+class Command(BaseCommand):
+    """
+    Atualiza as visões materializadas das estatísticas de mercado.
+
+    Pode ser agendado (cron, systemd timer) ou rodar como worker com --continuo.
+    """
+    help = 'Recalcula as estatísticas de preço e de oferta dos anúncios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bloqueante', action='store_true',
+                            help='Atualiza sem CONCURRENTLY (mais rápido, mas bloqueia as leituras)')
+        parser.add_argument('--continuo', action='store_true',
+                            help='Mantém o processo rodando e repete a atualização')
+        parser.add_argument('--intervalo', type=int, default=3600,
+                            help='Segundos entre atualizações no modo contínuo')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                tempos = atualizar(concorrente=not options['bloqueante'])
+                for visao, segundos in tempos.items():
+                    self.stdout.write('{} atualizada em {:.2f}s'.format(visao, segundos))
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Atualização interrompida.')
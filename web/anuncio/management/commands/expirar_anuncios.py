@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from anuncio.expiracao import LOTE_PADRAO, expirar_anuncios
+
+
+class Command(BaseCommand):
+    """
+    Expira anúncios vencidos em lotes.
+
+    Pode ser agendado (cron, systemd timer) ou rodar como worker com --continuo.
+    """
+    help = 'Marca como expirados os anúncios ativos com data de expiração vencida'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_PADRAO,
+                            help='Quantidade máxima de anúncios por lote')
+        parser.add_argument('--max-lotes', type=int, default=None,
+                            help='Limite de lotes por varredura')
+        parser.add_argument('--continuo', action='store_true',
+                            help='Mantém o processo rodando e repete a varredura')
+        parser.add_argument('--intervalo', type=int, default=300,
+                            help='Segundos entre varreduras no modo contínuo')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                inicio = time.monotonic()
+                total = expirar_anuncios(lote=options['lote'], max_lotes=options['max_lotes'])
+                self.stdout.write(
+                    '{} anúncio(s) expirado(s) em {:.2f}s'.format(total, time.monotonic() - inicio)
+                )
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Varredura interrompida.')
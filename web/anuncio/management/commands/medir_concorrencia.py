@@ -0,0 +1,188 @@
+import asyncio
+import io
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from anuncio.models import Anuncio, StatusAnuncio
+from sistema.assincrono import recarregar_urls
+from veiculo.models import Veiculo
+
+MODULOS_URLS = ('anuncio.urls', 'veiculo.urls')
+
+
+class Command(BaseCommand):
+    """
+    Compara a capacidade da API com clientes lentos no WSGI síncrono e no
+    ASGI com as views assíncronas (``API_ASSINCRONA``).
+
+    Os dois servidores rodam no próprio processo, sem rede: o WSGI com um
+    número fixo de threads (como os workers síncronos do gunicorn) e o ASGI em
+    um único loop de eventos. Cada cliente espera ``--latencia`` segundos antes
+    de receber a resposta e lê o corpo a ``--taxa`` bytes/s, simulando uma rede
+    móvel; no WSGI a thread fica presa durante a entrega, no ASGI não.
+
+    Os anúncios, o usuário e o token são gravados no banco (as requisições
+    usam outras conexões) e apagados no fim. Durante a medição as conexões não
+    são persistentes, como no perfil de ``sistema/asgi.py``.
+    """
+    help = 'Mede vazão e latência da API com clientes lentos, no WSGI e no ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/anuncio/api/',
+                            help='Caminho pedido pelos clientes')
+        parser.add_argument('--clientes', type=int, default=50,
+                            help='Clientes simultâneos')
+        parser.add_argument('--requisicoes', type=int, default=4,
+                            help='Requisições por cliente')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Threads do servidor WSGI')
+        parser.add_argument('--latencia', type=float, default=0.5,
+                            help='Segundos até o cliente começar a receber a resposta')
+        parser.add_argument('--taxa', type=int, default=256 * 1024,
+                            help='Bytes por segundo lidos por cliente (0 sem limite)')
+        parser.add_argument('--anuncios', type=int, default=50,
+                            help='Anúncios gerados para a medição')
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1 or options['requisicoes'] < 1 or options['threads'] < 1:
+            raise CommandError('--clientes, --requisicoes e --threads devem ser positivos.')
+        self.options = options
+        usuario, veiculos = self.gerar(options['anuncios'])
+        configuracao = connections.settings['default']
+        max_age = configuracao['CONN_MAX_AGE']
+        configuracao['CONN_MAX_AGE'] = 0
+        try:
+            self.token = Token.objects.create(user=usuario).key
+            self.stdout.write('{:<6} {:>10} {:>10} {:>10} {:>6}'.format('modo', 'req/s', 'p50', 'p95', 'erros'))
+            with override_settings(API_ASSINCRONA=False):
+                recarregar_urls(*MODULOS_URLS)
+                self.relatar('wsgi', *self.medir_wsgi())
+            with override_settings(API_ASSINCRONA=True):
+                recarregar_urls(*MODULOS_URLS)
+                self.relatar('asgi', *asyncio.run(self.medir_asgi()))
+        finally:
+            configuracao['CONN_MAX_AGE'] = max_age
+            recarregar_urls(*MODULOS_URLS)
+            Anuncio.objects.filter(usuario=usuario).delete()
+            Veiculo.objects.filter(pk__in=veiculos).delete()
+            usuario.delete()
+
+    def gerar(self, quantidade):
+        usuario = User.objects.create_user(username='medir_concorrencia_{}'.format(random.randint(0, 10 ** 9)))
+        veiculos = Veiculo.objects.bulk_create([
+            Veiculo(marca=3, modelo='Modelo {}'.format(numero), ano=2020, cor=1, combustivel=3,
+                    quilometragem=random.randint(0, 300000))
+            for numero in range(quantidade)
+        ])
+        Anuncio.objects.bulk_create([
+            Anuncio(descricao='Anúncio {}'.format(veiculo.modelo),
+                    preco=Decimal(random.randint(500000, 20000000)) / 100,
+                    status=StatusAnuncio.ATIVO, veiculo=veiculo, usuario=usuario)
+            for veiculo in veiculos
+        ])
+        return usuario, [veiculo.pk for veiculo in veiculos]
+
+    def atraso(self, tamanho):
+        taxa = self.options['taxa']
+        return tamanho / taxa if taxa > 0 else 0
+
+    def relatar(self, modo, tempos, erros, duracao):
+        percentis = statistics.quantiles(tempos, n=20) if len(tempos) > 1 else tempos * 19
+        self.stdout.write('{:<6} {:>10.1f} {:>8.0f}ms {:>8.0f}ms {:>6}'.format(
+            modo, len(tempos) / duracao, statistics.median(tempos) * 1000, percentis[18] * 1000, erros
+        ))
+
+    def medir_wsgi(self):
+        handler = WSGIHandler()
+        caminho, _, consulta = self.options['url'].partition('?')
+
+        # Cada thread do servidor atende uma requisição por vez, até o fim da entrega
+        servidor = threading.BoundedSemaphore(self.options['threads'])
+
+        def requisicao():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': caminho, 'QUERY_STRING': consulta,
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_AUTHORIZATION': 'Token {}'.format(self.token),
+                'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': io.StringIO(),
+            }
+            status = []
+            inicio = time.perf_counter()
+            with servidor:
+                corpo = handler(environ, lambda linha, cabecalhos, exc_info=None: status.append(linha))
+                try:
+                    time.sleep(self.options['latencia'])
+                    for bloco in corpo:
+                        time.sleep(self.atraso(len(bloco)))
+                finally:
+                    corpo.close()
+            return time.perf_counter() - inicio, not status[0].startswith('200')
+
+        def cliente():
+            return [requisicao() for _ in range(self.options['requisicoes'])]
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options['clientes']) as executor:
+            resultados = list(executor.map(lambda _: cliente(), range(self.options['clientes'])))
+        duracao = time.perf_counter() - inicio
+        resultados = [resultado for lista in resultados for resultado in lista]
+        return [tempo for tempo, _ in resultados], sum(erro for _, erro in resultados), duracao
+
+    async def medir_asgi(self):
+        handler = ASGIHandler()
+        caminho, _, consulta = self.options['url'].partition('?')
+        escopo = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': caminho, 'raw_path': caminho.encode(), 'root_path': '',
+            'query_string': consulta.encode(), 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+            'headers': [(b'host', b'localhost'), (b'authorization', 'Token {}'.format(self.token).encode())],
+        }
+
+        async def requisicao():
+            recebido = False
+            entregue = asyncio.Event()
+            status = []
+
+            async def receive():
+                nonlocal recebido
+                if not recebido:
+                    recebido = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # O Django espera a desconexão enquanto responde
+                await entregue.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(mensagem):
+                if mensagem['type'] == 'http.response.start':
+                    status.append(mensagem['status'])
+                    await asyncio.sleep(self.options['latencia'])
+                elif mensagem['type'] == 'http.response.body':
+                    await asyncio.sleep(self.atraso(len(mensagem.get('body', b''))))
+                    if not mensagem.get('more_body'):
+                        entregue.set()
+
+            inicio = time.perf_counter()
+            await handler(dict(escopo), receive, send)
+            entregue.set()
+            return time.perf_counter() - inicio, status != [200]
+
+        async def cliente():
+            return [await requisicao() for _ in range(self.options['requisicoes'])]
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(cliente() for _ in range(self.options['clientes'])))
+        duracao = time.perf_counter() - inicio
+        resultados = [resultado for lista in resultados for resultado in lista]
+        return [tempo for tempo, _ in resultados], sum(erro for _, erro in resultados), duracao
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from anuncio.planos import consultas, explicar, gerar_massa, preparar_contexto, verificar
+
+
+class Command(BaseCommand):
+    """
+    Mostra o plano, o tempo e os buffers das consultas canônicas de anúncios
+    (ver ``anuncio.planos``) sobre uma massa gerada.
+
+    A massa é gravada dentro de uma transação desfeita no fim, então o comando
+    pode rodar em uma cópia do banco de produção sem deixar resíduos; os
+    anúncios existentes também entram nas consultas.
+    """
+    help = 'Roda EXPLAIN (ANALYZE, BUFFERS) nas consultas principais de anúncios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=100000,
+                            help='Quantidade de anúncios gerados')
+        parser.add_argument('--semente', type=int, default=0,
+                            help='Semente da massa gerada')
+        parser.add_argument('--planos', action='store_true',
+                            help='Mostra o plano resumido de cada consulta')
+        parser.add_argument('consultas', nargs='*',
+                            help='Nomes das consultas (padrão: todas)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            inicio = time.monotonic()
+            contexto = preparar_contexto(gerar_massa(options['quantidade'], options['semente']))
+            self.stdout.write('{} anúncio(s) gerado(s) em {:.1f}s'.format(
+                options['quantidade'], time.monotonic() - inicio
+            ))
+
+            self.stdout.write('{:<22} {:>10} {:>8}  {}'.format('consulta', 'tempo', 'buffers', 'problemas'))
+            falhas = 0
+            for consulta in consultas():
+                if options['consultas'] and consulta.nome not in options['consultas']:
+                    continue
+                plano = explicar(consulta.montar(contexto))
+                problemas = verificar(consulta, plano)
+                falhas += bool(problemas)
+                self.stdout.write('{:<22} {:>8.2f}ms {:>8}  {}'.format(
+                    consulta.nome, plano['tempo'], plano['buffers'], '; '.join(problemas) or 'ok'
+                ))
+                if options['planos']:
+                    for linha in plano['linhas']:
+                        self.stdout.write('    ' + linha)
+            transaction.set_rollback(True)
+
+        if falhas:
+            self.stderr.write('{} consulta(s) fora do esperado'.format(falhas))
@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from anuncio.models import Anuncio, StatusAnuncio
+from anuncio.serializers import AnuncioSerializer
+from sistema.projecao import Projecao
+from veiculo.consts import OPCOES_COMBUSTIVEIS, OPCOES_CORES, OPCOES_MARCAS
+from veiculo.models import Veiculo
+
+
+class Command(BaseCommand):
+    """
+    Compara a serialização de uma página da listagem de anúncios pelo
+    ``AnuncioSerializer`` e pela projeção ``values()`` (``sistema.projecao``).
+
+    Os anúncios são gerados dentro de uma transação que é desfeita no fim. Os
+    tempos incluem a consulta, a serialização e a renderização do JSON; antes
+    de medir, o comando confere que as duas saídas são idênticas.
+    """
+    help = 'Mede a serialização da listagem de anúncios com e sem a projeção values()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=1000,
+                            help='Quantidade de anúncios gerados')
+        parser.add_argument('--pagina', type=int, default=50,
+                            help='Anúncios por página serializada')
+        parser.add_argument('--repeticoes', type=int, default=50,
+                            help='Execuções de cada modo')
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/anuncio/api/', SERVER_NAME='localhost')
+        with transaction.atomic():
+            self.gerar(options['quantidade'])
+            queryset = Anuncio.objects.select_related('veiculo', 'usuario').order_by('-created_at', '-id')
+            pagina = options['pagina']
+
+            def serializador():
+                objetos = list(queryset[:pagina])
+                return JSONRenderer().render(AnuncioSerializer(objetos, many=True, context={'request': request}).data)
+
+            def projecao():
+                projecao = Projecao(AnuncioSerializer(context={'request': request}))
+                linhas = queryset.values(*projecao.campos)[:pagina]
+                return JSONRenderer().render(projecao.serializar(linhas))
+
+            if serializador() != projecao():
+                raise CommandError('As saídas do serializador e da projeção são diferentes.')
+
+            tempo_serializador = self.medir(serializador, options['repeticoes'])
+            tempo_projecao = self.medir(projecao, options['repeticoes'])
+            self.stdout.write('{:<14} {:>12}'.format('modo', 'mediana'))
+            self.stdout.write('{:<14} {:>10.2f}ms'.format('serializador', tempo_serializador))
+            self.stdout.write('{:<14} {:>10.2f}ms'.format('projeção', tempo_projecao))
+            self.stdout.write('Ganho: {:.1f}x em páginas de {} anúncios'.format(
+                tempo_serializador / tempo_projecao, pagina
+            ))
+            transaction.set_rollback(True)
+
+    def gerar(self, quantidade):
+        usuario = User.objects.create_user(username='medir_serializacao_{}'.format(random.randint(0, 10 ** 9)))
+        marcas = [valor for valor, _ in OPCOES_MARCAS]
+        cores = [valor for valor, _ in OPCOES_CORES]
+        combustiveis = [valor for valor, _ in OPCOES_COMBUSTIVEIS]
+        veiculos = Veiculo.objects.bulk_create([
+            Veiculo(
+                marca=random.choice(marcas),
+                modelo='Modelo {}'.format(numero),
+                ano=random.randint(1990, 2025),
+                cor=random.choice(cores),
+                combustivel=random.choice(combustiveis),
+                quilometragem=random.randint(0, 300000),
+                foto='veiculo/fotos/medir_{}.jpg'.format(numero) if numero % 2 else None,
+            )
+            for numero in range(quantidade)
+        ])
+        Anuncio.objects.bulk_create([
+            Anuncio(
+                descricao='Anúncio {}'.format(veiculo.modelo),
+                preco=Decimal(random.randint(500000, 20000000)) / 100,
+                status=random.choice(StatusAnuncio.values),
+                veiculo=veiculo,
+                usuario=usuario,
+            )
+            for veiculo in veiculos
+        ])
+
+    def medir(self, funcao, repeticoes):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tempos)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from anuncio.models import Anuncio
+
+
+class Command(BaseCommand):
+    """
+    Preenche o vetor de busca dos anúncios existentes em faixas de id.
+
+    Cada faixa é uma transação curta; o trigger anuncio_busca_trigger
+    recalcula o vetor de cada linha atualizada.
+    """
+    help = 'Preenche o vetor de busca textual dos anúncios existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000,
+                            help='Tamanho da faixa de ids por transação')
+        parser.add_argument('--todos', action='store_true',
+                            help='Recalcula também os anúncios que já têm vetor')
+
+    def handle(self, *args, **options):
+        limites = Anuncio.objects.aggregate(inicio=Min('pk'), fim=Max('pk'))
+        if limites['inicio'] is None:
+            self.stdout.write('Nenhum anúncio para preencher.')
+            return
+
+        # O trigger dispara sempre que a coluna busca está no SET e grava o vetor calculado
+        sql = 'UPDATE anuncio_anuncio SET busca = NULL WHERE id >= %s AND id < %s'
+        if not options['todos']:
+            sql += ' AND busca IS NULL'
+
+        inicio = time.monotonic()
+        total = 0
+        for faixa in range(limites['inicio'], limites['fim'] + 1, options['lote']):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [faixa, faixa + options['lote']])
+                total += cursor.rowcount
+            self.stdout.write('Até o id {}: {} anúncio(s) preenchido(s)'.format(
+                faixa + options['lote'] - 1, total
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            '{} anúncio(s) preenchido(s) em {:.2f}s'.format(total, time.monotonic() - inicio)
+        ))
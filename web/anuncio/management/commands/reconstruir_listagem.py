@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from anuncio.listagem import reconstruir
+
+
+class Command(BaseCommand):
+    """
+    Refaz a tabela de leitura da listagem de anúncios.
+
+    A tabela é mantida por triggers a cada gravação; o comando serve para
+    corrigir divergências (gravações feitas com os triggers desligados,
+    restaurações parciais) e após mudanças nas colunas da listagem.
+    """
+    help = 'Refaz a tabela de leitura da listagem de anúncios'
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        total = reconstruir()
+        self.stdout.write(
+            '{} anúncio(s) gravado(s) na listagem em {:.2f}s'.format(total, time.monotonic() - inicio)
+        )
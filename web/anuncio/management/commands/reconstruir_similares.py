@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from anuncio.similares import reconstruir_similares
+
+
+class Command(BaseCommand):
+    """
+    Recalcula as listas de anúncios similares de todos os anúncios ativos.
+
+    As listas são mantidas a cada gravação; o comando serve para a carga
+    inicial e para reconstruir as listas após mudanças na pontuação.
+    """
+    help = 'Recalcula as listas de anúncios similares'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500,
+                            help='Quantidade de anúncios lidos por vez')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        total = reconstruir_similares(lote=options['lote'])
+        self.stdout.write(
+            '{} lista(s) recalculada(s) em {:.2f}s'.format(total, time.monotonic() - inicio)
+        )
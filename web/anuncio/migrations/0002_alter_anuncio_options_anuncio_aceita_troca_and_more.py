@@ -0,0 +1,117 @@
+# Generated by Django 5.2 on 2026-10-18 02:30
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anuncio', '0001_initial'),
+        ('veiculo', '0006_alter_veiculo_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='anuncio',
+            options={'ordering': ['-destaque', '-created_at'], 'permissions': [('can_feature_anuncio', 'Pode destacar anúncios'), ('can_view_all_anuncios', 'Pode visualizar todos os anúncios'), ('can_export_anuncios', 'Pode exportar anúncios')], 'verbose_name': 'Anúncio', 'verbose_name_plural': 'Anúncios'},
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='aceita_troca',
+            field=models.BooleanField(default=False, help_text='Indica se aceita troca por outro veículo', verbose_name='Aceita troca'),
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='contato_telefone',
+            field=models.CharField(blank=True, help_text='Formato: (XX) XXXXX-XXXX', max_length=15, validators=[django.core.validators.RegexValidator(code='invalid_phone', message='Formato de telefone inválido. Use (XX) XXXXX-XXXX', regex='^\\(\\d{2}\\) \\d{5}-\\d{4}$')], verbose_name='Telefone para contato'),
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Criado em'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='data_expiracao',
+            field=models.DateField(blank=True, help_text='Data em que o anúncio expira automaticamente', null=True, verbose_name='Data de expiração'),
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='destaque',
+            field=models.BooleanField(default=False, help_text='Indica se o anúncio deve ser destacado nas listagens', verbose_name='Destaque'),
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='status',
+            field=models.CharField(choices=[('ativo', 'Ativo'), ('vendido', 'Vendido'), ('pausado', 'Pausado'), ('expirado', 'Expirado'), ('reservado', 'Reservado')], db_index=True, default='ativo', max_length=10, verbose_name='Status'),
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='anuncio',
+            name='visualizacoes',
+            field=models.PositiveIntegerField(default=0, verbose_name='Visualizações'),
+        ),
+        migrations.AlterField(
+            model_name='anuncio',
+            name='data',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Data de criação'),
+        ),
+        migrations.AlterField(
+            model_name='anuncio',
+            name='descricao',
+            field=models.TextField(help_text='Descreva detalhes importantes do veículo', max_length=2000, verbose_name='Descrição'),
+        ),
+        migrations.AlterField(
+            model_name='anuncio',
+            name='preco',
+            field=models.DecimalField(db_index=True, decimal_places=2, help_text='Preço de venda do veículo', max_digits=10, validators=[django.core.validators.MinValueValidator(0.01, message='O preço deve ser maior que zero')], verbose_name='Preço'),
+        ),
+        migrations.AlterField(
+            model_name='anuncio',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anuncios_realizados', to=settings.AUTH_USER_MODEL, verbose_name='Usuário'),
+        ),
+        migrations.AlterField(
+            model_name='anuncio',
+            name='veiculo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anuncios', to='veiculo.veiculo', verbose_name='Veículo'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=models.Index(fields=['status'], name='anuncio_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=models.Index(fields=['preco'], name='anuncio_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=models.Index(fields=['created_at'], name='anuncio_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=models.Index(fields=['usuario'], name='anuncio_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=models.Index(fields=['destaque'], name='anuncio_destaque_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=models.Index(fields=['veiculo'], name='anuncio_veiculo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=models.Index(condition=models.Q(('status', 'ativo')), fields=['data_expiracao'], name='anuncio_expiracao_ativo_idx'),
+        ),
+    ]
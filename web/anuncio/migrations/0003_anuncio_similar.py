@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 02:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anuncio', '0002_alter_anuncio_options_anuncio_aceita_troca_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnuncioSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pontuacao', models.PositiveSmallIntegerField(verbose_name='Pontuação')),
+                ('posicao', models.PositiveSmallIntegerField(verbose_name='Posição')),
+                ('anuncio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='anuncio.anuncio', verbose_name='Anúncio')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_de', to='anuncio.anuncio', verbose_name='Anúncio similar')),
+            ],
+            options={
+                'verbose_name': 'Anúncio similar',
+                'verbose_name_plural': 'Anúncios similares',
+                'ordering': ['anuncio', 'posicao'],
+                'indexes': [models.Index(fields=['anuncio', 'posicao'], name='anuncio_similar_posicao_idx')],
+                'constraints': [models.UniqueConstraint(fields=('anuncio', 'similar'), name='anuncio_similar_unico')],
+            },
+        ),
+    ]
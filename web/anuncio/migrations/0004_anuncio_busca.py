@@ -0,0 +1,98 @@
+# Generated by Django 5.2 on 2026-10-18 02:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+from veiculo.consts import OPCOES_MARCAS
+
+
+# Rótulos das marcas no banco, para que o vetor de busca inclua o nome da marca.
+# Ao alterar OPCOES_MARCAS, crie uma migração que recrie esta função.
+ROTULO_MARCA_SQL = """
+CREATE OR REPLACE FUNCTION veiculo_marca_rotulo(marca integer) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE marca {} ELSE '' END
+$$;
+""".format(' '.join(
+    "WHEN {} THEN '{}'".format(valor, rotulo.replace("'", "''")) for valor, rotulo in OPCOES_MARCAS
+))
+
+BUSCA_SQL = """
+CREATE TEXT SEARCH CONFIGURATION portugues_sem_acento (COPY = portuguese);
+ALTER TEXT SEARCH CONFIGURATION portugues_sem_acento
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+
+CREATE OR REPLACE FUNCTION anuncio_busca_vetor(descricao text, modelo text, marca integer)
+RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('portugues_sem_acento', coalesce(modelo, '')), 'A') ||
+           setweight(to_tsvector('portugues_sem_acento', veiculo_marca_rotulo(marca)), 'A') ||
+           setweight(to_tsvector('portugues_sem_acento', coalesce(descricao, '')), 'B')
+$$;
+
+CREATE OR REPLACE FUNCTION anuncio_busca_atualizar() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    SELECT anuncio_busca_vetor(NEW.descricao, v.modelo, v.marca) INTO NEW.busca
+      FROM veiculo_veiculo v
+     WHERE v.id = NEW.veiculo_id;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER anuncio_busca_trigger
+    BEFORE INSERT OR UPDATE OF descricao, veiculo_id, busca ON anuncio_anuncio
+    FOR EACH ROW EXECUTE FUNCTION anuncio_busca_atualizar();
+
+CREATE OR REPLACE FUNCTION veiculo_busca_propagar() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.modelo IS DISTINCT FROM OLD.modelo OR NEW.marca IS DISTINCT FROM OLD.marca THEN
+        UPDATE anuncio_anuncio
+           SET busca = anuncio_busca_vetor(descricao, NEW.modelo, NEW.marca)
+         WHERE veiculo_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER veiculo_busca_trigger
+    AFTER UPDATE OF modelo, marca ON veiculo_veiculo
+    FOR EACH ROW EXECUTE FUNCTION veiculo_busca_propagar();
+"""
+
+BUSCA_REVERSO_SQL = """
+DROP TRIGGER IF EXISTS veiculo_busca_trigger ON veiculo_veiculo;
+DROP FUNCTION IF EXISTS veiculo_busca_propagar();
+DROP TRIGGER IF EXISTS anuncio_busca_trigger ON anuncio_anuncio;
+DROP FUNCTION IF EXISTS anuncio_busca_atualizar();
+DROP FUNCTION IF EXISTS anuncio_busca_vetor(text, text, integer);
+DROP FUNCTION IF EXISTS veiculo_marca_rotulo(integer);
+DROP TEXT SEARCH CONFIGURATION IF EXISTS portugues_sem_acento;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anuncio', '0003_anuncio_similar'),
+        ('veiculo', '0006_alter_veiculo_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='anuncio',
+            name='busca',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Mantido por trigger a partir da descrição, modelo e marca do veículo', null=True, verbose_name='Vetor de busca'),
+        ),
+        migrations.AddIndex(
+            model_name='anuncio',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busca'], name='anuncio_busca_gin_idx'),
+        ),
+        # Os anúncios existentes são preenchidos com o comando preencher_busca_anuncios
+        migrations.RunSQL(ROTULO_MARCA_SQL + BUSCA_SQL, BUSCA_REVERSO_SQL),
+    ]
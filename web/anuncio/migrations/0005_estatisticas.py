@@ -0,0 +1,107 @@
+# Generated by Django 5.2 on 2026-10-18 04:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Janela da oferta diária, em dias
+DIAS_OFERTA = 90
+
+# O dia da oferta é calculado no fuso do projeto. Ao alterar TIME_ZONE ou a
+# janela, crie uma migração que recrie a visão.
+ESTATISTICAS_SQL = """
+CREATE MATERIALIZED VIEW anuncio_estatistica_preco AS
+SELECT v.marca,
+       lower(btrim(v.modelo)) AS modelo,
+       v.ano,
+       count(*) AS quantidade,
+       (percentile_cont(0.1) WITHIN GROUP (ORDER BY a.preco))::numeric(10, 2) AS preco_p10,
+       (percentile_cont(0.5) WITHIN GROUP (ORDER BY a.preco))::numeric(10, 2) AS preco_p50,
+       (percentile_cont(0.9) WITHIN GROUP (ORDER BY a.preco))::numeric(10, 2) AS preco_p90,
+       avg(a.preco)::numeric(10, 2) AS preco_medio,
+       avg(v.quilometragem)::integer AS quilometragem_media,
+       now() AS calculado_em
+  FROM anuncio_anuncio a
+  JOIN veiculo_veiculo v ON v.id = a.veiculo_id
+ WHERE a.status = 'ativo'
+   AND (a.data_expiracao IS NULL OR a.data_expiracao >= current_date)
+ GROUP BY v.marca, lower(btrim(v.modelo)), v.ano;
+
+-- Índice único: exigido pelo REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX anuncio_estatistica_preco_chave
+    ON anuncio_estatistica_preco (marca, modelo, ano);
+
+CREATE MATERIALIZED VIEW anuncio_oferta_diaria AS
+SELECT (a.created_at AT TIME ZONE '{fuso}')::date AS dia,
+       v.marca,
+       count(*) AS novos,
+       count(*) FILTER (
+           WHERE a.status = 'ativo' AND (a.data_expiracao IS NULL OR a.data_expiracao >= current_date)
+       ) AS ativos,
+       avg(a.preco)::numeric(10, 2) AS preco_medio,
+       now() AS calculado_em
+  FROM anuncio_anuncio a
+  JOIN veiculo_veiculo v ON v.id = a.veiculo_id
+ WHERE a.created_at >= now() - interval '{dias} days'
+ GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX anuncio_oferta_diaria_chave
+    ON anuncio_oferta_diaria (dia, marca);
+""".format(fuso=settings.TIME_ZONE, dias=DIAS_OFERTA)
+
+ESTATISTICAS_REVERSO_SQL = """
+DROP MATERIALIZED VIEW IF EXISTS anuncio_oferta_diaria;
+DROP MATERIALIZED VIEW IF EXISTS anuncio_estatistica_preco;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anuncio', '0004_anuncio_busca'),
+    ]
+
+    operations = [
+        migrations.RunSQL(ESTATISTICAS_SQL, ESTATISTICAS_REVERSO_SQL),
+        migrations.CreateModel(
+            name='EstatisticaPreco',
+            fields=[
+                ('pk', models.CompositePrimaryKey('marca', 'modelo', 'ano', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('marca', models.SmallIntegerField(choices=[(1, 'AUDI'), (2, 'BMW'), (3, 'CHEVROLET - GM'), (4, 'FERRARI'), (5, 'FIAT'), (6, 'FORD'), (7, 'HONDA'), (8, 'HYUNDAI'), (9, 'VOLKSWAGEN'), (10, 'JAGUAR'), (11, 'JEEP'), (12, 'KIA'), (13, 'MERCEDES-BENZ'), (14, 'NISSAN'), (15, 'PEUGEOT'), (16, 'RENAULT'), (17, 'SUZUKI'), (18, 'TOYOTA'), (19, 'VOLVO'), (20, 'BYD')], verbose_name='Marca')),
+                ('modelo', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('ano', models.IntegerField(verbose_name='Ano')),
+                ('quantidade', models.PositiveIntegerField(verbose_name='Anúncios')),
+                ('preco_p10', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço (percentil 10)')),
+                ('preco_p50', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço mediano')),
+                ('preco_p90', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço (percentil 90)')),
+                ('preco_medio', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço médio')),
+                ('quilometragem_media', models.PositiveIntegerField(null=True, verbose_name='Quilometragem média')),
+                ('calculado_em', models.DateTimeField(verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Estatística de preço',
+                'verbose_name_plural': 'Estatísticas de preço',
+                'db_table': 'anuncio_estatistica_preco',
+                'ordering': ['marca', 'modelo', 'ano'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OfertaDiaria',
+            fields=[
+                ('pk', models.CompositePrimaryKey('dia', 'marca', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('marca', models.SmallIntegerField(choices=[(1, 'AUDI'), (2, 'BMW'), (3, 'CHEVROLET - GM'), (4, 'FERRARI'), (5, 'FIAT'), (6, 'FORD'), (7, 'HONDA'), (8, 'HYUNDAI'), (9, 'VOLKSWAGEN'), (10, 'JAGUAR'), (11, 'JEEP'), (12, 'KIA'), (13, 'MERCEDES-BENZ'), (14, 'NISSAN'), (15, 'PEUGEOT'), (16, 'RENAULT'), (17, 'SUZUKI'), (18, 'TOYOTA'), (19, 'VOLVO'), (20, 'BYD')], verbose_name='Marca')),
+                ('novos', models.PositiveIntegerField(verbose_name='Anúncios publicados')),
+                ('ativos', models.PositiveIntegerField(verbose_name='Ainda ativos')),
+                ('preco_medio', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço médio')),
+                ('calculado_em', models.DateTimeField(verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Oferta diária',
+                'verbose_name_plural': 'Ofertas diárias',
+                'db_table': 'anuncio_oferta_diaria',
+                'ordering': ['-dia', 'marca'],
+                'managed': False,
+            },
+        ),
+    ]
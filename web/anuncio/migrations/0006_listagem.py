@@ -0,0 +1,112 @@
+# Generated by Django 5.2 on 2026-10-18 04:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Ao alterar as colunas da listagem, crie uma migração que recrie a visão e as funções
+COLUNAS = (
+    'anuncio_id', 'status', 'data_expiracao', 'destaque', 'preco', 'usuario_id', 'created_at',
+    'marca', 'modelo', 'ano', 'quilometragem', 'combustivel', 'foto',
+)
+
+# Linhas da listagem calculadas a partir das tabelas de origem. Usada pelos
+# triggers (filtrada por anúncio ou veículo) e pela reconstrução completa
+# (anuncio.listagem.reconstruir).
+LISTAGEM_SQL = """
+CREATE VIEW anuncio_listagem_origem AS
+SELECT a.id AS anuncio_id, a.status, a.data_expiracao, a.destaque, a.preco, a.usuario_id, a.created_at,
+       v.marca, v.modelo, v.ano, v.quilometragem, v.combustivel, NULLIF(v.foto, '') AS foto,
+       a.veiculo_id
+  FROM anuncio_anuncio a
+  JOIN veiculo_veiculo v ON v.id = a.veiculo_id;
+
+CREATE OR REPLACE FUNCTION anuncio_listagem_gravar() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM anuncio_listagem WHERE anuncio_id = OLD.id;
+        RETURN NULL;
+    END IF;
+    INSERT INTO anuncio_listagem AS l ({colunas})
+    SELECT {colunas} FROM anuncio_listagem_origem WHERE anuncio_id = NEW.id
+        ON CONFLICT (anuncio_id) DO UPDATE SET {atualizacao}
+     WHERE ({linha_atual}) IS DISTINCT FROM ({linha_nova});
+    RETURN NULL;
+END
+$$;
+
+-- As visualizações não fazem parte da listagem: o contador não dispara o trigger
+CREATE TRIGGER anuncio_listagem_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF status, data_expiracao, destaque, preco, usuario_id, created_at, veiculo_id
+    ON anuncio_anuncio
+    FOR EACH ROW EXECUTE FUNCTION anuncio_listagem_gravar();
+
+CREATE OR REPLACE FUNCTION veiculo_listagem_propagar() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND (NEW.marca, NEW.modelo, NEW.ano, NEW.quilometragem, NEW.combustivel, NEW.foto)
+        IS NOT DISTINCT FROM (OLD.marca, OLD.modelo, OLD.ano, OLD.quilometragem, OLD.combustivel, OLD.foto) THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO anuncio_listagem AS l ({colunas})
+    SELECT {colunas} FROM anuncio_listagem_origem WHERE veiculo_id = NEW.id
+        ON CONFLICT (anuncio_id) DO UPDATE SET {atualizacao};
+    RETURN NULL;
+END
+$$;
+
+-- Na inserção, cobre anúncios gravados antes do veículo (chaves estrangeiras adiadas)
+CREATE TRIGGER veiculo_listagem_trigger
+    AFTER INSERT OR UPDATE OF marca, modelo, ano, quilometragem, combustivel, foto ON veiculo_veiculo
+    FOR EACH ROW EXECUTE FUNCTION veiculo_listagem_propagar();
+
+INSERT INTO anuncio_listagem ({colunas}) SELECT {colunas} FROM anuncio_listagem_origem;
+""".format(
+    colunas=', '.join(COLUNAS),
+    atualizacao=', '.join('{0} = EXCLUDED.{0}'.format(coluna) for coluna in COLUNAS[1:]),
+    linha_atual=', '.join('l.{}'.format(coluna) for coluna in COLUNAS[1:]),
+    linha_nova=', '.join('EXCLUDED.{}'.format(coluna) for coluna in COLUNAS[1:]),
+)
+
+LISTAGEM_REVERSO_SQL = """
+DROP TRIGGER IF EXISTS veiculo_listagem_trigger ON veiculo_veiculo;
+DROP FUNCTION IF EXISTS veiculo_listagem_propagar();
+DROP TRIGGER IF EXISTS anuncio_listagem_trigger ON anuncio_anuncio;
+DROP FUNCTION IF EXISTS anuncio_listagem_gravar();
+DROP VIEW IF EXISTS anuncio_listagem_origem;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anuncio', '0005_estatisticas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListagemAnuncio',
+            fields=[
+                ('anuncio', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='listagem', serialize=False, to='anuncio.anuncio', verbose_name='Anúncio')),
+                ('status', models.CharField(choices=[('ativo', 'Ativo'), ('vendido', 'Vendido'), ('pausado', 'Pausado'), ('expirado', 'Expirado'), ('reservado', 'Reservado')], max_length=10, verbose_name='Status')),
+                ('data_expiracao', models.DateField(null=True, verbose_name='Data de expiração')),
+                ('destaque', models.BooleanField(verbose_name='Destaque')),
+                ('preco', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço')),
+                ('usuario_id', models.IntegerField(verbose_name='Usuário')),
+                ('created_at', models.DateTimeField(verbose_name='Criado em')),
+                ('marca', models.SmallIntegerField(choices=[(1, 'AUDI'), (2, 'BMW'), (3, 'CHEVROLET - GM'), (4, 'FERRARI'), (5, 'FIAT'), (6, 'FORD'), (7, 'HONDA'), (8, 'HYUNDAI'), (9, 'VOLKSWAGEN'), (10, 'JAGUAR'), (11, 'JEEP'), (12, 'KIA'), (13, 'MERCEDES-BENZ'), (14, 'NISSAN'), (15, 'PEUGEOT'), (16, 'RENAULT'), (17, 'SUZUKI'), (18, 'TOYOTA'), (19, 'VOLVO'), (20, 'BYD')], verbose_name='Marca')),
+                ('modelo', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('ano', models.IntegerField(verbose_name='Ano')),
+                ('quilometragem', models.PositiveIntegerField(verbose_name='Quilometragem')),
+                ('combustivel', models.SmallIntegerField(choices=[(1, 'ETANOL'), (2, 'DIESEL'), (3, 'FLEX'), (4, 'GASOLINA'), (5, 'GNV'), (6, 'ELÉTRICO'), (7, 'HÍBRIDO'), (8, 'BIOCOMBUSTÍVEL')], verbose_name='Combustível')),
+                ('foto', models.CharField(help_text='Nome da foto do veículo no armazenamento; as miniaturas derivam dele', max_length=100, null=True, verbose_name='Foto')),
+            ],
+            options={
+                'verbose_name': 'Listagem de anúncio',
+                'verbose_name_plural': 'Listagem de anúncios',
+                'db_table': 'anuncio_listagem',
+                'indexes': [models.Index(condition=models.Q(('status', 'ativo')), fields=['-destaque', '-created_at'], name='listagem_ativo_recentes_idx'), models.Index(condition=models.Q(('status', 'ativo')), fields=['marca', '-destaque', '-created_at'], name='listagem_ativo_marca_rec_idx'), models.Index(condition=models.Q(('status', 'ativo')), fields=['preco'], name='listagem_ativo_preco_idx'), models.Index(condition=models.Q(('status', 'ativo')), fields=['marca', 'preco'], name='listagem_ativo_marca_preco_idx'), models.Index(condition=models.Q(('status', 'ativo')), fields=['marca', 'ano'], name='listagem_ativo_marca_ano_idx'), models.Index(condition=models.Q(('status', 'ativo')), fields=['combustivel', 'preco'], name='listagem_ativo_comb_preco_idx'), models.Index(fields=['status', '-created_at'], name='listagem_status_criado_idx'), models.Index(fields=['usuario_id'], name='listagem_usuario_idx')],
+            },
+        ),
+        migrations.RunSQL(LISTAGEM_SQL, LISTAGEM_REVERSO_SQL),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2 on 2026-10-18 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Colunas da listagem (as mesmas da 0006_listagem)
+COLUNAS = (
+    'anuncio_id', 'status', 'data_expiracao', 'destaque', 'preco', 'usuario_id', 'created_at',
+    'marca', 'modelo', 'ano', 'quilometragem', 'combustivel', 'foto',
+)
+
+# Na inserção de veículos, um disparo por comando em vez de um por linha: os
+# anúncios gravados antes dos veículos (chaves estrangeiras adiadas) entram na
+# listagem com uma única consulta sobre a tabela de transição, inclusive nas
+# cargas em lote. As atualizações continuam linha a linha.
+VEICULO_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION veiculo_listagem_inserir() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO anuncio_listagem AS l ({colunas})
+    SELECT {colunas} FROM anuncio_listagem_origem WHERE veiculo_id IN (SELECT id FROM novos)
+        ON CONFLICT (anuncio_id) DO UPDATE SET {atualizacao};
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS veiculo_listagem_trigger ON veiculo_veiculo;
+CREATE TRIGGER veiculo_listagem_trigger
+    AFTER UPDATE OF marca, modelo, ano, quilometragem, combustivel, foto ON veiculo_veiculo
+    FOR EACH ROW EXECUTE FUNCTION veiculo_listagem_propagar();
+CREATE TRIGGER veiculo_listagem_insercao_trigger
+    AFTER INSERT ON veiculo_veiculo REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION veiculo_listagem_inserir();
+""".format(
+    colunas=', '.join(COLUNAS),
+    atualizacao=', '.join('{0} = EXCLUDED.{0}'.format(coluna) for coluna in COLUNAS[1:]),
+)
+
+VEICULO_TRIGGER_REVERSO_SQL = """
+DROP TRIGGER IF EXISTS veiculo_listagem_insercao_trigger ON veiculo_veiculo;
+DROP FUNCTION IF EXISTS veiculo_listagem_inserir();
+DROP TRIGGER IF EXISTS veiculo_listagem_trigger ON veiculo_veiculo;
+CREATE TRIGGER veiculo_listagem_trigger
+    AFTER INSERT OR UPDATE OF marca, modelo, ano, quilometragem, combustivel, foto ON veiculo_veiculo
+    FOR EACH ROW EXECUTE FUNCTION veiculo_listagem_propagar();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anuncio', '0006_listagem'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='listagemanuncio',
+            name='listagem_ativo_recentes_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='listagemanuncio',
+            name='listagem_ativo_preco_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='listagemanuncio',
+            name='listagem_status_criado_idx',
+        ),
+        migrations.AlterField(
+            model_name='anunciosimilar',
+            name='anuncio',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='anuncio.anuncio', verbose_name='Anúncio'),
+        ),
+        migrations.AddIndex(
+            model_name='listagemanuncio',
+            index=models.Index(fields=['status', '-destaque', '-created_at'], name='listagem_status_rec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listagemanuncio',
+            index=models.Index(fields=['preco'], name='listagem_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listagemanuncio',
+            index=models.Index(fields=['-created_at'], name='listagem_criado_idx'),
+        ),
+        migrations.RunSQL(VEICULO_TRIGGER_SQL, VEICULO_TRIGGER_REVERSO_SQL),
+    ]
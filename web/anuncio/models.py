@@ -1,8 +1,13 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from veiculo.consts import OPCOES_COMBUSTIVEIS, OPCOES_MARCAS
+from veiculo.imagens import LARGURAS, nome_variante
 from veiculo.models import Veiculo
 
 
@@ -17,6 +22,73 @@ class StatusAnuncio(models.TextChoices):
     RESERVADO = 'reservado', _('Reservado')
 
 
+def filtro_anuncios_ativos(hoje=None):
+    """
+    Condição para anúncios ativos e dentro da validade.
+
+    Anúncios vencidos continuam com status ATIVO até a próxima varredura de
+    expiração; a condição sobre a data os esconde das listagens nesse intervalo.
+
+    Returns:
+        Q: Condição aplicável a querysets de Anuncio
+    """
+    hoje = hoje or timezone.now().date()
+    return Q(status=StatusAnuncio.ATIVO) & (
+        Q(data_expiracao__isnull=True) | Q(data_expiracao__gte=hoje)
+    )
+
+
+def filtro_anuncios_expirados(hoje=None):
+    """
+    Condição para anúncios expirados, incluindo os vencidos ainda não varridos
+
+    Returns:
+        Q: Condição aplicável a querysets de Anuncio
+    """
+    hoje = hoje or timezone.now().date()
+    return Q(status=StatusAnuncio.EXPIRADO) | Q(
+        status=StatusAnuncio.ATIVO, data_expiracao__lt=hoje
+    )
+
+
+def filtro_status(status, hoje=None):
+    """
+    Condição para um status, considerando a data de expiração para ATIVO e EXPIRADO
+
+    Returns:
+        Q: Condição aplicável a querysets de Anuncio
+    """
+    if status == StatusAnuncio.ATIVO:
+        return filtro_anuncios_ativos(hoje)
+    if status == StatusAnuncio.EXPIRADO:
+        return filtro_anuncios_expirados(hoje)
+    return Q(status=status)
+
+
+class AnuncioQuerySet(models.QuerySet):
+    """
+    Consultas comuns sobre anúncios
+    """
+    def ativos(self, hoje=None):
+        return self.filter(filtro_anuncios_ativos(hoje))
+
+    def expirados(self, hoje=None):
+        return self.filter(filtro_anuncios_expirados(hoje))
+
+    def vencidos(self, hoje=None):
+        """
+        Anúncios com status ATIVO cuja data de expiração já passou
+        """
+        hoje = hoje or timezone.now().date()
+        return self.filter(status=StatusAnuncio.ATIVO, data_expiracao__lt=hoje)
+
+    def com_status(self, status, hoje=None):
+        """
+        Filtra pelo status considerando a data de expiração para ATIVO e EXPIRADO
+        """
+        return self.filter(filtro_status(status, hoje))
+
+
 class Anuncio(models.Model):
     data = models.DateTimeField(
         auto_now_add=True,
@@ -77,6 +149,12 @@ class Anuncio(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Criado em"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Atualizado em"))
+    busca = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name=_("Vetor de busca"),
+        help_text=_("Mantido por trigger a partir da descrição, modelo e marca do veículo")
+    )
 
     veiculo = models.ForeignKey(
         Veiculo,
@@ -91,6 +169,8 @@ class Anuncio(models.Model):
         verbose_name=_("Usuário")
     )
 
+    objects = AnuncioQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.veiculo} - R$ {self.preco} ({self.get_status_display()})'
 
@@ -136,25 +216,31 @@ class Anuncio(models.Model):
 
     def incrementar_visualizacao(self):
         """
-        Incrementa o contador de visualizações e salva apenas esse campo
+        Incrementa o contador de visualizações.
+        A gravação no banco é feita em lote pelo contador de visualizações.
         
         Returns:
             None
         """
+        from anuncio.contadores import contador_visualizacoes
+
+        contador_visualizacoes.registrar(self.pk)
         self.visualizacoes += 1
-        self.save(update_fields=['visualizacoes'])
         
     def verificar_expiracao(self):
         """
-        Verifica se o anúncio expirou e atualiza o status se necessário
+        Verifica se o anúncio expirou e atualiza o status se necessário.
+        A atualização é feita pelo mesmo motor da varredura de expiração.
         
         Returns:
             bool: True se o anúncio expirou agora, False caso contrário
         """
+        from anuncio.expiracao import expirar_anuncios
+
         if self.data_expiracao and timezone.now().date() > self.data_expiracao and self.status == StatusAnuncio.ATIVO:
-            self.status = StatusAnuncio.EXPIRADO
-            self.save(update_fields=['status'])
-            return True
+            if expirar_anuncios(pks=[self.pk]):
+                self.status = StatusAnuncio.EXPIRADO
+                return True
         return False
         
     def marcar_como_vendido(self):
@@ -191,9 +277,181 @@ class Anuncio(models.Model):
             models.Index(fields=['usuario'], name='anuncio_usuario_idx'),
             models.Index(fields=['destaque'], name='anuncio_destaque_idx'),
             models.Index(fields=['veiculo'], name='anuncio_veiculo_idx'),
+            models.Index(
+                fields=['data_expiracao'],
+                name='anuncio_expiracao_ativo_idx',
+                condition=Q(status=StatusAnuncio.ATIVO)
+            ),
+            GinIndex(fields=['busca'], name='anuncio_busca_gin_idx'),
         ]
         permissions = [
             ('can_feature_anuncio', _('Pode destacar anúncios')),
             ('can_view_all_anuncios', _('Pode visualizar todos os anúncios')),
             ('can_export_anuncios', _('Pode exportar anúncios')),
         ]
+
+
+class AnuncioSimilar(models.Model):
+    """
+    Lista pré-calculada de anúncios similares a um anúncio.
+
+    Mantida por ``anuncio.similares`` a cada gravação de anúncio ou veículo,
+    para que a página de detalhe não precise ordenar candidatos por requisição.
+    """
+    anuncio = models.ForeignKey(
+        Anuncio,
+        related_name='similares',
+        on_delete=models.CASCADE,
+        # Coberto pelos índices (anuncio, similar) e (anuncio, posicao)
+        db_index=False,
+        verbose_name=_("Anúncio")
+    )
+    similar = models.ForeignKey(
+        Anuncio,
+        related_name='similar_de',
+        on_delete=models.CASCADE,
+        verbose_name=_("Anúncio similar")
+    )
+    pontuacao = models.PositiveSmallIntegerField(verbose_name=_("Pontuação"))
+    posicao = models.PositiveSmallIntegerField(verbose_name=_("Posição"))
+
+    class Meta:
+        verbose_name = _("Anúncio similar")
+        verbose_name_plural = _("Anúncios similares")
+        ordering = ['anuncio', 'posicao']
+        constraints = [
+            models.UniqueConstraint(fields=['anuncio', 'similar'], name='anuncio_similar_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['anuncio', 'posicao'], name='anuncio_similar_posicao_idx'),
+        ]
+
+
+class ListagemAnuncio(models.Model):
+    """
+    Linha achatada de um anúncio com os dados do veículo usados pela listagem.
+
+    Tabela de leitura das listagens (``anuncio.listagem``): filtros e
+    ordenações da listagem web e da API são resolvidos sem o join com
+    ``veiculo_veiculo``, com índices parciais dos anúncios ativos. Mantida por
+    triggers no PostgreSQL (migração ``0006_listagem``) na mesma transação das
+    gravações de ``Anuncio`` e ``Veiculo``; o modelo só lê.
+    """
+    anuncio = models.OneToOneField(
+        Anuncio,
+        primary_key=True,
+        related_name='listagem',
+        # A linha é apagada pelo trigger junto com o anúncio
+        on_delete=models.DO_NOTHING,
+        verbose_name=_("Anúncio")
+    )
+    status = models.CharField(max_length=10, choices=StatusAnuncio.choices, verbose_name=_("Status"))
+    data_expiracao = models.DateField(null=True, verbose_name=_("Data de expiração"))
+    destaque = models.BooleanField(verbose_name=_("Destaque"))
+    preco = models.DecimalField(decimal_places=2, max_digits=10, verbose_name=_("Preço"))
+    usuario_id = models.IntegerField(verbose_name=_("Usuário"))
+    created_at = models.DateTimeField(verbose_name=_("Criado em"))
+    marca = models.SmallIntegerField(choices=OPCOES_MARCAS, verbose_name=_("Marca"))
+    modelo = models.CharField(max_length=100, verbose_name=_("Modelo"))
+    ano = models.IntegerField(verbose_name=_("Ano"))
+    quilometragem = models.PositiveIntegerField(verbose_name=_("Quilometragem"))
+    combustivel = models.SmallIntegerField(choices=OPCOES_COMBUSTIVEIS, verbose_name=_("Combustível"))
+    foto = models.CharField(
+        max_length=100,
+        null=True,
+        verbose_name=_("Foto"),
+        help_text=_("Nome da foto do veículo no armazenamento; as miniaturas derivam dele")
+    )
+
+    @property
+    def miniatura(self):
+        """
+        Retorna o nome da menor miniatura da foto, ou None sem foto
+        """
+        return nome_variante(self.foto, LARGURAS[0], 'webp') if self.foto else None
+
+    class Meta:
+        db_table = 'anuncio_listagem'
+        verbose_name = _("Listagem de anúncio")
+        verbose_name_plural = _("Listagem de anúncios")
+        indexes = [
+            # Ordem padrão da listagem web, por status e com filtro de marca
+            models.Index(fields=['status', '-destaque', '-created_at'], name='listagem_status_rec_idx'),
+            models.Index(
+                fields=['marca', '-destaque', '-created_at'],
+                name='listagem_ativo_marca_rec_idx',
+                condition=Q(status=StatusAnuncio.ATIVO)
+            ),
+            # Ordenação e faixa de preço, com e sem filtro de marca. Sem condição
+            # de status: a API mostra também os anúncios inativos do próprio usuário
+            models.Index(fields=['preco'], name='listagem_preco_idx'),
+            models.Index(
+                fields=['marca', 'preco'],
+                name='listagem_ativo_marca_preco_idx',
+                condition=Q(status=StatusAnuncio.ATIVO)
+            ),
+            models.Index(
+                fields=['marca', 'ano'],
+                name='listagem_ativo_marca_ano_idx',
+                condition=Q(status=StatusAnuncio.ATIVO)
+            ),
+            models.Index(
+                fields=['combustivel', 'preco'],
+                name='listagem_ativo_comb_preco_idx',
+                condition=Q(status=StatusAnuncio.ATIVO)
+            ),
+            # Ordem padrão da API
+            models.Index(fields=['-created_at'], name='listagem_criado_idx'),
+            models.Index(fields=['usuario_id'], name='listagem_usuario_idx'),
+        ]
+
+
+class EstatisticaPreco(models.Model):
+    """
+    Preços de mercado dos anúncios ativos por marca, modelo e ano.
+
+    Visão materializada (``anuncio_estatistica_preco``), atualizada por
+    ``anuncio.estatisticas.atualizar``; o modelo só lê. O modelo do veículo
+    fica em minúsculas e sem espaços nas pontas.
+    """
+    pk = models.CompositePrimaryKey('marca', 'modelo', 'ano')
+    marca = models.SmallIntegerField(choices=OPCOES_MARCAS, verbose_name=_("Marca"))
+    modelo = models.CharField(max_length=100, verbose_name=_("Modelo"))
+    ano = models.IntegerField(verbose_name=_("Ano"))
+    quantidade = models.PositiveIntegerField(verbose_name=_("Anúncios"))
+    preco_p10 = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Preço (percentil 10)"))
+    preco_p50 = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Preço mediano"))
+    preco_p90 = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Preço (percentil 90)"))
+    preco_medio = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Preço médio"))
+    quilometragem_media = models.PositiveIntegerField(null=True, verbose_name=_("Quilometragem média"))
+    calculado_em = models.DateTimeField(verbose_name=_("Calculado em"))
+
+    class Meta:
+        managed = False
+        db_table = 'anuncio_estatistica_preco'
+        verbose_name = _("Estatística de preço")
+        verbose_name_plural = _("Estatísticas de preço")
+        ordering = ['marca', 'modelo', 'ano']
+
+
+class OfertaDiaria(models.Model):
+    """
+    Anúncios publicados por dia e marca, nos últimos dias.
+
+    Visão materializada (``anuncio_oferta_diaria``), atualizada com
+    ``EstatisticaPreco``.
+    """
+    pk = models.CompositePrimaryKey('dia', 'marca')
+    dia = models.DateField(verbose_name=_("Dia"))
+    marca = models.SmallIntegerField(choices=OPCOES_MARCAS, verbose_name=_("Marca"))
+    novos = models.PositiveIntegerField(verbose_name=_("Anúncios publicados"))
+    ativos = models.PositiveIntegerField(verbose_name=_("Ainda ativos"))
+    preco_medio = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Preço médio"))
+    calculado_em = models.DateTimeField(verbose_name=_("Calculado em"))
+
+    class Meta:
+        managed = False
+        db_table = 'anuncio_oferta_diaria'
+        verbose_name = _("Oferta diária")
+        verbose_name_plural = _("Ofertas diárias")
+        ordering = ['-dia', 'marca']
@@ -0,0 +1,291 @@
+"""
+Regressão dos planos das consultas principais de anúncios.
+
+Mudanças em filtros, ordenações ou índices podem trocar, sem nenhum erro, uma
+varredura por índice por uma varredura sequencial. Este módulo reúne as
+consultas canônicas (``consultas``), montadas pelo mesmo código das views e
+serviços:
+
+* listagem web (``ListarAnuncios``) com cada filtro e ordem;
+* listagem da API (``APIListarAnuncios``) com cada campo de ordenação;
+* seleção de um lote da varredura de expiração;
+* anúncios similares da página de detalhe (leitura da lista pré-calculada e
+  cálculo dos candidatos).
+
+``explicar`` roda ``EXPLAIN (ANALYZE, BUFFERS)`` de uma consulta e
+``verificar`` compara o plano com o esperado: índices que devem aparecer,
+tabelas que não podem ser varridas sequencialmente e o orçamento de tempo.
+A massa é gerada por ``gerar_massa`` dentro da transação de quem chama (os
+testes e o comando ``medir_planos`` a desfazem no fim).
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connections
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from anuncio.expiracao import selecionar_lote
+from anuncio.models import Anuncio, AnuncioSimilar, ListagemAnuncio, StatusAnuncio
+from anuncio.similares import TAMANHO_LISTA, atualizar_similares, candidatos_similares, consulta_similares
+from veiculo.consts import OPCOES_COMBUSTIVEIS, OPCOES_CORES, OPCOES_MARCAS
+from veiculo.models import Veiculo
+
+# Tabelas que as consultas canônicas nunca devem varrer inteiras
+TABELAS_INDEXADAS = tuple(modelo._meta.db_table for modelo in (Anuncio, ListagemAnuncio, AnuncioSimilar))
+
+MODELOS = ('Onix', 'Cruze', 'Tracker', 'Civic', 'Corolla', 'Hilux', 'Gol', 'Polo', 'Uno', 'Argo', 'HB20', 'Compass')
+
+# Proporção de cada status na massa gerada
+STATUS = (
+    (StatusAnuncio.ATIVO, 70), (StatusAnuncio.VENDIDO, 12), (StatusAnuncio.PAUSADO, 8),
+    (StatusAnuncio.EXPIRADO, 6), (StatusAnuncio.RESERVADO, 4),
+)
+
+
+def orcamento_padrao():
+    """
+    Returns:
+        float: Tempo máximo de execução de cada consulta, em milissegundos
+    """
+    return getattr(settings, 'ANUNCIO_PLANOS_ORCAMENTO', 50)
+
+
+class ConsultaCanonica:
+    """
+    Consulta acompanhada pela regressão de planos
+
+    Args:
+        nome (str): Identificação nos relatórios
+        montar: Função que recebe o contexto (``preparar_contexto``) e
+            retorna o QuerySet, já fatiado como na view
+        indices (tuple): Índices que o plano deve usar; uma tupla de nomes
+            aceita qualquer um deles
+        sequencial (bool): Permite varrer ``TABELAS_INDEXADAS`` inteiras
+            (ordens sem índice de propósito); vale só o orçamento
+        orcamento (float): Tempo máximo em milissegundos (padrão
+            ``ANUNCIO_PLANOS_ORCAMENTO``)
+    """
+    def __init__(self, nome, montar, indices=(), sequencial=False, orcamento=None):
+        self.nome = nome
+        self.montar = montar
+        self.indices = tuple(indices)
+        self.sequencial = sequencial
+        self.orcamento = orcamento
+
+    def __repr__(self):
+        return '<ConsultaCanonica {}>'.format(self.nome)
+
+
+def _listagem_web(**parametros):
+    from anuncio.views import ListarAnuncios
+
+    def montar(contexto):
+        view = ListarAnuncios()
+        request = RequestFactory().get('/anuncio/', parametros)
+        request.user = AnonymousUser()
+        view.setup(request)
+        return view.get_queryset()[:view.paginate_by]
+    return montar
+
+
+def _listagem_api(**parametros):
+    from anuncio.views import APIListarAnuncios
+
+    def montar(contexto):
+        view = APIListarAnuncios()
+        request = Request(RequestFactory().get('/anuncio/api/', parametros))
+        request.user = contexto['usuario']
+        view.setup(request)
+        view.request = request
+        view.format_kwarg = None
+        return view.filter_queryset(view.get_queryset())[:view.paginator.page_size]
+    return montar
+
+
+def consultas():
+    """
+    Returns:
+        list: Consultas canônicas (``ConsultaCanonica``)
+    """
+    return [
+        ConsultaCanonica('web', _listagem_web(), ['listagem_status_rec_idx']),
+        ConsultaCanonica('web status', _listagem_web(status='vendido'), ['listagem_status_rec_idx']),
+        ConsultaCanonica('web preco', _listagem_web(preco_min='30000', preco_max='60000', ordem='preco'),
+                         ['listagem_preco_idx']),
+        ConsultaCanonica('web marca', _listagem_web(marca='fiat'), ['listagem_ativo_marca_rec_idx']),
+        ConsultaCanonica('web marca preco', _listagem_web(marca='fiat', ordem='-preco'),
+                         ['listagem_ativo_marca_preco_idx']),
+        ConsultaCanonica('web combustivel', _listagem_web(combustivel='diesel', ordem='preco'),
+                         ['listagem_ativo_comb_preco_idx']),
+        ConsultaCanonica('web ano', _listagem_web(marca='fiat', ano_min='2018', ano_max='2020', ordem='preco'),
+                         [('listagem_ativo_marca_ano_idx', 'listagem_ativo_marca_preco_idx')]),
+        ConsultaCanonica('web busca', _listagem_web(keyword='corolla 2019'), ['anuncio_busca_gin_idx']),
+        ConsultaCanonica('api', _listagem_api(), ['listagem_criado_idx']),
+        ConsultaCanonica('api preco', _listagem_api(ordering='preco'), ['listagem_preco_idx']),
+        ConsultaCanonica('api -preco', _listagem_api(ordering='-preco'), ['listagem_preco_idx']),
+        ConsultaCanonica('api created_at', _listagem_api(ordering='created_at'), ['listagem_criado_idx']),
+        # Sem índice em visualizacoes: o contador é atualizado a cada acesso
+        ConsultaCanonica('api -visualizacoes', _listagem_api(ordering='-visualizacoes'), sequencial=True),
+        ConsultaCanonica('api marca', _listagem_api(marca='fiat', ordering='preco')),
+        ConsultaCanonica('expiracao', lambda contexto: selecionar_lote(), ['anuncio_expiracao_ativo_idx']),
+        ConsultaCanonica('similares', lambda contexto: consulta_similares(contexto['anuncio']),
+                         [('anuncio_similar_posicao_idx', 'anuncio_similar_unico')]),
+        ConsultaCanonica('similares candidatos', lambda contexto: candidatos_similares(contexto['anuncio']),
+                         [('listagem_ativo_marca_rec_idx', 'listagem_ativo_marca_preco_idx',
+                           'listagem_ativo_marca_ano_idx')]),
+    ]
+
+
+def gerar_massa(quantidade, semente=0, lote=5000, por_vendedor=20):
+    """
+    Gera anúncios (um veículo cada, ``por_vendedor`` anúncios por usuário)
+    com status, destaques, validades e datas de criação variados, e listas de
+    similares para os ativos; no fim atualiza as estatísticas do planejador
+
+    Returns:
+        list: Usuários donos dos anúncios gerados
+    """
+    aleatorio = random.Random(semente)
+    prefixo = 'planos_{}_'.format(aleatorio.randint(0, 10 ** 9))
+    vendedores = User.objects.bulk_create([
+        User(username='{}{}'.format(prefixo, numero)) for numero in range(max(1, quantidade // por_vendedor))
+    ])
+    marcas = [valor for valor, _ in OPCOES_MARCAS]
+    cores = [valor for valor, _ in OPCOES_CORES]
+    combustiveis = [valor for valor, _ in OPCOES_COMBUSTIVEIS]
+    status = [valor for valor, _ in STATUS]
+    pesos = [peso for _, peso in STATUS]
+    hoje = timezone.now().date()
+
+    for inicio in range(0, quantidade, lote):
+        veiculos = Veiculo.objects.bulk_create([
+            Veiculo(
+                marca=aleatorio.choice(marcas), modelo=aleatorio.choice(MODELOS),
+                ano=aleatorio.randint(2000, 2025), cor=aleatorio.choice(cores),
+                combustivel=aleatorio.choice(combustiveis), quilometragem=aleatorio.randint(0, 300000),
+            )
+            for _ in range(min(lote, quantidade - inicio))
+        ])
+        Anuncio.objects.bulk_create([
+            Anuncio(
+                descricao='Anúncio {} {}'.format(veiculo.modelo, veiculo.ano),
+                preco=Decimal(aleatorio.randint(800000, 25000000)) / 100,
+                status=aleatorio.choices(status, pesos)[0],
+                destaque=aleatorio.random() < 0.05,
+                data_expiracao=hoje + timedelta(days=aleatorio.randint(-10, 60)),
+                veiculo=veiculo, usuario=aleatorio.choice(vendedores),
+            )
+            for veiculo in veiculos
+        ])
+
+    ids = [vendedor.pk for vendedor in vendedores]
+    with connections[Anuncio.objects.db].cursor() as cursor:
+        # created_at é preenchido na criação: espalha as datas pelo último ano
+        cursor.execute(
+            "UPDATE anuncio_anuncio SET created_at = created_at - (id %% 365) * interval '1 day' "
+            "- (id %% 1440) * interval '1 minute' WHERE usuario_id = ANY(%s)",
+            [ids]
+        )
+        # Listas de similares com o volume real (para o plano, o conteúdo não
+        # importa): os próximos anúncios ativos da massa, pela ordem do id
+        cursor.execute(
+            "INSERT INTO {tabela} (anuncio_id, similar_id, pontuacao, posicao) "
+            "SELECT anuncio_id, similar_id, 9, posicao FROM ("
+            "    SELECT a.id AS anuncio_id, lead(a.id, n) OVER (PARTITION BY n ORDER BY a.id) AS similar_id,"
+            "           n - 1 AS posicao"
+            "      FROM anuncio_anuncio a CROSS JOIN generate_series(1, %s) n"
+            "     WHERE a.usuario_id = ANY(%s) AND a.status = %s"
+            ") listas WHERE similar_id IS NOT NULL".format(tabela=AnuncioSimilar._meta.db_table),
+            [TAMANHO_LISTA, ids, StatusAnuncio.ATIVO]
+        )
+        # Como depois de um VACUUM: sem as inserções pendentes do índice da busca
+        cursor.execute("SELECT gin_clean_pending_list('anuncio_busca_gin_idx'::regclass)")
+        for tabela in (User._meta.db_table, Veiculo._meta.db_table, *TABELAS_INDEXADAS):
+            cursor.execute('ANALYZE {}'.format(tabela))
+    return vendedores
+
+
+def preparar_contexto(vendedores):
+    """
+    Dados usados pelas consultas canônicas: o usuário (não administrador) das
+    consultas da API e um anúncio ativo dele, com a lista de similares calculada
+
+    Returns:
+        dict: ``usuario`` e ``anuncio``
+    """
+    anuncio = (
+        Anuncio.objects.ativos().filter(usuario__in=vendedores).select_related('veiculo', 'usuario')
+        .order_by('pk').first()
+    )
+    atualizar_similares(anuncio)
+    return {'usuario': anuncio.usuario, 'anuncio': anuncio}
+
+
+def _percorrer(no, plano, nivel=0):
+    relacao = no.get('Relation Name')
+    if no.get('Index Name'):
+        plano['indices'].add(no['Index Name'])
+    if no['Node Type'] == 'Seq Scan':
+        plano['sequenciais'].add(relacao)
+    plano['linhas'].append('{}{}{}{}'.format(
+        '  ' * nivel, no['Node Type'],
+        ' em {}'.format(relacao) if relacao else '',
+        ' usando {}'.format(no['Index Name']) if no.get('Index Name') else '',
+    ))
+    for filho in no.get('Plans', ()):
+        _percorrer(filho, plano, nivel + 1)
+
+
+def explicar(queryset):
+    """
+    Executa a consulta com ``EXPLAIN (ANALYZE, BUFFERS)``
+
+    Returns:
+        dict: ``indices`` (índices usados), ``sequenciais`` (tabelas varridas
+        sequencialmente), ``tempo`` (ms de execução), ``buffers`` (blocos
+        lidos do cache e do disco) e ``linhas`` (plano resumido)
+    """
+    sql, parametros = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, parametros)
+        resultado = cursor.fetchone()[0][0]
+
+    raiz = resultado['Plan']
+    plano = {
+        'indices': set(),
+        'sequenciais': set(),
+        'tempo': resultado['Execution Time'],
+        'buffers': raiz.get('Shared Hit Blocks', 0) + raiz.get('Shared Read Blocks', 0),
+        'linhas': [],
+    }
+    _percorrer(raiz, plano)
+    return plano
+
+
+def verificar(consulta, plano, orcamento=True):
+    """
+    Compara o plano de uma consulta canônica com o esperado
+
+    Args:
+        orcamento (bool): Compara também o tempo com o orçamento da consulta
+
+    Returns:
+        list: Problemas encontrados (vazia se o plano está de acordo)
+    """
+    problemas = []
+    for indice in consulta.indices:
+        alternativas = indice if isinstance(indice, tuple) else (indice,)
+        if not plano['indices'] & set(alternativas):
+            problemas.append('índice {} não usado'.format(' ou '.join(alternativas)))
+    if not consulta.sequencial:
+        for tabela in sorted(plano['sequenciais'] & set(TABELAS_INDEXADAS)):
+            problemas.append('varredura sequencial em {}'.format(tabela))
+    limite = consulta.orcamento or orcamento_padrao()
+    if orcamento and plano['tempo'] > limite:
+        problemas.append('{:.1f}ms acima do orçamento de {}ms'.format(plano['tempo'], limite))
+    return problemas
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from anuncio.models import Anuncio
-from veiculo.serializers import SerializadorVeiculo
+from django.utils import timezone
+from anuncio.models import Anuncio, EstatisticaPreco, OfertaDiaria
+from sistema.projecao import Calculado
+from veiculo.catalogo import MARCAS
+from veiculo.serializers import CampoRotulo, SerializadorVeiculo
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -32,3 +35,35 @@ class AnuncioSerializer(serializers.ModelSerializer):
             'dias_ativo', 'veiculo_info', 'usuario_info'
         ]
         read_only_fields = ['visualizacoes', 'created_at', 'updated_at']
+
+    # Campos calculados na listagem por projeção (sistema.projecao)
+    calculados_projecao = {
+        'dias_ativo': Calculado(
+            ('created_at',), lambda contexto: lambda criado: (timezone.now().date() - criado.date()).days
+        ),
+    }
+
+
+class EstatisticaPrecoSerializer(serializers.ModelSerializer):
+    """
+    Serializador para as estatísticas de preço por marca, modelo e ano
+    """
+    marca_display = CampoRotulo(MARCAS, source='marca')
+
+    class Meta:
+        model = EstatisticaPreco
+        fields = [
+            'marca', 'marca_display', 'modelo', 'ano', 'quantidade', 'preco_p10', 'preco_p50',
+            'preco_p90', 'preco_medio', 'quilometragem_media', 'calculado_em'
+        ]
+
+
+class OfertaDiariaSerializer(serializers.ModelSerializer):
+    """
+    Serializador para a oferta diária por marca
+    """
+    marca_display = CampoRotulo(MARCAS, source='marca')
+
+    class Meta:
+        model = OfertaDiaria
+        fields = ['dia', 'marca', 'marca_display', 'novos', 'ativos', 'preco_medio', 'calculado_em']
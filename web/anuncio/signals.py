@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from anuncio.cache_listagem import invalidar
+from anuncio.models import Anuncio
+from anuncio.similares import atualizar_similares, remover_das_listas
+from veiculo.models import Veiculo
+from veiculo.signals import veiculos_importados
+
+# Campos que alteram a pontuação de similaridade ou a elegibilidade do anúncio
+CAMPOS_SIMILARIDADE = {'status', 'preco', 'destaque', 'veiculo', 'data_expiracao'}
+
+
+@receiver(post_save, sender=Anuncio)
+def anuncio_salvo(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields and not CAMPOS_SIMILARIDADE & set(update_fields)):
+        return
+    atualizar_similares(instance)
+
+
+@receiver(pre_delete, sender=Anuncio)
+def anuncio_excluido(sender, instance, **kwargs):
+    remover_das_listas(instance)
+
+
+@receiver(post_save, sender=Veiculo)
+def veiculo_salvo(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for anuncio in instance.anuncios.select_related('veiculo'):
+        atualizar_similares(anuncio)
+
+
+@receiver(veiculos_importados)
+def veiculos_importados_similares(sender, atualizados=(), **kwargs):
+    # Marca, modelo, ano e quilometragem podem ter mudado, como em veiculo_salvo
+    for anuncio in Anuncio.objects.filter(veiculo_id__in=atualizados).select_related('veiculo'):
+        atualizar_similares(anuncio)
+
+
+@receiver([post_save, post_delete], sender=Anuncio, dispatch_uid='anuncio_listagem_anuncio')
+@receiver([post_save, post_delete], sender=Veiculo, dispatch_uid='anuncio_listagem_veiculo')
+def invalidar_listagem(sender, **kwargs):
+    # Qualquer alteração pode mudar as páginas da listagem em cache
+    invalidar()
+
+
+@receiver(veiculos_importados)
+def veiculos_importados_listagem(sender, inseridos=0, atualizados=(), **kwargs):
+    if inseridos or atualizados:
+        invalidar()
@@ -0,0 +1,189 @@
+"""
+Serviço de anúncios similares.
+
+Os candidatos são anúncios ativos da mesma marca, pontuados por:
+
+* mesmo modelo: 4 pontos;
+* ano a até ``FAIXA_ANO`` anos de diferença: 2 pontos;
+* preço até ``FAIXA_PRECO`` acima ou abaixo (no mesmo fator nos dois sentidos): 2 pontos;
+* quilometragem a até ``FAIXA_KM`` km de diferença: 1 ponto.
+
+A pontuação é simétrica, então quando um anúncio muda ele pode ser inserido
+diretamente nas listas dos seus vizinhos. As listas ficam na tabela
+``AnuncioSimilar`` com até ``TAMANHO_LISTA`` vizinhos por anúncio, e a leitura
+é uma única consulta.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from anuncio.models import Anuncio, AnuncioSimilar, ListagemAnuncio, filtro_anuncios_ativos
+
+TAMANHO_LISTA = 12
+FAIXA_ANO = 2
+FAIXA_PRECO = Decimal('1.2')
+FAIXA_KM = 20000
+
+
+def _pontos(condicao, pontos):
+    return Case(When(condicao, then=Value(pontos)), default=Value(0), output_field=IntegerField())
+
+
+def candidatos_similares(anuncio, excluir=()):
+    """
+    Consulta dos anúncios mais similares a um anúncio, na tabela de leitura da
+    listagem (``anuncio.listagem``), que já traz os dados do veículo
+
+    Returns:
+        QuerySet: Pares (id do similar, pontuação), do mais similar ao menos similar
+    """
+    veiculo = anuncio.veiculo
+    preco = Decimal(str(anuncio.preco))
+    pontuacao = (
+        _pontos(Q(modelo__iexact=veiculo.modelo), 4) +
+        _pontos(Q(ano__range=(veiculo.ano - FAIXA_ANO, veiculo.ano + FAIXA_ANO)), 2) +
+        _pontos(Q(preco__range=(preco / FAIXA_PRECO, preco * FAIXA_PRECO)), 2) +
+        _pontos(Q(quilometragem__range=(
+            veiculo.quilometragem - FAIXA_KM, veiculo.quilometragem + FAIXA_KM
+        )), 1)
+    )
+    return (
+        ListagemAnuncio.objects.filter(filtro_anuncios_ativos(), marca=veiculo.marca)
+        .exclude(pk__in=[anuncio.pk, *excluir])
+        .annotate(pontuacao=pontuacao)
+        .order_by('-pontuacao', '-destaque', '-created_at', 'pk')
+        .values_list('pk', 'pontuacao')
+    )[:TAMANHO_LISTA]
+
+
+def calcular_vizinhos(anuncio, excluir=()):
+    """
+    Calcula os anúncios mais similares a um anúncio
+
+    Returns:
+        list: Pares (id do similar, pontuação), do mais similar ao menos similar
+    """
+    return list(candidatos_similares(anuncio, excluir))
+
+
+def _gravar_lista(anuncio_id, vizinhos):
+    AnuncioSimilar.objects.filter(anuncio_id=anuncio_id).delete()
+    AnuncioSimilar.objects.bulk_create([
+        AnuncioSimilar(anuncio_id=anuncio_id, similar_id=similar_id, pontuacao=pontuacao, posicao=posicao)
+        for posicao, (similar_id, pontuacao) in enumerate(vizinhos)
+    ])
+
+
+def _recalcular(anuncio_ids, excluir=()):
+    for anuncio in Anuncio.objects.select_related('veiculo').filter(pk__in=anuncio_ids):
+        if anuncio.is_ativo:
+            _gravar_lista(anuncio.pk, calcular_vizinhos(anuncio, excluir))
+
+
+@transaction.atomic
+def atualizar_similares(anuncio):
+    """
+    Atualiza a lista do anúncio e as listas afetadas pela mudança dele.
+
+    Um anúncio inativo sai de todas as listas, que são completadas com outros
+    candidatos. Um anúncio ativo tem sua lista recalculada e entra nas listas
+    dos vizinhos em que supera o último colocado.
+    """
+    contendo = set(
+        AnuncioSimilar.objects.filter(similar_id=anuncio.pk).values_list('anuncio_id', flat=True)
+    )
+    if not anuncio.is_ativo:
+        AnuncioSimilar.objects.filter(anuncio_id=anuncio.pk).delete()
+        AnuncioSimilar.objects.filter(similar_id=anuncio.pk).delete()
+        _recalcular(contendo)
+        return
+
+    vizinhos = calcular_vizinhos(anuncio)
+    _gravar_lista(anuncio.pk, vizinhos)
+
+    pontuacoes = dict(vizinhos)
+    listas = {pk: [] for pk in pontuacoes}
+    for registro in AnuncioSimilar.objects.filter(anuncio_id__in=pontuacoes).exclude(similar_id=anuncio.pk):
+        listas[registro.anuncio_id].append((registro.similar_id, registro.pontuacao))
+
+    for vizinho_id, lista in listas.items():
+        pontuacao = pontuacoes[vizinho_id]
+        if len(lista) >= TAMANHO_LISTA and pontuacao <= lista[-1][1]:
+            continue
+        lista.append((anuncio.pk, pontuacao))
+        lista.sort(key=lambda par: -par[1])
+        _gravar_lista(vizinho_id, lista[:TAMANHO_LISTA])
+
+    # Listas que continham o anúncio mas não são mais vizinhas dele
+    AnuncioSimilar.objects.filter(
+        similar_id=anuncio.pk, anuncio_id__in=contendo - set(pontuacoes)
+    ).delete()
+    _recalcular(contendo - set(pontuacoes))
+
+
+def reconstruir_similares(lote=500):
+    """
+    Recalcula as listas de todos os anúncios ativos
+
+    Returns:
+        int: Quantidade de listas gravadas
+    """
+    total = 0
+    anuncios = Anuncio.objects.ativos().select_related('veiculo').order_by('pk')
+    for anuncio in anuncios.iterator(chunk_size=lote):
+        with transaction.atomic():
+            _gravar_lista(anuncio.pk, calcular_vizinhos(anuncio))
+        total += 1
+    return total
+
+
+def remover_das_listas(anuncio):
+    """
+    Completa as listas que contêm um anúncio que será excluído
+    """
+    contendo = list(
+        AnuncioSimilar.objects.filter(similar_id=anuncio.pk).values_list('anuncio_id', flat=True)
+    )
+    _recalcular(contendo, excluir=[anuncio.pk])
+
+
+def consulta_similares(anuncio):
+    """
+    Returns:
+        QuerySet: Anúncios ativos da lista pré-calculada, na ordem da lista
+    """
+    return (
+        Anuncio.objects.ativos()
+        .select_related('veiculo')
+        .filter(similar_de__anuncio=anuncio)
+        .order_by('similar_de__posicao')
+    )
+
+
+def obter_similares(anuncio, quantidade=4, semente=None):
+    """
+    Retorna os anúncios similares pré-calculados em uma única consulta.
+
+    Args:
+        anuncio (Anuncio): Anúncio de referência
+        quantidade (int): Quantidade de similares exibidos
+        semente (int): Quando informada, a janela exibida gira sobre a lista
+            de forma determinística (mesma semente, mesmos anúncios)
+
+    Returns:
+        list: Anúncios similares, com o veículo carregado
+    """
+    similares = list(consulta_similares(anuncio))
+    if semente is None or len(similares) <= quantidade:
+        return similares[:quantidade]
+    inicio = semente % len(similares)
+    return (similares[inicio:] + similares[:inicio])[:quantidade]
+
+
+def semente_diaria(anuncio):
+    """
+    Semente de rotação que muda uma vez por dia para cada anúncio
+    """
+    return timezone.now().date().toordinal() + anuncio.pk
@@ -0,0 +1,637 @@
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from anuncio.busca import buscar_anuncios
+from anuncio.cache_listagem import geracao
+from anuncio.contadores import ContadorVisualizacoes
+from anuncio.estatisticas import atualizar, preco_mercado
+from anuncio.expiracao import expirar_anuncios
+from anuncio.models import (
+    Anuncio, AnuncioSimilar, EstatisticaPreco, ListagemAnuncio, OfertaDiaria, StatusAnuncio
+)
+from anuncio.planos import consultas, explicar, gerar_massa, preparar_contexto, verificar
+from anuncio.similares import TAMANHO_LISTA, obter_similares, reconstruir_similares
+from sistema.autenticacao import cache_tokens
+from sistema.roteador import COOKIE_PRIMARIO, RoteadorReplicas, fixado_no_primario, leitura_replica
+from veiculo.importacao import importar_veiculos
+from veiculo.models import Veiculo
+
+
+class TestesExpiracaoAnuncios(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.veiculo = Veiculo.objects.create(
+            marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3
+        )
+        hoje = timezone.now().date()
+        self.vencidos = [
+            Anuncio.objects.create(
+                descricao='Vencido', preco=Decimal('1000.00'), veiculo=self.veiculo,
+                usuario=self.user, data_expiracao=hoje - timedelta(days=1)
+            )
+            for _ in range(3)
+        ]
+        self.vigente = Anuncio.objects.create(
+            descricao='Vigente', preco=Decimal('1000.00'), veiculo=self.veiculo,
+            usuario=self.user, data_expiracao=hoje + timedelta(days=1)
+        )
+
+    def test_expirar_em_lotes(self):
+        self.assertEqual(expirar_anuncios(lote=2), 3)
+        self.assertEqual(Anuncio.objects.filter(status=StatusAnuncio.EXPIRADO).count(), 3)
+        self.assertEqual(Anuncio.objects.get(pk=self.vigente.pk).status, StatusAnuncio.ATIVO)
+        self.assertEqual(expirar_anuncios(), 0)
+
+    def test_max_lotes(self):
+        self.assertEqual(expirar_anuncios(lote=1, max_lotes=2), 2)
+
+    def test_verificar_expiracao(self):
+        anuncio = self.vencidos[0]
+        self.assertTrue(anuncio.verificar_expiracao())
+        self.assertEqual(anuncio.status, StatusAnuncio.EXPIRADO)
+        self.assertEqual(Anuncio.objects.expirados().filter(status=StatusAnuncio.EXPIRADO).count(), 1)
+        self.assertFalse(self.vigente.verificar_expiracao())
+
+    def test_comando(self):
+        call_command('expirar_anuncios', '--lote', '2', stdout=io.StringIO())
+        self.assertEqual(Anuncio.objects.vencidos().count(), 0)
+
+    def test_listagem_esconde_vencidos_sem_escrever(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('anuncio:listar-anuncios'))
+        self.assertEqual([a.pk for a in response.context['anuncios']], [self.vigente.pk])
+        self.assertEqual(Anuncio.objects.vencidos().count(), 3)
+
+        response = self.client.get(reverse('anuncio:listar-anuncios'), {'status': StatusAnuncio.EXPIRADO})
+        self.assertEqual(len(response.context['anuncios']), 3)
+
+
+@override_settings(ANUNCIO_VISUALIZACOES_INTERVALO=0)
+class TestesContadorVisualizacoes(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='teste', password='teste123')
+        veiculo = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.anuncios = [
+            Anuncio.objects.create(descricao='Teste', preco=Decimal('1000.00'), veiculo=veiculo, usuario=user)
+            for _ in range(2)
+        ]
+        self.contador = ContadorVisualizacoes()
+
+    @override_settings(ANUNCIO_VISUALIZACOES_MODO='buffer')
+    def test_buffer_descarrega_em_lote(self):
+        for _ in range(3):
+            self.contador.registrar(self.anuncios[0].pk)
+        self.contador.registrar(self.anuncios[1].pk)
+        self.assertEqual(self.contador.metricas()['pendentes'], 4)
+        self.assertEqual(Anuncio.objects.get(pk=self.anuncios[0].pk).visualizacoes, 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.contador.descarregar(), 4)
+
+        self.assertEqual(Anuncio.objects.get(pk=self.anuncios[0].pk).visualizacoes, 3)
+        self.assertEqual(Anuncio.objects.get(pk=self.anuncios[1].pk).visualizacoes, 1)
+        self.assertEqual(self.contador.metricas(), {
+            'pendentes': 0, 'anuncios_pendentes': 0, 'descarregadas': 4, 'descargas': 1,
+        })
+
+    @override_settings(ANUNCIO_VISUALIZACOES_MODO='sincrono')
+    def test_modo_sincrono(self):
+        self.contador.registrar(self.anuncios[0].pk)
+        self.assertEqual(Anuncio.objects.get(pk=self.anuncios[0].pk).visualizacoes, 1)
+        self.assertEqual(self.contador.metricas()['pendentes'], 0)
+
+
+class TestesConsultasViewsAnuncio(TestCase):
+    """
+    Cada view busca o anúncio uma única vez por requisição
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        veiculo = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.anuncio = Anuncio.objects.create(
+            descricao='Teste', preco=Decimal('1000.00'), veiculo=veiculo, usuario=self.user
+        )
+        Anuncio.objects.create(descricao='Similar', preco=Decimal('900.00'), veiculo=veiculo, usuario=self.user)
+
+    def test_detalhar(self):
+        # anúncio, visualização, anúncios similares e preço de mercado
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('anuncio:detalhar-anuncio', args=[self.anuncio.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Anuncio.objects.get(pk=self.anuncio.pk).visualizacoes, 1)
+
+    def test_editar(self):
+        self.client.force_login(self.user)
+        # sessão, usuário, anúncio e opções de veículo
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('anuncio:editar-anuncio', args=[self.anuncio.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_deletar(self):
+        self.client.force_login(self.user)
+        # sessão, usuário e anúncio
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('anuncio:deletar-anuncio', args=[self.anuncio.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class TestesAnunciosSimilares(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+
+    def criar(self, modelo='Onix', ano=2020, preco='50000.00', marca=3, quilometragem=10000):
+        veiculo = Veiculo.objects.create(
+            marca=marca, modelo=modelo, ano=ano, cor=1, combustivel=3, quilometragem=quilometragem
+        )
+        return Anuncio.objects.create(
+            descricao='Teste', preco=Decimal(preco), veiculo=veiculo, usuario=self.user
+        )
+
+    def test_ordem_por_pontuacao(self):
+        base = self.criar()
+        mesmo_modelo = self.criar()
+        outro_modelo = self.criar(modelo='Cruze', ano=2010, preco='150000.00', quilometragem=90000)
+        self.criar(marca=5)
+
+        self.assertEqual(obter_similares(base), [mesmo_modelo, outro_modelo])
+        # A pontuação é simétrica: o novo anúncio entrou na lista dos anteriores
+        self.assertIn(outro_modelo, obter_similares(mesmo_modelo))
+
+    def test_anuncio_inativo_sai_das_listas(self):
+        base = self.criar()
+        vendido = self.criar()
+        vendido.marcar_como_vendido()
+        self.assertEqual(obter_similares(base), [])
+        self.assertFalse(AnuncioSimilar.objects.filter(similar=vendido).exists())
+
+    def test_lista_limitada_e_rotacao(self):
+        base = self.criar()
+        for _ in range(TAMANHO_LISTA + 2):
+            self.criar(modelo='Cruze')
+        self.assertEqual(AnuncioSimilar.objects.filter(anuncio=base).count(), TAMANHO_LISTA)
+
+        with self.assertNumQueries(1):
+            primeira = obter_similares(base, quantidade=4, semente=0)
+        self.assertEqual(obter_similares(base, quantidade=4, semente=0), primeira)
+        self.assertNotEqual(obter_similares(base, quantidade=4, semente=4), primeira)
+
+    def test_reconstruir(self):
+        base = self.criar()
+        outro = self.criar()
+        AnuncioSimilar.objects.all().delete()
+        self.assertEqual(reconstruir_similares(), 2)
+        self.assertEqual(obter_similares(base), [outro])
+
+
+class TestesBuscaAnuncios(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.onix = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.uno = Veiculo.objects.create(marca=5, modelo='Uno', ano=2015, cor=1, combustivel=3)
+        self.no_modelo = Anuncio.objects.create(
+            descricao='Carro revisado', preco=Decimal('50000.00'), veiculo=self.onix, usuario=self.user
+        )
+        self.na_descricao = Anuncio.objects.create(
+            descricao='Vendo carros, troco por um Onix', preco=Decimal('20000.00'),
+            veiculo=self.uno, usuario=self.user
+        )
+
+    def buscar(self, termo):
+        return list(buscar_anuncios(Anuncio.objects.all(), termo).order_by('-relevancia'))
+
+    def test_busca_por_modelo_marca_e_descricao(self):
+        self.assertEqual(self.buscar('onix'), [self.no_modelo, self.na_descricao])
+        self.assertEqual(self.buscar('chevrolet'), [self.no_modelo])
+        self.assertEqual(self.buscar('carro'), [self.no_modelo, self.na_descricao])
+        self.assertEqual(self.buscar('revisado -onix'), [])
+
+    def test_alteracao_do_veiculo_atualiza_busca(self):
+        self.onix.modelo = 'Tracker'
+        self.onix.save()
+        self.assertEqual(self.buscar('tracker'), [self.no_modelo])
+
+    def test_listagem_web(self):
+        response = self.client.get(reverse('anuncio:listar-anuncios'), {'keyword': 'uno'})
+        self.assertEqual(list(response.context['anuncios']), [self.na_descricao])
+
+    def test_preencher_vetores(self):
+        Anuncio.objects.update(busca=None)
+        call_command('preencher_busca_anuncios', '--lote', '1', stdout=io.StringIO())
+        self.assertFalse(Anuncio.objects.filter(busca__isnull=True).exists())
+        self.assertEqual(self.buscar('uno'), [self.na_descricao])
+
+
+class TestesListagemAnuncio(TestCase):
+    """
+    Tabela de leitura da listagem mantida pelos triggers
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.veiculo = Veiculo.objects.create(
+            marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3, quilometragem=10000,
+            foto='veiculo/fotos/onix.jpg'
+        )
+        self.anuncio = Anuncio.objects.create(
+            descricao='Teste', preco=Decimal('50000.00'), veiculo=self.veiculo, usuario=self.user
+        )
+
+    def linha(self):
+        return ListagemAnuncio.objects.get(anuncio=self.anuncio)
+
+    def test_gravacoes_atualizam_listagem(self):
+        linha = self.linha()
+        self.assertEqual(
+            (linha.status, linha.preco, linha.marca, linha.modelo, linha.ano, linha.usuario_id),
+            (StatusAnuncio.ATIVO, Decimal('50000.00'), 3, 'Onix', 2020, self.user.pk)
+        )
+        self.assertEqual(linha.miniatura, 'veiculo/fotos/onix.320w.webp')
+
+        self.veiculo.marca, self.veiculo.modelo, self.veiculo.foto = 5, 'Uno', None
+        self.veiculo.save()
+        self.anuncio.marcar_como_vendido()
+        linha = self.linha()
+        self.assertEqual((linha.marca, linha.modelo, linha.status), (5, 'Uno', StatusAnuncio.VENDIDO))
+        self.assertIsNone(linha.miniatura)
+
+    def test_atualizacao_em_lote_e_exclusao(self):
+        Anuncio.objects.filter(pk=self.anuncio.pk).update(data_expiracao=timezone.now().date() - timedelta(days=1))
+        expirar_anuncios()
+        self.assertEqual(self.linha().status, StatusAnuncio.EXPIRADO)
+
+        self.veiculo.delete()
+        self.assertFalse(ListagemAnuncio.objects.exists())
+
+    def test_anuncio_gravado_antes_do_veiculo(self):
+        # Chaves estrangeiras adiadas: o veículo chega depois, na mesma transação
+        pk = Veiculo.objects.order_by('-pk').values_list('pk', flat=True)[0] + 1000
+        anuncio, = Anuncio.objects.bulk_create([
+            Anuncio(descricao='Teste', preco=Decimal('30000.00'), veiculo_id=pk, usuario=self.user)
+        ])
+        self.assertFalse(ListagemAnuncio.objects.filter(anuncio=anuncio).exists())
+        Veiculo.objects.create(pk=pk, marca=5, modelo='Uno', ano=2015, cor=1, combustivel=3)
+        self.assertEqual(ListagemAnuncio.objects.get(anuncio=anuncio).modelo, 'Uno')
+
+    def test_listagem_web_filtra_pela_tabela(self):
+        uno = Veiculo.objects.create(marca=5, modelo='Uno', ano=2015, cor=1, combustivel=3)
+        barato = Anuncio.objects.create(
+            descricao='Teste', preco=Decimal('20000.00'), veiculo=self.veiculo, usuario=self.user
+        )
+        Anuncio.objects.create(descricao='Teste', preco=Decimal('10000.00'), veiculo=uno, usuario=self.user)
+        with CaptureQueriesContext(connections['default']) as consultas:
+            response = self.client.get(reverse('anuncio:listar-anuncios'), {'marca': 'chevrolet', 'ordem': 'preco'})
+        self.assertEqual(list(response.context['anuncios']), [barato, self.anuncio])
+        contagem = next(c['sql'] for c in consultas.captured_queries if 'COUNT(*)' in c['sql'])
+        self.assertIn('"anuncio_listagem"."marca"', contagem)
+        self.assertNotIn('veiculo_veiculo', contagem)
+
+    def test_reconstruir(self):
+        with connections['default'].cursor() as cursor:
+            # O TRUNCATE exige que as chaves estrangeiras adiadas do teste já tenham sido verificadas
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('TRUNCATE anuncio_listagem')
+        saida = io.StringIO()
+        call_command('reconstruir_listagem', stdout=saida)
+        self.assertIn('1 anúncio(s)', saida.getvalue())
+        self.assertEqual(self.linha().modelo, 'Onix')
+
+
+class TestesPlanosConsulta(TestCase):
+    """
+    Planos das consultas canônicas (ver anuncio/planos.py) sobre uma massa de
+    ``ANUNCIO_PLANOS_QUANTIDADE`` anúncios. O tempo fica para o ``medir_planos``
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.contexto = preparar_contexto(gerar_massa(settings.ANUNCIO_PLANOS_QUANTIDADE))
+
+    def test_planos(self):
+        for consulta in consultas():
+            with self.subTest(consulta=consulta.nome):
+                plano = explicar(consulta.montar(self.contexto))
+                self.assertEqual(verificar(consulta, plano, orcamento=False), [], '\n'.join(plano['linhas']))
+
+
+class TestesCacheListagem(TestCase):
+    """
+    Páginas públicas da listagem servidas do cache e invalidadas por geração
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.veiculo = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.anuncio = Anuncio.objects.create(
+            descricao='Onix revisado', preco=Decimal('50000.00'), veiculo=self.veiculo, usuario=self.user
+        )
+        self.url = reverse('anuncio:listar-anuncios')
+
+    def test_segunda_visita_sem_consultas(self):
+        primeira = self.client.get(self.url, {'marca': 'chevrolet'})
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url, {'marca': 'chevrolet'})
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.content, primeira.content)
+        self.assertIn('Cookie', segunda['Vary'])
+
+    def test_urls_equivalentes_compartilham_entrada(self):
+        self.client.get(self.url, {'preco_min': '40000', 'keyword': ' onix '})
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'preco_min': '40000.00', 'keyword': 'onix', 'utm_source': 'x'})
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'preco_min': '40000', 'keyword': 'onix', 'page': '1'})
+
+    def test_alteracoes_aparecem_imediatamente(self):
+        self.assertContains(self.client.get(self.url), 'Onix revisado')
+
+        self.anuncio.descricao = 'Onix impecável'
+        self.anuncio.save()
+        self.assertContains(self.client.get(self.url), 'Onix impecável')
+
+        self.veiculo.modelo = 'Tracker'
+        self.veiculo.save()
+        self.assertContains(self.client.get(self.url), 'Tracker')
+
+        self.anuncio.delete()
+        self.assertNotContains(self.client.get(self.url), 'Onix impecável')
+
+    def test_expiracao_em_lote_invalida(self):
+        self.client.get(self.url)
+        Anuncio.objects.filter(pk=self.anuncio.pk).update(data_expiracao=timezone.now().date() - timedelta(days=1))
+        antes = geracao()
+        expirar_anuncios()
+        self.assertNotEqual(geracao(), antes)
+
+    def test_importacao_de_veiculos_invalida(self):
+        Veiculo.objects.filter(pk=self.veiculo.pk).update(chassi='9BWZZZ377VT004251')
+        arquivo = 'marca,modelo,ano,cor,combustivel,quilometragem,placa,chassi\n{}'
+        self.assertContains(self.client.get(self.url), 'Onix')
+        antes = geracao()
+        importar_veiculos(io.StringIO(arquivo.format('Chevrolet - GM,Tracker,2020,Branco,Flex,0,,9BWZZZ377VT004251\n')),
+                          simular=True)
+        importar_veiculos(io.StringIO(arquivo.format('Tesla,,2020,Branco,Flex,0,,\n')))
+        self.assertEqual(geracao(), antes)
+        importar_veiculos(io.StringIO(arquivo.format('Chevrolet - GM,Tracker,2020,Branco,Flex,0,,9BWZZZ377VT004251\n')))
+        self.assertContains(self.client.get(self.url), 'Tracker')
+
+    def test_usuario_autenticado_nao_usa_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Olá, teste')
+
+    @override_settings(ANUNCIO_LISTAGEM_CACHE_VALIDADE=0)
+    def test_cache_desligado(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+
+class TestesCartoesListagem(TestCase):
+    """
+    Cartões da listagem em cache, com os botões do dono fora do fragmento
+    """
+    def setUp(self):
+        self.dono = User.objects.create_user(username='dono', password='teste123')
+        self.outro = User.objects.create_user(username='outro', password='teste123')
+        self.veiculo = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.anuncio = Anuncio.objects.create(
+            descricao='Onix revisado', preco=Decimal('50000.00'), veiculo=self.veiculo, usuario=self.dono
+        )
+        Anuncio.objects.create(
+            descricao='Outro Onix', preco=Decimal('40000.00'), veiculo=self.veiculo, usuario=self.outro
+        )
+        self.url = reverse('anuncio:listar-anuncios')
+        self.editar = reverse('anuncio:editar-anuncio', args=[self.anuncio.pk])
+
+    def test_botoes_do_dono(self):
+        self.client.force_login(self.outro)
+        self.assertNotContains(self.client.get(self.url), self.editar)
+        self.client.force_login(self.dono)
+        self.assertContains(self.client.get(self.url), self.editar)
+        self.client.force_login(self.outro)
+        self.assertNotContains(self.client.get(self.url), self.editar)
+
+    def test_uma_leitura_do_cache_por_pagina(self):
+        self.client.force_login(self.dono)
+        self.client.get(self.url)
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.client.get(self.url)
+        self.assertEqual(get_many.call_count, 1)
+
+    def test_cartao_muda_com_updated_at(self):
+        self.client.force_login(self.dono)
+        self.client.get(self.url)
+
+        # update() não muda updated_at: o cartão em cache continua valendo
+        Anuncio.objects.filter(pk=self.anuncio.pk).update(descricao='Onix impecável')
+        self.assertContains(self.client.get(self.url), 'Onix revisado')
+
+        self.anuncio.refresh_from_db()
+        self.anuncio.save()
+        self.assertContains(self.client.get(self.url), 'Onix impecável')
+
+        self.veiculo.modelo = 'Tracker'
+        self.veiculo.save()
+        self.assertContains(self.client.get(self.url), 'Tracker', count=2)
+
+
+class TestesEstatisticasMercado(TestCase):
+    """
+    Preços de mercado e oferta diária lidos das visões materializadas
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.token = Token.objects.create(user=self.user)
+        self.anuncios = [
+            self.criar('Onix', '40000.00', 10000),
+            self.criar(' ONIX', '50000.00', 20000),
+            self.criar('onix', '60000.00', 30000),
+        ]
+        # Fora das estatísticas de preço: pausado e de outro ano
+        self.criar('Onix', '10000.00', 0, status=StatusAnuncio.PAUSADO)
+        self.criar('Onix', '90000.00', 0, ano=2024)
+
+    def criar(self, modelo, preco, quilometragem, status=StatusAnuncio.ATIVO, ano=2020):
+        veiculo = Veiculo.objects.create(
+            marca=3, modelo=modelo, ano=ano, cor=1, combustivel=3, quilometragem=quilometragem
+        )
+        return Anuncio.objects.create(
+            descricao='Teste', preco=Decimal(preco), status=status, veiculo=veiculo, usuario=self.user
+        )
+
+    def test_percentis_por_modelo_e_ano(self):
+        self.assertFalse(EstatisticaPreco.objects.filter(marca=3, modelo='onix').exists())
+        atualizar()
+        estatistica = EstatisticaPreco.objects.get(marca=3, modelo='onix', ano=2020)
+        self.assertEqual(estatistica.quantidade, 3)
+        self.assertEqual(estatistica.preco_p10, Decimal('42000.00'))
+        self.assertEqual(estatistica.preco_p50, Decimal('50000.00'))
+        self.assertEqual(estatistica.preco_p90, Decimal('58000.00'))
+        self.assertEqual(estatistica.preco_medio, Decimal('50000.00'))
+        self.assertEqual(estatistica.quilometragem_media, 20000)
+        self.assertEqual(preco_mercado(self.anuncios[1].veiculo), estatistica)
+
+        # Os dados só mudam na próxima atualização (também sem CONCURRENTLY)
+        self.anuncios[0].delete()
+        self.assertEqual(EstatisticaPreco.objects.get(marca=3, modelo='onix', ano=2020).quantidade, 3)
+        atualizar(concorrente=False)
+        self.assertEqual(EstatisticaPreco.objects.get(marca=3, modelo='onix', ano=2020).quantidade, 2)
+        self.assertIsNone(preco_mercado(self.anuncios[1].veiculo))
+
+    def test_oferta_diaria(self):
+        call_command('atualizar_estatisticas', stdout=io.StringIO())
+        oferta = OfertaDiaria.objects.get(dia=timezone.localdate(), marca=3)
+        self.assertEqual((oferta.novos, oferta.ativos), (5, 4))
+
+    def test_detalhe_abaixo_do_mercado(self):
+        atualizar()
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('anuncio:detalhar-anuncio', args=[self.anuncios[0].pk]))
+        self.assertContains(response, 'Abaixo do preço de mercado')
+        self.assertContains(response, '(3 anúncios)')
+        response = self.client.get(reverse('anuncio:detalhar-anuncio', args=[self.anuncios[2].pk]))
+        self.assertNotContains(response, 'Abaixo do preço de mercado')
+        self.assertContains(response, 'Preço mediano')
+
+    def test_api(self):
+        atualizar()
+        cabecalho = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token.key)}
+        response = self.client.get(
+            reverse('anuncio:api-estatisticas-precos'), {'marca': 'chevrolet', 'modelo': 'Onix '}, **cabecalho
+        )
+        self.assertEqual(response.status_code, 200)
+        resultados = response.json()['results']
+        self.assertEqual([(r['ano'], r['quantidade']) for r in resultados], [(2020, 3), (2024, 1)])
+        self.assertEqual(resultados[0]['marca_display'], 'CHEVROLET - GM')
+        self.assertEqual(resultados[0]['preco_p50'], '50000.00')
+        response = self.client.get(reverse('anuncio:api-estatisticas-precos'), {'minimo': '2'}, **cabecalho)
+        self.assertEqual(response.json()['count'], 1)
+
+        response = self.client.get(reverse('anuncio:api-estatisticas-oferta'), {'marca': '3'}, **cabecalho)
+        self.assertEqual(response.json()['results'][0]['novos'], 5)
+        self.assertEqual(self.client.get(reverse('anuncio:api-estatisticas-oferta')).status_code, 401)
+
+
+class TestesRoteadorReplicas(TestCase):
+    """
+    Leituras das listagens nas réplicas e leitura após escrita no primário
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        veiculo = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.anuncio = Anuncio.objects.create(
+            descricao='Onix', preco=Decimal('50000.00'), veiculo=veiculo, usuario=self.user
+        )
+
+    @override_settings(DB_REPLICAS_ALIASES=['replica1', 'replica2'])
+    def test_roteamento(self):
+        roteador = RoteadorReplicas()
+        self.assertEqual(roteador.db_for_read(Anuncio), 'default')
+        with leitura_replica():
+            self.assertIn(roteador.db_for_read(Anuncio), {'replica1', 'replica2'})
+            self.assertEqual(roteador.db_for_write(Anuncio), 'default')
+        self.assertFalse(roteador.allow_migrate('replica1', 'anuncio'))
+        self.assertTrue(roteador.allow_migrate('default', 'anuncio'))
+
+    @override_settings(DB_REPLICAS_ALIASES=['replica_inexistente'])
+    def test_autenticacao_no_primario(self):
+        token = Token.objects.create(user=self.user)
+        with leitura_replica():
+            self.assertEqual(Token.objects.select_related('user').get(key=token.key).user, self.user)
+            self.assertEqual(RoteadorReplicas().db_for_read(Session), 'default')
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'teste_cache'}},
+    )
+    def test_cache_em_banco(self):
+        # CACHE_BACKEND=banco: o cache grava pelo roteador com um modelo falso
+        call_command('createcachetable', stdout=io.StringIO())
+        token = Token.objects.create(user=self.user)
+        with self.settings(DB_REPLICAS_ALIASES=['default']):
+            response = self.client.get(reverse('anuncio:api-listar'), HTTP_AUTHORIZATION='Token {}'.format(token.key))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(cache.get(cache_tokens.chave_compartilhada(token.key)))
+        # Gravar no cache não fixa o cliente no primário
+        self.assertNotIn(COOKIE_PRIMARIO, response.cookies)
+
+    @override_settings(DB_REPLICAS_ALIASES=[])
+    def test_sem_replicas(self):
+        with leitura_replica():
+            self.assertEqual(RoteadorReplicas().db_for_read(Anuncio), 'default')
+
+    def test_cookie_primario(self):
+        fabrica = RequestFactory()
+        fabrica.cookies[COOKIE_PRIMARIO] = str(time.time() + 5)
+        self.assertTrue(fixado_no_primario(fabrica.get('/')))
+        fabrica.cookies[COOKIE_PRIMARIO] = str(time.time() - 1)
+        self.assertFalse(fixado_no_primario(fabrica.get('/')))
+        fabrica.cookies[COOKIE_PRIMARIO] = 'invalido'
+        self.assertFalse(fixado_no_primario(fabrica.get('/')))
+
+    @override_settings(DB_REPLICAS_ALIASES=['replica_inexistente'])
+    def test_escrita_fixa_no_primario(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('anuncio:marcar-vendido', args=[self.anuncio.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(COOKIE_PRIMARIO, response.cookies)
+        # Com o cookie, a listagem lê do primário (a réplica configurada não existe)
+        self.assertEqual(self.client.get(reverse('anuncio:listar-anuncios')).status_code, 200)
+
+    @override_settings(DB_REPLICAS_ALIASES=['default'])
+    def test_leitura_nao_fixa_no_primario(self):
+        response = self.client.get(reverse('anuncio:listar-anuncios'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(COOKIE_PRIMARIO, response.cookies)
+
+
+@skipUnless(settings.DB_REPLICAS_ALIASES, 'Configure DB_REPLICAS para testar com réplicas')
+class TestesReplicasConfiguradas(TransactionTestCase):
+    """
+    Com DB_REPLICAS (por exemplo, um segundo alias para o mesmo servidor)
+    """
+    databases = '__all__'
+    usa_replicas = True
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        veiculo = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.anuncio = Anuncio.objects.create(
+            descricao='Onix', preco=Decimal('50000.00'), veiculo=veiculo, usuario=self.user
+        )
+        self.replica = connections[settings.DB_REPLICAS_ALIASES[0]]
+
+    def test_listagem_na_replica(self):
+        with CaptureQueriesContext(self.replica) as consultas:
+            response = self.client.get(reverse('anuncio:listar-anuncios'))
+        self.assertContains(response, 'Onix')
+        self.assertTrue(consultas.captured_queries)
+
+    def test_exportacao_na_replica(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='can_export_anuncios'))
+        token = Token.objects.create(user=self.user)
+        response = self.client.get(reverse('anuncio:api-exportar'), HTTP_AUTHORIZATION='Token {}'.format(token.key))
+        # As linhas são lidas durante o envio, depois do dispatch
+        with CaptureQueriesContext(self.replica) as consultas:
+            conteudo = b''.join(response.streaming_content)
+        self.assertIn(b'Onix', conteudo)
+        self.assertTrue(consultas.captured_queries)
+
+    def test_leitura_apos_escrita_no_primario(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('anuncio:marcar-vendido', args=[self.anuncio.pk]))
+        with CaptureQueriesContext(self.replica) as consultas:
+            self.client.get(reverse('anuncio:listar-anuncios'), {'status': StatusAnuncio.VENDIDO})
+        self.assertFalse(consultas.captured_queries)
@@ -1,10 +1,26 @@
+import csv
+import gzip
+import io
+import json
+import pickle
+from unittest import mock
+
 import pytest
-from django.urls import reverse
-from rest_framework.test import APIClient
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework.authtoken.models import Token
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Permission, User
+from anuncio.contadores import contador_visualizacoes
 from anuncio.models import Anuncio, StatusAnuncio
 from veiculo.models import Veiculo
+from sistema.autenticacao import cache_tokens
+from sistema.conexoes import MedidorConexoes, medidor
 from decimal import Decimal
 
 @pytest.fixture
@@ -124,3 +140,601 @@ class TestAnuncioAPI:
         assert response.status_code == 200
         assert Decimal(response.data['results'][0]['preco']) > Decimal(response.data['results'][1]['preco'])
         assert response.data['results'][0]['id'] == anuncio.id
+
+    def test_paginacao_cursor_percorre_paginas(self, api_client, token, anuncio):
+        outros = [
+            Anuncio.objects.create(
+                descricao=f'Anúncio {i}',
+                preco=Decimal('30000.00') + i,
+                status=StatusAnuncio.ATIVO,
+                veiculo=anuncio.veiculo,
+                usuario=anuncio.usuario
+            )
+            for i in range(3)
+        ]
+
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        response = api_client.get(f"{url}?paginacao=cursor&ordering=preco&page_size=2")
+        assert response.status_code == 200
+        assert 'count' not in response.data
+        assert response.data['previous'] is None
+        assert [r['id'] for r in response.data['results']] == [outros[0].id, outros[1].id]
+
+        response = api_client.get(response.data['next'])
+        assert response.status_code == 200
+        assert [r['id'] for r in response.data['results']] == [outros[2].id, anuncio.id]
+        assert response.data['next'] is None
+
+        # Voltar para a página anterior
+        response = api_client.get(response.data['previous'])
+        assert [r['id'] for r in response.data['results']] == [outros[0].id, outros[1].id]
+        assert response.data['previous'] is None
+
+    def test_paginacao_cursor_total_aproximado(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(f"{url}?paginacao=cursor&total=aproximado")
+        assert response.status_code == 200
+        assert isinstance(response.data['count'], int)
+
+    def test_paginacao_cursor_invalido(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(f"{url}?cursor=invalido").status_code == 404
+        assert api_client.get(f"{url}?paginacao=cursor&ordering=visualizacoes").status_code == 400
+
+    def test_buscar_anuncios(self, api_client, token, anuncio):
+        Anuncio.objects.create(
+            descricao='Outro carro',
+            preco=Decimal('30000.00'),
+            status=StatusAnuncio.ATIVO,
+            veiculo=Veiculo.objects.create(marca=5, modelo='Uno', ano=2015, cor=1, combustivel=3),
+            usuario=anuncio.usuario
+        )
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(f"{url}?search=onix")
+        assert response.status_code == 200
+        assert [r['id'] for r in response.data['results']] == [anuncio.id]
+
+    def test_exportar_requer_permissao(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-exportar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(url)
+        assert response.status_code == 403
+
+    def test_exportar_csv_com_filtros(self, api_client, token, anuncio):
+        Anuncio.objects.create(
+            descricao='Fora do filtro', preco=Decimal('90000.00'), status=StatusAnuncio.ATIVO,
+            veiculo=anuncio.veiculo, usuario=anuncio.usuario
+        )
+        token.user.user_permissions.add(Permission.objects.get(codename='can_export_anuncios'))
+        url = reverse('anuncio:api-exportar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(f"{url}?preco_max=50000", HTTP_ACCEPT='text/csv')
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/csv')
+        linhas = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        assert [linha['id'] for linha in linhas] == [str(anuncio.id)]
+        assert linhas[0]['veiculo_marca'] == 'CHEVROLET - GM'
+        assert linhas[0]['usuario_username'] == 'testuser'
+
+    def test_exportar_ndjson_gzip(self, api_client, token, anuncio):
+        token.user.user_permissions.add(Permission.objects.get(codename='can_export_anuncios'))
+        url = reverse('anuncio:api-exportar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(f"{url}?formato=ndjson", HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        assert response['Content-Encoding'] == 'gzip'
+        linhas = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        assert [json.loads(linha)['preco'] for linha in linhas] == ['45000.00']
+
+    def test_exportar_le_da_replica(self, api_client, token, anuncio, settings):
+        from anuncio.views import APIExportarAnuncios
+        settings.DB_REPLICAS_ALIASES = ['replica_exportacao']
+        token.user.user_permissions.add(Permission.objects.get(codename='can_export_anuncios'))
+        exportados = []
+
+        def exportar(view, queryset, formato):
+            exportados.append(queryset)
+            return HttpResponse()
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        with mock.patch.object(APIExportarAnuncios, 'exportar', exportar):
+            assert api_client.get(reverse('anuncio:api-exportar')).status_code == 200
+        # Fora do dispatch, o queryset continua apontando para a réplica
+        assert exportados[0].db == 'replica_exportacao'
+
+    def test_exportar_formato_invalido(self, api_client, token, anuncio):
+        token.user.user_permissions.add(Permission.objects.get(codename='can_export_anuncios'))
+        url = reverse('anuncio:api-exportar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(f"{url}?formato=xlsx").status_code == 400
+
+
+@pytest.mark.django_db
+class TestAutenticacaoTokenEmCache:
+    """Testes para o cache de tokens da API"""
+
+    @pytest.fixture(autouse=True)
+    def limpar_cache(self):
+        cache.clear()
+        cache_tokens.limpar()
+
+    def test_segunda_chamada_nao_consulta_token(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-detalhe', kwargs={'pk': anuncio.id})
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(url).status_code == 200
+        with CaptureQueriesContext(connection) as consultas:
+            assert api_client.get(url).status_code == 200
+        assert not any('authtoken_token' in consulta['sql'] for consulta in consultas.captured_queries)
+        estatisticas = cache_tokens.estatisticas()
+        assert estatisticas['falhas'] == 1
+        assert estatisticas['acertos_locais'] == 1
+
+    def test_cache_compartilhado(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        api_client.get(url)
+        # Outro processo: LRU vazio, mas o cache compartilhado tem o token
+        cache_tokens.local.limpar()
+        assert api_client.get(url).status_code == 200
+        assert cache_tokens.estatisticas()['acertos_compartilhados'] == 1
+
+    def test_invalida_ao_desativar_usuario(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(url).status_code == 200
+        token.user.is_active = False
+        token.user.save()
+        assert api_client.get(url).status_code == 401
+
+    def test_invalida_de_novo_apos_o_commit(self, token, django_capture_on_commit_callbacks):
+        antigo = cache_tokens.obter(token.key)
+        with django_capture_on_commit_callbacks() as callbacks:
+            token.user.is_active = False
+            token.user.save()
+            # Requisição concorrente, antes do commit, relê e guarda a linha antiga
+            cache.set(cache_tokens.chave_compartilhada(token.key), pickle.dumps(antigo))
+        assert callbacks
+        for callback in callbacks:
+            callback()
+        assert not cache_tokens.obter(token.key).user.is_active
+
+    def test_invalida_ao_trocar_token(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(url).status_code == 200
+        usuario = token.user
+        token.delete()
+        novo = Token.objects.create(user=usuario)
+        assert api_client.get(url).status_code == 401
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {novo.key}')
+        assert api_client.get(url).status_code == 200
+
+    def test_token_invalido(self, api_client):
+        api_client.credentials(HTTP_AUTHORIZATION='Token invalido')
+        assert api_client.get(reverse('anuncio:api-listar')).status_code == 401
+
+    def test_requisicoes_nao_compartilham_usuario(self, token):
+        primeiro = cache_tokens.obter(token.key)
+        primeiro.user.first_name = 'Alterado'
+        assert cache_tokens.obter(token.key).user.first_name != 'Alterado'
+
+    def test_estatisticas(self, api_client, token, usuario):
+        url = reverse('autenticacao-api-estatisticas')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(url).status_code == 403
+        usuario.is_staff = True
+        usuario.save()
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert {'acertos_locais', 'acertos_compartilhados', 'falhas', 'taxa_acertos'} <= set(response.data)
+
+
+@pytest.mark.django_db
+class TestConexoesBanco:
+    """Medidas das conexões com o banco para monitoramento"""
+
+    def test_medidor(self):
+        medidor = MedidorConexoes()
+        medidor.obtida(0.002)
+        medidor.obtida(0.004)
+        medidor.devolvida()
+        assert medidor.estatisticas() == {
+            'conexoes_obtidas': 2, 'conexoes_em_uso': 1, 'espera_media_ms': 3.0, 'espera_maxima_ms': 4.0,
+        }
+
+    def test_conexao_registrada(self):
+        # A conexão dos testes foi aberta pelo backend sistema.banco
+        connection.ensure_connection()
+        assert medidor(connection.alias).estatisticas()['conexoes_obtidas'] >= 1
+
+    def test_estatisticas(self, api_client, token, usuario):
+        url = reverse('banco-api-estatisticas')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(url).status_code == 403
+        usuario.is_staff = True
+        usuario.save()
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response.data['modo'] == 'persistente'
+        assert response.data['health_checks'] is True
+        assert {'conexoes_obtidas', 'conexoes_em_uso', 'espera_media_ms', 'espera_maxima_ms'} <= set(response.data)
+
+
+@pytest.mark.django_db
+class TestListagemProjetada:
+    """A listagem por projeção deve gerar o mesmo JSON do serializador"""
+
+    @pytest.fixture
+    def dados(self, usuario, anuncio):
+        veiculo = Veiculo.objects.create(
+            marca=5, modelo='Argo', ano=2015, cor=4, combustivel=1, quilometragem=80000,
+            placa='ABC1D23', chassi='9BWZZZ377VT004251', foto='veiculo/fotos/argo.jpg'
+        )
+        Anuncio.objects.create(
+            descricao='Argo revisado', preco=Decimal('52000.50'), status=StatusAnuncio.PAUSADO,
+            destaque=True, veiculo=veiculo, usuario=usuario
+        )
+
+    @pytest.mark.parametrize('rota,parametros', [
+        ('anuncio:api-listar', ''),
+        ('anuncio:api-listar', '?ordering=preco'),
+        ('anuncio:api-listar', '?paginacao=cursor&total=aproximado'),
+        ('anuncio:api-listar', '?search=argo'),
+        ('veiculo:api-listar-veiculos', ''),
+        ('veiculo:api-listar-veiculos', '?paginacao=cursor'),
+    ])
+    def test_json_identico(self, api_client, token, dados, settings, rota, parametros):
+        url = reverse(rota) + parametros
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        settings.API_LISTAGEM_PROJETADA = False
+        esperado = api_client.get(url)
+        settings.API_LISTAGEM_PROJETADA = True
+        obtido = api_client.get(url)
+        assert esperado.status_code == obtido.status_code == 200
+        assert len(json.loads(obtido.content)['results']) >= 1
+        assert obtido.content == esperado.content
+
+
+@pytest.mark.django_db
+class TestSelecaoCampos:
+    """Testes para ?fields= e ?expand= nas APIs"""
+
+    CAMPOS_APP = 'id,preco,veiculo_info.marca,veiculo_info.modelo,veiculo_info.ano,veiculo_info.foto_variantes'
+
+    def consultar(self, api_client, token, url):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        with CaptureQueriesContext(connection) as consultas:
+            response = api_client.get(url)
+        sql = [consulta['sql'] for consulta in consultas.captured_queries if 'FROM "anuncio_anuncio"' in consulta['sql']]
+        return response, sql
+
+    @pytest.mark.parametrize('projetada', [True, False])
+    def test_campos_do_aplicativo(self, api_client, token, anuncio, settings, projetada):
+        settings.API_LISTAGEM_PROJETADA = projetada
+        response, sql = self.consultar(api_client, token, reverse('anuncio:api-listar') + '?fields=' + self.CAMPOS_APP)
+        assert response.status_code == 200
+        item = response.data['results'][0]
+        assert list(item) == ['id', 'preco', 'veiculo_info']
+        assert set(item['veiculo_info']) == {'marca', 'modelo', 'ano', 'foto_variantes'}
+        assert item['veiculo_info']['modelo'] == 'Onix'
+        consulta = sql[-1]
+        assert '"descricao"' not in consulta
+        assert 'auth_user' not in consulta
+        assert '"veiculo_veiculo"."chassi"' not in consulta
+
+    def test_sem_expansao(self, api_client, token, anuncio):
+        response, sql = self.consultar(api_client, token, reverse('anuncio:api-listar') + '?expand=')
+        item = response.data['results'][0]
+        assert 'veiculo_info' not in item and 'usuario_info' not in item
+        assert item['descricao'] == 'Anúncio de teste'
+        # Só o join com a tabela de leitura da listagem, usada nos filtros
+        assert 'veiculo_veiculo' not in sql[-1] and 'auth_user' not in sql[-1]
+
+    def test_detalhe(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-detalhe', kwargs={'pk': anuncio.id})
+        response, sql = self.consultar(api_client, token, url + '?fields=id,visualizacoes,usuario_info.username&expand=usuario_info')
+        assert response.status_code == 200
+        assert response.data == {'id': anuncio.id, 'visualizacoes': 1, 'usuario_info': {'username': 'testuser'}}
+        assert len(sql) == 1
+        # Do veículo, só o updated_at usado no ETag
+        assert '"descricao"' not in sql[0] and '"veiculo_veiculo"."modelo"' not in sql[0]
+
+    def test_cursor_com_campos(self, api_client, token, anuncio, veiculo, usuario):
+        Anuncio.objects.create(descricao='Outro', preco=Decimal('1000.00'), veiculo=veiculo, usuario=usuario)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(reverse('anuncio:api-listar'), {'paginacao': 'cursor', 'page_size': 1, 'fields': 'id'})
+        assert response.status_code == 200
+        assert response.data['results'][0].keys() == {'id'}
+        assert response.data['next']
+
+    @pytest.mark.parametrize('parametros', [
+        {'fields': 'id,senha'},
+        {'fields': 'veiculo_info.inexistente'},
+        {'fields': 'preco.valor'},
+        {'fields': 'veiculo_info.modelo', 'expand': 'usuario_info'},
+        {'expand': 'veiculo'},
+        {'fields': ','},
+    ])
+    def test_campos_invalidos(self, api_client, token, anuncio, parametros):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(reverse('anuncio:api-listar'), parametros)
+        assert response.status_code == 400
+
+    def test_veiculos(self, api_client, token, veiculo):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(reverse('veiculo:api-listar-veiculos'), {'fields': 'id,modelo,marca_display'})
+        assert response.status_code == 200
+        assert response.data['results'][0] == {'id': veiculo.id, 'modelo': 'Onix', 'marca_display': 'CHEVROLET - GM'}
+        assert api_client.get(reverse('veiculo:api-listar-veiculos'), {'expand': 'usuario_info'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestRespostaCondicional:
+    """Testes para ETag e 304 nas APIs"""
+
+    def test_listagem_304_sem_consultar_pagina(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response['Cache-Control'] == 'private, no-cache'
+        assert 'Authorization' in response['Vary']
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert response.content == b''
+        assert len([c for c in consultas.captured_queries if 'anuncio_anuncio' in c['sql']]) == 1
+
+    def test_cursor_sem_agregar_o_conjunto(self, api_client, token, anuncio, django_assert_num_queries):
+        url = reverse('anuncio:api-listar') + '?paginacao=cursor'
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        etag = api_client.get(url)['ETag']
+        # Só a consulta da página (o token já está em cache)
+        with django_assert_num_queries(1) as consultas:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert 'COUNT(' not in consultas.captured_queries[0]['sql']
+        assert 'SUM(' not in consultas.captured_queries[0]['sql']
+        assert 'LIMIT' in consultas.captured_queries[0]['sql']
+        Anuncio.objects.filter(pk=anuncio.pk).update(visualizacoes=10)
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_listagem_muda_etag(self, api_client, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, {'ordering': 'preco'}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        Anuncio.objects.filter(pk=anuncio.pk).update(visualizacoes=10)
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        etag = api_client.get(url)['ETag']
+        anuncio.veiculo.quilometragem = 20000
+        anuncio.veiculo.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        etag = api_client.get(url)['ETag']
+        anuncio.delete()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_detalhe_304(self, api_client, token, anuncio, visualizacoes_em_buffer):
+        url = reverse('anuncio:api-detalhe', kwargs={'pk': anuncio.id})
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        response = api_client.get(url + '?fields=id', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert api_client.get(url + '?fields=id', HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+        # Com as visualizações gravadas, o contador da resposta mudou
+        visualizacoes_em_buffer.descarregar()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        etag = response['ETag']
+        anuncio.descricao = 'Nova descrição'
+        anuncio.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_veiculos_304(self, api_client, token, veiculo):
+        url = reverse('veiculo:api-listar-veiculos')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+@pytest.fixture
+def visualizacoes_em_buffer(settings):
+    """
+    Visualizações no buffer, descarregado só pelo teste (e ao final dele)
+    """
+    settings.ANUNCIO_VISUALIZACOES_MODO = 'buffer'
+    settings.ANUNCIO_VISUALIZACOES_INTERVALO = 0
+    yield contador_visualizacoes
+    contador_visualizacoes.descarregar()
+
+
+@pytest.fixture
+def api_assincrona():
+    """
+    Recarrega as URLs com as views assíncronas da API e restaura as síncronas ao final
+    """
+    from sistema.assincrono import recarregar_urls
+    with override_settings(API_ASSINCRONA=True):
+        recarregar_urls('anuncio.urls', 'veiculo.urls')
+        yield AsyncClient()
+    recarregar_urls('anuncio.urls', 'veiculo.urls')
+
+
+def obter(cliente, url, token=None, **kwargs):
+    headers = {'Authorization': f'Token {token.key}'} if token else {}
+    headers.update(kwargs.pop('headers', {}))
+    return async_to_sync(cliente.get)(url, headers=headers, **kwargs)
+
+
+@pytest.mark.django_db
+class TestAPIAssincrona:
+    """Testes para as views assíncronas da API (API_ASSINCRONA)"""
+
+    def test_rotas_assincronas(self, api_assincrona):
+        assert iscoroutinefunction(resolve(reverse('anuncio:api-listar')).func)
+        assert iscoroutinefunction(resolve(reverse('anuncio:api-detalhe', kwargs={'pk': 1})).func)
+        assert iscoroutinefunction(resolve(reverse('veiculo:api-listar-veiculos')).func)
+        assert iscoroutinefunction(resolve(reverse('veiculo:foto-veiculo', args=['carro.jpg'])).func)
+
+    def test_listagem_igual_a_sincrona(self, api_assincrona, token, anuncio):
+        from anuncio.views import APIListarAnuncios
+        url = reverse('anuncio:api-listar') + '?fields=id,preco,veiculo_info.modelo'
+        request = APIRequestFactory().get(url, HTTP_AUTHORIZATION=f'Token {token.key}')
+        sincrona = APIListarAnuncios.as_view()(request).render()
+        assincrona = obter(api_assincrona, url, token)
+        assert assincrona.status_code == 200
+        assert assincrona.json() == json.loads(sincrona.content)
+        assert assincrona['ETag'] == sincrona['ETag']
+
+    def test_listagem_exige_token(self, api_assincrona, anuncio):
+        response = obter(api_assincrona, reverse('anuncio:api-listar'))
+        assert response.status_code == 401
+        response = obter(api_assincrona, reverse('anuncio:api-listar'), headers={'Authorization': 'Token invalido'})
+        assert response.status_code == 401
+
+    def test_listagem_304_e_erros(self, api_assincrona, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        response = obter(api_assincrona, url, token)
+        assert response.json()['count'] == 1
+        response = obter(api_assincrona, url, token, headers={'If-None-Match': response['ETag']})
+        assert response.status_code == 304
+        assert obter(api_assincrona, url + '?fields=inexistente', token).status_code == 400
+
+    def test_detalhe(self, api_assincrona, token, anuncio, visualizacoes_em_buffer):
+        url = reverse('anuncio:api-detalhe', kwargs={'pk': anuncio.id})
+        response = obter(api_assincrona, url, token)
+        assert response.status_code == 200
+        assert response.json()['descricao'] == 'Anúncio de teste'
+        assert obter(api_assincrona, url, token, headers={'If-None-Match': response['ETag']}).status_code == 304
+        visualizacoes_em_buffer.descarregar()
+        anuncio.refresh_from_db()
+        assert anuncio.visualizacoes == 2
+        assert obter(api_assincrona, url, token, headers={'If-None-Match': response['ETag']}).status_code == 200
+        url = reverse('anuncio:api-detalhe', kwargs={'pk': anuncio.id + 1000})
+        assert obter(api_assincrona, url, token).status_code == 404
+
+    def test_metodo_nao_permitido(self, api_assincrona, token, anuncio):
+        url = reverse('anuncio:api-listar')
+        response = async_to_sync(api_assincrona.post)(url, headers={'Authorization': f'Token {token.key}'})
+        assert response.status_code == 405
+
+    def test_veiculos(self, api_assincrona, token, veiculo):
+        response = obter(api_assincrona, reverse('veiculo:api-listar-veiculos'), token)
+        assert response.status_code == 200
+        assert response.json()['results'][0]['modelo'] == 'Onix'
+
+    def test_foto(self, api_assincrona, settings, tmp_path, usuario, veiculo):
+        from django.core.files.storage import default_storage
+        from veiculo.entrega import url_foto
+        settings.MEDIA_ROOT = str(tmp_path)
+        conteudo = bytes(range(256)) * 4
+        nome = default_storage.save('veiculo/fotos/carro.jpg', io.BytesIO(conteudo))
+        Veiculo.objects.filter(pk=veiculo.pk).update(foto=nome)
+
+        response = obter(api_assincrona, url_foto(nome), headers={'Range': 'bytes=10-19'})
+        assert response.status_code == 206
+        assert async_to_sync(juntar)(response.streaming_content) == conteudo[10:20]
+
+        url = reverse('veiculo:foto-veiculo', args=[nome.rpartition('/')[2]])
+        assert obter(api_assincrona, url).status_code == 302
+        api_assincrona.force_login(usuario)
+        response = obter(api_assincrona, url)
+        assert response.status_code == 200
+        assert response['Cache-Control'] == 'private, no-cache'
+        assert async_to_sync(juntar)(response.streaming_content) == conteudo
+        assert obter(api_assincrona, url.replace('carro', 'outro')).status_code == 404
+
+
+async def juntar(blocos):
+    return b''.join([bloco async for bloco in blocos])
+
+
+@pytest.mark.django_db
+class TestFacetas:
+    """Testes para as facetas da listagem de anúncios"""
+
+    @pytest.fixture
+    def anuncios(self, usuario):
+        dados = [
+            # marca, combustivel, ano, preco, status
+            (5, 3, 2012, '30000.00', StatusAnuncio.ATIVO),
+            (5, 2, 2018, '80000.00', StatusAnuncio.ATIVO),
+            (9, 3, 2021, '150000.00', StatusAnuncio.ATIVO),
+            (9, 3, 2021, '140000.00', StatusAnuncio.PAUSADO),
+        ]
+        for marca, combustivel, ano, preco, status in dados:
+            veiculo = Veiculo.objects.create(marca=marca, modelo='Modelo', ano=ano, cor=1, combustivel=combustivel)
+            Anuncio.objects.create(
+                descricao='Anúncio', preco=Decimal(preco), status=status, veiculo=veiculo, usuario=usuario
+            )
+
+    def facetas(self, api_client, token, **filtros):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(reverse('anuncio:api-facetas'), filtros)
+        assert response.status_code == 200
+        return response.json()
+
+    @staticmethod
+    def totais(resposta, dimensao):
+        return {opcao['valor']: opcao['total'] for opcao in resposta['facetas'][dimensao] if opcao['total']}
+
+    def test_sem_filtros(self, api_client, token, anuncios):
+        resposta = self.facetas(api_client, token)
+        assert resposta['total'] == 3
+        assert self.totais(resposta, 'marca') == {5: 2, 9: 1}
+        assert self.totais(resposta, 'combustivel') == {3: 2, 2: 1}
+        assert self.totais(resposta, 'ano') == {'2010-2014': 1, '2015-2019': 1, '2020-': 1}
+        assert self.totais(resposta, 'preco') == {'20000-40000': 1, '70000-120000': 1, '120000-': 1}
+        assert self.totais(resposta, 'status') == {'ativo': 3, 'pausado': 1}
+
+    def test_faceta_ignora_propria_dimensao(self, api_client, token, anuncios):
+        resposta = self.facetas(api_client, token, marca='fiat')
+        assert resposta['total'] == 2
+        # Outras marcas continuam contadas, para a troca de marca
+        assert self.totais(resposta, 'marca') == {5: 2, 9: 1}
+        assert self.totais(resposta, 'combustivel') == {3: 1, 2: 1}
+        assert self.totais(resposta, 'status') == {'ativo': 2}
+
+        resposta = self.facetas(api_client, token, marca='fiat', combustivel='flex', status='pausado')
+        assert resposta['total'] == 0
+        assert self.totais(resposta, 'status') == {'ativo': 1}
+        assert self.totais(resposta, 'marca') == {9: 1}
+        assert self.totais(resposta, 'combustivel') == {}
+
+    def test_faixas_selecionam_a_listagem(self, client, api_client, token, anuncios):
+        resposta = self.facetas(api_client, token)
+        for dimensao, (minimo, maximo) in (('ano', ('ano_min', 'ano_max')), ('preco', ('preco_min', 'preco_max'))):
+            for opcao in resposta['facetas'][dimensao]:
+                parametros = {nome: opcao[nome] for nome in (minimo, maximo) if opcao[nome] is not None}
+                listagem = client.get(reverse('anuncio:listar-anuncios'), parametros)
+                assert listagem.context['paginator'].count == opcao['total']
+
+    def test_uma_consulta_e_cache(self, api_client, token, anuncios):
+        with CaptureQueriesContext(connection) as consultas:
+            primeira = self.facetas(api_client, token, keyword='modelo', ano_min='2015')
+        assert len([c for c in consultas.captured_queries if 'anuncio_anuncio' in c['sql']]) == 1
+        with CaptureQueriesContext(connection) as consultas:
+            segunda = self.facetas(api_client, token, keyword=' modelo ', ano_min='02015', ordem='preco')
+        assert not [c for c in consultas.captured_queries if 'anuncio_anuncio' in c['sql']]
+        assert segunda == primeira
+        assert primeira['total'] == 2
+
+        # Gravações invalidam as facetas junto com as páginas da listagem
+        Anuncio.objects.filter(status=StatusAnuncio.PAUSADO).get().veiculo.delete()
+        terceira = self.facetas(api_client, token, keyword='modelo', ano_min='2015')
+        assert self.totais(terceira, 'status') == {'ativo': 2}
+
+    def test_exige_autenticacao(self, api_client, anuncios):
+        assert api_client.get(reverse('anuncio:api-facetas')).status_code == 401
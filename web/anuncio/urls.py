@@ -1,7 +1,9 @@
 from django.urls import path
+from sistema.assincrono import visao
 from anuncio.views import (
     ListarAnuncios, CriarAnuncios, DeletarAnuncio, EditarAnuncios,
-    DetalharAnuncio, APIListarAnuncios, APIDetalheAnuncio, marcar_anuncio_vendido
+    DetalharAnuncio, APIListarAnuncios, APIExportarAnuncios, APIFacetasAnuncios, APIDetalheAnuncio,
+    APIEstatisticasPrecos, APIOfertaDiaria, marcar_anuncio_vendido
 )
 
 app_name = 'anuncio'
@@ -16,6 +18,10 @@ urlpatterns = [
     path('marcar-vendido/<int:pk>/', marcar_anuncio_vendido, name='marcar-vendido'),
     
     # API endpoints
-    path('api/', APIListarAnuncios.as_view(), name='api-listar'),
-    path('api/<int:pk>/', APIDetalheAnuncio.as_view(), name='api-detalhe'),
+    path('api/', visao(APIListarAnuncios), name='api-listar'),
+    path('api/exportar/', APIExportarAnuncios.as_view(), name='api-exportar'),
+    path('api/facetas/', APIFacetasAnuncios.as_view(), name='api-facetas'),
+    path('api/estatisticas/precos/', APIEstatisticasPrecos.as_view(), name='api-estatisticas-precos'),
+    path('api/estatisticas/oferta/', APIOfertaDiaria.as_view(), name='api-estatisticas-oferta'),
+    path('api/<int:pk>/', visao(APIDetalheAnuncio), name='api-detalhe'),
 ]
\ No newline at end of file
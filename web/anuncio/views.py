@@ -1,24 +1,44 @@
-from django.shortcuts import render, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, aget_object_or_404, get_object_or_404
 from django.urls import reverse_lazy
-from django.db.models import Q
+from django.db.models import Count, Max, Q, Sum
 from django.utils import timezone
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.http import JsonResponse
 from django.core.exceptions import PermissionDenied
 
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.generics import ListAPIView, RetrieveAPIView
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import filters
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from anuncio.models import Anuncio, StatusAnuncio
-from anuncio.serializers import AnuncioSerializer
-from sistema.bibliotecas import LoginObrigatorio
+from anuncio.models import (
+    Anuncio, EstatisticaPreco, OfertaDiaria, StatusAnuncio, filtro_anuncios_ativos, filtro_status
+)
+from anuncio.busca import BuscaAnunciosFilter, buscar_anuncios
+from anuncio.cache_listagem import chave_pagina, guardar_pagina, obter_pagina
+from anuncio.estatisticas import chave_modelo, preco_mercado
+from anuncio.facetas import obter_facetas
+from anuncio.filtros import condicoes, ler_filtros
+from anuncio.listagem import OrdenacaoListagemFilter, na_listagem, ordem_listagem
+from anuncio.serializers import AnuncioSerializer, EstatisticaPrecoSerializer, OfertaDiariaSerializer
+from anuncio.similares import obter_similares, semente_diaria
+from sistema.assincrono import APIAssincronaMixin
+from sistema.autenticacao import TokenEmCache
+from sistema.bibliotecas import LoginObrigatorio, ObjetoMemorizado
+from sistema.condicional import RespostaCondicionalMixin
+from sistema.exportacao import ExportacaoMixin, PodeExportar, data_hora_iso
+from sistema.paginacao import PaginacaoCursorMixin
+from sistema.projecao import ListagemProjetadaMixin
+from sistema.roteador import LeituraReplicaMixin
+from sistema.selecao import SelecaoCamposMixin
+from veiculo.catalogo import MARCAS
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from anuncio.forms import FormularioAnuncio
 
-class ListarAnuncios(ListView):
+class ListarAnuncios(LeituraReplicaMixin, ListView):
     """
     View para listar anúncios cadastrados.
     Permite filtrar por status, preço e marca do veículo.
@@ -29,57 +49,57 @@ class ListarAnuncios(ListView):
     template_name = 'anuncio/listar.html'
     paginate_by = 10
     
+    def get(self, request, *args, **kwargs):
+        # Visitantes anônimos recebem a página do cache compartilhado
+        chave = None
+        if not request.user.is_authenticated:
+            chave = chave_pagina(self.filtros(), request.GET.get(self.page_kwarg, '1'))
+        if chave:
+            resposta = obter_pagina(chave)
+            if resposta is not None:
+                return resposta
+        resposta = super().get(request, *args, **kwargs)
+        if chave:
+            resposta.add_post_render_callback(lambda renderizada: guardar_pagina(chave, renderizada))
+        return resposta
+
+    def filtros(self):
+        """
+        Filtros da URL normalizados (ver ``anuncio.filtros``): URLs
+        equivalentes (e parâmetros desconhecidos) levam ao mesmo filtro
+
+        Returns:
+            dict: keyword, status, preco_min, preco_max, marca, combustivel,
+            ano_min, ano_max e ordem
+        """
+        if not hasattr(self, '_filtros'):
+            self._filtros = ler_filtros(self.request.GET)
+        return self._filtros
+
     def get_queryset(self):
         """
         Retorna queryset filtrado conforme parâmetros da URL
         """
+        filtros = self.filtros()
         queryset = Anuncio.objects.select_related('veiculo', 'usuario')
         
-        # Verificar e atualizar anúncios expirados
-        hoje = timezone.now().date()
-        Anuncio.objects.filter(
-            status=StatusAnuncio.ATIVO,
-            data_expiracao__lt=hoje
-        ).update(status=StatusAnuncio.EXPIRADO)
-        
-        # Filtro por palavra-chave (busca em descrição e modelo do veículo)
-        keyword = self.request.GET.get('keyword', '').strip()
+        # Filtro por palavra-chave (busca textual em descrição, modelo e marca do veículo)
+        keyword = filtros['keyword']
         if keyword:
-            queryset = queryset.filter(
-                Q(descricao__icontains=keyword) | 
-                Q(veiculo__modelo__icontains=keyword)
-            )
+            queryset = buscar_anuncios(queryset, keyword)
             
-        # Filtro por status
-        status = self.request.GET.get('status')
-        if status and status in dict(StatusAnuncio.choices):
-            queryset = queryset.filter(status=status)
-        else:
-            # Por padrão, mostrar apenas anúncios ativos
-            queryset = queryset.filter(status=StatusAnuncio.ATIVO)
+        # Status (por padrão, apenas anúncios ativos), preço, marca, combustível e ano,
+        # resolvidos na tabela de leitura da listagem (sem join com o veículo)
+        queryset = queryset.filter(*[na_listagem(condicao) for condicao in condicoes(filtros).values()])
             
-        # Filtro por faixa de preço
-        preco_min = self.request.GET.get('preco_min')
-        if preco_min:
-            queryset = queryset.filter(preco__gte=preco_min)
-            
-        preco_max = self.request.GET.get('preco_max')
-        if preco_max:
-            queryset = queryset.filter(preco__lte=preco_max)
-            
-        # Filtro por marca do veículo
-        marca = self.request.GET.get('marca')
-        if marca:
-            queryset = queryset.filter(veiculo__marca=marca)
-            
-        # Ordenação
-        ordem = self.request.GET.get('ordem', '-created_at')
-        if ordem == 'preco':
-            queryset = queryset.order_by('preco')
-        elif ordem == '-preco':
-            queryset = queryset.order_by('-preco')
+        # Ordenação (por relevância quando houver busca sem ordem escolhida)
+        ordem = filtros['ordem']
+        if ordem in ('preco', '-preco'):
+            queryset = queryset.order_by(*ordem_listagem(ordem))
+        elif keyword and not ordem:
+            queryset = queryset.order_by(*ordem_listagem('-relevancia', '-destaque', '-created_at'))
         else:
-            queryset = queryset.order_by('-destaque', '-created_at')
+            queryset = queryset.order_by(*ordem_listagem('-destaque', '-created_at'))
             
         return queryset
         
@@ -91,15 +111,9 @@ class ListarAnuncios(ListView):
         
         from veiculo.consts import OPCOES_MARCAS
         
-        # Adicionar filtros ativos
-        context['filtros_ativos'] = {
-            'keyword': self.request.GET.get('keyword', ''),
-            'status': self.request.GET.get('status', ''),
-            'preco_min': self.request.GET.get('preco_min', ''),
-            'preco_max': self.request.GET.get('preco_max', ''),
-            'marca': self.request.GET.get('marca', ''),
-            'ordem': self.request.GET.get('ordem', '-created_at'),
-        }
+        # Adicionar filtros ativos (já normalizados: o cache da página depende só deles)
+        context['filtros_ativos'] = dict(self.filtros())
+        context['filtros_ativos']['ordem'] = context['filtros_ativos']['ordem'] or '-created_at'
         
         # Adicionar opções de filtro
         context['opcoes_status'] = StatusAnuncio.choices
@@ -123,7 +137,7 @@ class AnuncioOwnerMixin(UserPassesTestMixin):
         """
         anuncio = self.get_object()
         return (
-            self.request.user == anuncio.usuario or 
+            self.request.user.pk == anuncio.usuario_id or 
             self.request.user.is_staff or
             self.request.user.has_perm('anuncio.can_view_all_anuncios')
         )
@@ -135,38 +149,34 @@ class AnuncioOwnerMixin(UserPassesTestMixin):
         raise PermissionDenied("Você não tem permissão para acessar este anúncio.")
 
 
-class DetalharAnuncio(DetailView):
+class DetalharAnuncio(ObjetoMemorizado, DetailView):
     """
     View para detalhar um anúncio específico
     """
     model = Anuncio
     template_name = 'anuncio/detalhar.html'
     context_object_name = 'anuncio'
+    select_related_objeto = ('veiculo', 'usuario')
     
-    def get_object(self, queryset=None):
+    def objeto_obtido(self, obj):
         """
         Incrementa visualização ao visualizar o anúncio
         """
-        obj = super().get_object(queryset)
         obj.incrementar_visualizacao()
-        return obj
     
     def get_context_data(self, **kwargs):
         """
         Adiciona anúncios relacionados ao contexto
         """
         context = super().get_context_data(**kwargs)
-        anuncio = self.get_object()
-        
-        # Adicionar anúncios semelhantes (mesma marca, preço similar)
-        anuncios_similares = Anuncio.objects.filter(
-            status=StatusAnuncio.ATIVO,
-            veiculo__marca=anuncio.veiculo.marca
-        ).exclude(
-            id=anuncio.id
-        ).order_by('?')[:4]  # Ordem aleatória, limitado a 4
+        anuncio = self.object
         
-        context['anuncios_similares'] = anuncios_similares
+        # Adicionar anúncios semelhantes (lista pré-calculada, com rotação diária)
+        context['anuncios_similares'] = obter_similares(
+            anuncio, quantidade=4, semente=semente_diaria(anuncio)
+        )
+        # Preço de mercado do modelo (visão materializada, uma linha por chave)
+        context['preco_mercado'] = preco_mercado(anuncio.veiculo)
         return context
 
 
@@ -210,7 +220,7 @@ class CriarAnuncios(LoginObrigatorio, CreateView):
         return super().form_valid(form)
 
 
-class EditarAnuncios(LoginObrigatorio, AnuncioOwnerMixin, UpdateView):
+class EditarAnuncios(LoginObrigatorio, AnuncioOwnerMixin, ObjetoMemorizado, UpdateView):
     """
     View para editar anúncios já cadastrados.
     Apenas o proprietário ou administradores podem editar.
@@ -237,133 +247,271 @@ class EditarAnuncios(LoginObrigatorio, AnuncioOwnerMixin, UpdateView):
         return form
 
 
-class DeletarAnuncio(LoginObrigatorio, AnuncioOwnerMixin, DeleteView):
+class DeletarAnuncio(LoginObrigatorio, AnuncioOwnerMixin, ObjetoMemorizado, DeleteView):
     """
     View para deletar anúncios.
     Apenas o proprietário ou administradores podem deletar.
     """
     model = Anuncio
+    select_related_objeto = ('veiculo',)
     template_name = 'anuncio/deletar.html'
     success_url = reverse_lazy('anuncio:listar-anuncios')
 
 
-class AnuncioApiPagination(PageNumberPagination):
+class AnuncioApiPagination(PaginacaoCursorMixin, PageNumberPagination):
     """
     Configuração de paginação para API de Anúncios
+
+    Aceita ``?paginacao=cursor`` para paginação por cursor, sem contagem.
     """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 50
+    ordenacoes_cursor = {
+        '': ('-destaque', '-created_at', 'id'),
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'preco': ('preco', 'id'),
+        '-preco': ('-preco', '-id'),
+    }
 
 
-class APIListarAnuncios(ListAPIView):
+class APIListarAnuncios(
+    LeituraReplicaMixin, RespostaCondicionalMixin, SelecaoCamposMixin, ListagemProjetadaMixin, APIAssincronaMixin,
+    ListAPIView
+):
     """
     API endpoint que permite listar anúncios
     
     * Requer autenticação por token
     * Suporta filtragem por status, preço, usuário
-    * Suporta busca por palavra-chave
+    * Suporta busca textual por palavra-chave (``search``), ordenada por relevância
     * Suporta ordenação
+    * Aceita ``fields`` e ``expand`` (ver ``sistema.selecao``)
+    * Responde 304 para ``If-None-Match`` (ver ``sistema.condicional``)
     """
     serializer_class = AnuncioSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenEmCache]
     permission_classes = [IsAuthenticated]
     pagination_class = AnuncioApiPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['descricao', 'veiculo__modelo']
+    filter_backends = [OrdenacaoListagemFilter, BuscaAnunciosFilter]
     ordering_fields = ['preco', 'created_at', 'visualizacoes']
     ordering = ['-created_at']
+    # As visualizações são gravadas sem alterar updated_at
+    agregados_etag = {
+        'atualizado': Max('updated_at'),
+        'veiculo_atualizado': Max('veiculo__updated_at'),
+        'visualizacoes': Sum('visualizacoes'),
+        'total': Count('pk'),
+    }
 
     def get_queryset(self):
         """
         Filtra anúncios com base em parâmetros da requisição
         """
         queryset = Anuncio.objects.select_related('veiculo', 'usuario')
-        
-        # Verificar e atualizar anúncios expirados
-        hoje = timezone.now().date()
-        Anuncio.objects.filter(
-            status=StatusAnuncio.ATIVO,
-            data_expiracao__lt=hoje
-        ).update(status=StatusAnuncio.EXPIRADO)
+        # Os filtros usam as colunas da tabela de leitura da listagem (anuncio.listagem)
         
         # Filtrar por status
         status = self.request.query_params.get('status')
         if status and status in dict(StatusAnuncio.choices):
-            queryset = queryset.filter(status=status)
+            queryset = queryset.filter(na_listagem(filtro_status(status)))
         
         # Filtrar por preço mínimo
         preco_min = self.request.query_params.get('preco_min')
         if preco_min:
-            queryset = queryset.filter(preco__gte=preco_min)
+            queryset = queryset.filter(listagem__preco__gte=preco_min)
         
         # Filtrar por preço máximo
         preco_max = self.request.query_params.get('preco_max')
         if preco_max:
-            queryset = queryset.filter(preco__lte=preco_max)
+            queryset = queryset.filter(listagem__preco__lte=preco_max)
         
         # Filtrar por marca do veículo
         marca = self.request.query_params.get('marca')
         if marca:
-            queryset = queryset.filter(veiculo__marca=marca)
+            queryset = queryset.filter(listagem__marca__in=MARCAS.resolver(marca))
         
         # Filtrar por ano do veículo
         ano = self.request.query_params.get('ano')
         if ano:
-            queryset = queryset.filter(veiculo__ano=ano)
+            queryset = queryset.filter(listagem__ano=ano)
         
         # Filtrar por usuário (apenas para administradores ou o próprio usuário)
         user_id = self.request.query_params.get('user_id')
         if user_id:
             if self.request.user.is_staff or int(user_id) == self.request.user.id:
-                queryset = queryset.filter(usuario_id=user_id)
+                queryset = queryset.filter(listagem__usuario_id=user_id)
             else:
                 return Anuncio.objects.none()  # Retorna conjunto vazio se não tiver permissão
             
         # Se não for staff e não estiver filtrando por usuário, mostrar apenas anúncios ativos
         elif not self.request.user.is_staff:
-            queryset = queryset.filter(
-                Q(status=StatusAnuncio.ATIVO) | 
-                Q(usuario=self.request.user)
-            )
+            queryset = queryset.filter(na_listagem(
+                filtro_anuncios_ativos() | 
+                Q(usuario_id=self.request.user.pk)
+            ))
             
         return queryset
 
 
-class APIDetalheAnuncio(RetrieveAPIView):
+class APIExportarAnuncios(ExportacaoMixin, APIListarAnuncios):
+    """
+    API endpoint que exporta os anúncios em CSV ou NDJSON (``?formato=``)
+
+    * Requer autenticação por token e a permissão ``can_export_anuncios``
+    * Aceita os mesmos filtros, busca e ordenação da listagem
+    """
+    permission_classes = [IsAuthenticated, PodeExportar]
+    permissao_exportacao = 'anuncio.can_export_anuncios'
+    nome_exportacao = 'anuncios'
+    colunas_exportacao = (
+        ('id', 'id'),
+        ('descricao', 'descricao'),
+        ('preco', 'preco'),
+        ('status', 'status'),
+        ('aceita_troca', 'aceita_troca'),
+        ('contato_telefone', 'contato_telefone'),
+        ('visualizacoes', 'visualizacoes'),
+        ('destaque', 'destaque'),
+        ('data_expiracao', 'data_expiracao'),
+        ('created_at', data_hora_iso('created_at')),
+        ('updated_at', data_hora_iso('updated_at')),
+        ('veiculo', 'veiculo_id'),
+        ('veiculo_marca', 'veiculo__marca', MARCAS.rotulo),
+        ('veiculo_modelo', 'veiculo__modelo'),
+        ('veiculo_ano', 'veiculo__ano'),
+        ('usuario', 'usuario_id'),
+        ('usuario_username', 'usuario__username'),
+    )
+
+
+class APIFacetasAnuncios(LeituraReplicaMixin, APIView):
+    """
+    API endpoint com a contagem de anúncios por opção de filtro (marca,
+    combustível, faixas de ano e de preço, status)
+
+    * Requer autenticação por token (ou sessão, para a listagem web)
+    * Aceita os filtros da listagem web: ``keyword``, ``status``, ``preco_min``,
+      ``preco_max``, ``marca``, ``combustivel``, ``ano_min`` e ``ano_max``
+    * Cada faceta ignora o próprio filtro (ver ``anuncio.facetas``)
+    """
+    authentication_classes = [TokenEmCache, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(obter_facetas(ler_filtros(request.query_params)))
+
+
+class EstatisticasPagination(PageNumberPagination):
+    """
+    Paginação das estatísticas de mercado
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class APIEstatisticasPrecos(LeituraReplicaMixin, ListAPIView):
+    """
+    API endpoint com os preços de mercado por marca, modelo e ano (ver ``anuncio.estatisticas``)
+
+    * Requer autenticação por token
+    * Filtros: ``marca``, ``modelo`` (nome exato, sem diferenciar maiúsculas),
+      ``ano`` e ``minimo`` (quantidade mínima de anúncios)
+    """
+    serializer_class = EstatisticaPrecoSerializer
+    authentication_classes = [TokenEmCache]
+    permission_classes = [IsAuthenticated]
+    pagination_class = EstatisticasPagination
+
+    def get_queryset(self):
+        parametros = self.request.query_params
+        queryset = EstatisticaPreco.objects.all()
+        if parametros.get('marca'):
+            queryset = queryset.filter(marca__in=MARCAS.resolver(parametros['marca']))
+        if parametros.get('modelo'):
+            queryset = queryset.filter(modelo=chave_modelo(parametros['modelo']))
+        if parametros.get('ano', '').isdigit():
+            queryset = queryset.filter(ano=int(parametros['ano']))
+        if parametros.get('minimo', '').isdigit():
+            queryset = queryset.filter(quantidade__gte=int(parametros['minimo']))
+        return queryset
+
+
+class APIOfertaDiaria(LeituraReplicaMixin, ListAPIView):
+    """
+    API endpoint com os anúncios publicados por dia e marca (ver ``anuncio.estatisticas``)
+
+    * Requer autenticação por token
+    * Filtros: ``marca`` e ``dias`` (padrão 30, até os 90 dias guardados)
+    """
+    serializer_class = OfertaDiariaSerializer
+    authentication_classes = [TokenEmCache]
+    permission_classes = [IsAuthenticated]
+    pagination_class = EstatisticasPagination
+
+    def get_queryset(self):
+        parametros = self.request.query_params
+        dias = parametros.get('dias', '')
+        dias = int(dias) if dias.isdigit() else 30
+        queryset = OfertaDiaria.objects.filter(dia__gt=timezone.localdate() - timezone.timedelta(days=dias))
+        if parametros.get('marca'):
+            queryset = queryset.filter(marca__in=MARCAS.resolver(parametros['marca']))
+        return queryset
+
+
+class APIDetalheAnuncio(RespostaCondicionalMixin, SelecaoCamposMixin, APIAssincronaMixin, RetrieveAPIView):
     """
     API endpoint que permite recuperar detalhes de um anúncio específico
     
     * Requer autenticação por token
     * Incrementa o contador de visualizações
+    * Aceita ``fields`` e ``expand`` (ver ``sistema.selecao``)
+    * Responde 304 para ``If-None-Match`` (ver ``sistema.condicional``)
     """
     serializer_class = AnuncioSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenEmCache]
     permission_classes = [IsAuthenticated]
+    # Visualizações gravadas até esta leitura: a resposta traz o contador
+    campos_etag = ('pk', 'updated_at', 'veiculo.updated_at', 'visualizacoes_lidas')
     
+    def consulta_objeto(self):
+        # Com ?fields=, lê só as colunas selecionadas e as usadas aqui
+        return self.podar_queryset(
+            Anuncio.objects.select_related('veiculo', 'usuario'),
+            'status', 'usuario', 'visualizacoes', 'updated_at', 'veiculo__updated_at'
+        )
+
     def get_object(self):
         """
         Obtém o anúncio e verifica permissões
         """
-        anuncio = get_object_or_404(
-            Anuncio.objects.select_related('veiculo', 'usuario'),
-            pk=self.kwargs['pk']
-        )
-        
+        anuncio = get_object_or_404(self.consulta_objeto(), pk=self.kwargs['pk'])
+        self.verificar_objeto(anuncio)
+        anuncio.visualizacoes_lidas = anuncio.visualizacoes
+        # Incrementar visualizações
+        anuncio.incrementar_visualizacao()
+        return anuncio
+
+    async def aget_object(self):
+        anuncio = await aget_object_or_404(self.consulta_objeto(), pk=self.kwargs['pk'])
+        self.verificar_objeto(anuncio)
+        anuncio.visualizacoes_lidas = anuncio.visualizacoes
+        # No modo síncrono do contador, a visualização é gravada no banco
+        await sync_to_async(anuncio.incrementar_visualizacao)()
+        return anuncio
+
+    def verificar_objeto(self, anuncio):
         # Verificar permissões: apenas admin, o dono, ou anúncios ativos para outros
         if not (
             self.request.user.is_staff or 
-            anuncio.usuario == self.request.user or 
+            anuncio.usuario_id == self.request.user.id or 
             anuncio.status == StatusAnuncio.ATIVO
         ):
             raise PermissionDenied(
                 "Você não tem permissão para visualizar este anúncio."
             )
-        
-        # Incrementar visualizações
-        anuncio.incrementar_visualizacao()
-        
-        return anuncio
 
 
 def marcar_anuncio_vendido(request, pk):
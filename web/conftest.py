@@ -0,0 +1,30 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def contador_visualizacoes_sincrono(settings):
+    """
+    Grava as visualizações imediatamente durante os testes, sem a thread de descarga
+    """
+    settings.ANUNCIO_VISUALIZACOES_MODO = 'sincrono'
+
+
+@pytest.fixture(autouse=True)
+def cache_limpo():
+    """
+    Cada teste começa com o cache vazio (páginas da listagem, tokens da API)
+    """
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def leituras_no_primario(request, settings):
+    """
+    Com DB_REPLICAS configurado, só as classes com ``usa_replicas = True`` leem
+    das réplicas: nos demais testes, os dados ficam em transações não confirmadas
+    """
+    if not getattr(request.cls, 'usa_replicas', False):
+        settings.DB_REPLICAS_ALIASES = []
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+
+Perfil ASGI: as views de leitura da API são assíncronas (API_ASSINCRONA) e as
+conexões com o banco não são persistentes (use DB_CONEXOES=pool para reaproveitá-las).
+As variáveis de ambiente definidas explicitamente têm precedência.
 """
 
 import os
@@ -12,5 +16,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema.settings')
+os.environ.setdefault('API_ASSINCRONA', 'True')
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
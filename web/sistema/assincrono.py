@@ -0,0 +1,138 @@
+"""
+Caminho assíncrono das views de leitura da API (``API_ASSINCRONA``).
+
+Em um servidor ASGI, a view assíncrona não ocupa uma thread enquanto espera o
+banco ou o cliente, então conexões lentas (rede móvel) deixam de prender
+workers. Com ``API_ASSINCRONA = True`` as rotas de leitura (listagens, detalhe
+e fotos) usam ``as_view_assincrona()``; a escolha é feita ao carregar as URLs
+(ver ``visao``).
+
+A view assíncrona reaproveita a view síncrona do DRF: filtros, seleção de
+campos, serialização e exceções são os mesmos. Usam o ORM assíncrono a
+autenticação por token (``TokenEmCache.aauthenticate``), o validador do ETag
+(``aaggregate``) e a busca do objeto no detalhe (``aget``). A paginação do
+DRF é síncrona e roda em ``sync_to_async``, que é também como o ORM
+assíncrono do Django executa as consultas.
+
+Sob ASGI use ``DB_CONEXOES=pool`` ou ``DB_CONN_MAX_AGE=0``: conexões
+persistentes não são reaproveitadas entre requisições assíncronas.
+"""
+import importlib
+import sys
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import clear_url_caches
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, mixins
+
+METODOS_ASSINCRONOS = ('GET', 'HEAD')
+
+
+def visao(classe, **initkwargs):
+    """
+    Returns:
+        A view assíncrona da classe com ``API_ASSINCRONA``, senão a síncrona
+    """
+    if getattr(settings, 'API_ASSINCRONA', False):
+        return classe.as_view_assincrona(**initkwargs)
+    return classe.as_view(**initkwargs)
+
+
+def recarregar_urls(*modulos):
+    """
+    Recarrega os módulos de URLs, depois de mudar ``API_ASSINCRONA`` (testes e medições)
+    """
+    for modulo in (*modulos, settings.ROOT_URLCONF):
+        # Módulos ainda não importados já são carregados com a configuração atual
+        if modulo in sys.modules:
+            importlib.reload(sys.modules[modulo])
+    clear_url_caches()
+
+
+class APIAssincronaMixin:
+    """
+    Mixin para ``ListAPIView`` e ``RetrieveAPIView`` com uma versão assíncrona do GET
+    """
+    @classmethod
+    def as_view_assincrona(cls, **initkwargs):
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            return await self.adispatch(request, *args, **kwargs)
+        view.cls = cls
+        view.initkwargs = initkwargs
+        update_wrapper(view, cls, updated=())
+        # Como no APIView.as_view: a autenticação por sessão do DRF verifica o CSRF
+        return csrf_exempt(view)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """
+        Equivalente assíncrono do ``APIView.dispatch``
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method in METODOS_ASSINCRONOS:
+                resposta = await self.aget(request, *args, **kwargs)
+            elif request.method == 'OPTIONS':
+                resposta = self.options(request, *args, **kwargs)
+            else:
+                raise exceptions.MethodNotAllowed(request.method)
+        except Exception as exc:
+            resposta = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, resposta, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+        await self.aautenticar(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def aautenticar(self, request):
+        """
+        Como ``Request._authenticate``; autenticadores sem ``aauthenticate``
+        rodam em ``sync_to_async``
+        """
+        for autenticador in request.authenticators:
+            try:
+                if hasattr(autenticador, 'aauthenticate'):
+                    resultado = await autenticador.aauthenticate(request)
+                else:
+                    resultado = await sync_to_async(autenticador.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if resultado is not None:
+                request._authenticator = autenticador
+                request.user, request.auth = resultado
+                return
+        request._not_authenticated()
+
+    async def aget(self, request, *args, **kwargs):
+        if isinstance(self, mixins.ListModelMixin):
+            return await self.alist(request, *args, **kwargs)
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        # Filtros e serialização são os do list(); só a paginação consulta o banco
+        return await sync_to_async(self.list)(request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await sync_to_async(self.retrieve)(request, *args, **kwargs)
+
+    async def aget_object(self):
+        """
+        Versão assíncrona de ``get_object``; por padrão roda o ``get_object`` síncrono
+        """
+        return await sync_to_async(self.get_object)()
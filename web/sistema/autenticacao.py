@@ -0,0 +1,238 @@
+"""
+Autenticação por token da API com cache.
+
+O ``TokenAuthentication`` do DRF consulta ``Token`` e ``User`` a cada chamada.
+Aqui o token (com o usuário) é procurado, nesta ordem:
+
+1. em um LRU do processo, com validade curta (``API_TOKENS_CACHE_LOCAL_VALIDADE``);
+2. no cache compartilhado do Django (``API_TOKENS_CACHE_VALIDADE``);
+3. no banco, e então guardado nos dois caches.
+
+Alterar ou apagar um ``Token`` ou ``User`` (o que inclui a troca do token de um
+usuário) remove a entrada do cache compartilhado e do LRU do processo em que
+ocorreu. Nos demais processos, a entrada local expira pela validade curta.
+
+Os objetos são guardados serializados (pickle) e cada requisição recebe sua
+própria cópia, então alterações em ``request.user`` não vazam para outras.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+PREFIXO_CACHE = 'api:token:'
+
+
+class CacheLocal:
+    """
+    LRU com validade por entrada, seguro entre threads
+    """
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor, validade):
+        with self._trava:
+            self._itens[chave] = (time.monotonic() + validade, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        with self._trava:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class CacheTokens:
+    """
+    Tokens da API em dois níveis (processo e cache compartilhado), com contadores
+    """
+    def __init__(self):
+        self.local = CacheLocal(getattr(settings, 'API_TOKENS_CACHE_TAMANHO', 10000))
+        self.acertos_locais = 0
+        self.acertos_compartilhados = 0
+        self.falhas = 0
+
+    @property
+    def validade_local(self):
+        return getattr(settings, 'API_TOKENS_CACHE_LOCAL_VALIDADE', 10)
+
+    @property
+    def validade(self):
+        return getattr(settings, 'API_TOKENS_CACHE_VALIDADE', 300)
+
+    @staticmethod
+    def chave_compartilhada(chave):
+        # O token não aparece em claro nas chaves do cache compartilhado
+        return PREFIXO_CACHE + hashlib.sha256(chave.encode()).hexdigest()
+
+    def obter(self, chave):
+        """
+        Returns:
+            Token: Token com o usuário carregado, ou None se não existir
+        """
+        dados = self.local.obter(chave)
+        if dados is not None:
+            self.acertos_locais += 1
+            return pickle.loads(dados)
+
+        dados = cache.get(self.chave_compartilhada(chave))
+        if dados is not None:
+            self.acertos_compartilhados += 1
+        else:
+            self.falhas += 1
+            try:
+                token = Token.objects.select_related('user').get(key=chave)
+            except Token.DoesNotExist:
+                return None
+            dados = pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
+            cache.set(self.chave_compartilhada(chave), dados, self.validade)
+        self.local.guardar(chave, dados, self.validade_local)
+        return pickle.loads(dados)
+
+    async def aobter(self, chave):
+        """
+        Versão assíncrona de ``obter``, para as views assíncronas
+        """
+        dados = self.local.obter(chave)
+        if dados is not None:
+            self.acertos_locais += 1
+            return pickle.loads(dados)
+
+        dados = await cache.aget(self.chave_compartilhada(chave))
+        if dados is not None:
+            self.acertos_compartilhados += 1
+        else:
+            self.falhas += 1
+            try:
+                token = await Token.objects.select_related('user').aget(key=chave)
+            except Token.DoesNotExist:
+                return None
+            dados = pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
+            await cache.aset(self.chave_compartilhada(chave), dados, self.validade)
+        self.local.guardar(chave, dados, self.validade_local)
+        return pickle.loads(dados)
+
+    def invalidar(self, chave):
+        self.local.remover(chave)
+        cache.delete(self.chave_compartilhada(chave))
+
+    def limpar(self):
+        """
+        Limpa o LRU do processo e zera os contadores
+        """
+        self.local.limpar()
+        self.acertos_locais = self.acertos_compartilhados = self.falhas = 0
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Contadores deste processo desde o início (ou a última limpeza)
+        """
+        consultas = self.acertos_locais + self.acertos_compartilhados + self.falhas
+        return {
+            'pid': os.getpid(),
+            'acertos_locais': self.acertos_locais,
+            'acertos_compartilhados': self.acertos_compartilhados,
+            'falhas': self.falhas,
+            'taxa_acertos': round((consultas - self.falhas) / consultas, 4) if consultas else None,
+            'entradas_locais': len(self.local),
+        }
+
+
+cache_tokens = CacheTokens()
+
+
+class _LeitorChave(TokenAuthentication):
+    """
+    Lê a chave do cabeçalho com as validações do DRF, sem consultar o token
+    """
+    def authenticate_credentials(self, key):
+        return key
+
+
+class TokenEmCache(TokenAuthentication):
+    """
+    ``TokenAuthentication`` que consulta o banco só quando o token não está em cache
+    """
+    def authenticate_credentials(self, key):
+        token = cache_tokens.obter(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
+
+    async def aauthenticate(self, request):
+        """
+        Versão assíncrona de ``authenticate``, para as views assíncronas
+        """
+        leitor = _LeitorChave()
+        leitor.keyword = self.keyword
+        chave = leitor.authenticate(request)
+        if chave is None:
+            return None
+        token = await cache_tokens.aobter(chave)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
+
+
+def _invalidar(chaves):
+    chaves = list(chaves)
+    for chave in chaves:
+        cache_tokens.invalidar(chave)
+    # Remove de novo após o commit: uma leitura concorrente pode ter guardado o
+    # valor antigo antes da transação terminar
+    transaction.on_commit(lambda: [cache_tokens.invalidar(chave) for chave in chaves])
+
+
+@receiver([post_save, post_delete], sender=Token, dispatch_uid='api_token_invalidar_token')
+def invalidar_token(sender, instance, **kwargs):
+    _invalidar([instance.key])
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='api_token_invalidar_usuario')
+def invalidar_usuario(sender, instance, created=False, update_fields=None, **kwargs):
+    if created:
+        return
+    # O login atualiza só o last_login, que não muda a autenticação
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    # Ao apagar o usuário, o token é apagado em cascata e invalidado acima
+    _invalidar(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
@@ -0,0 +1,3 @@
+"""
+Backend PostgreSQL com medição das conexões (ver ``sistema.conexoes``).
+"""
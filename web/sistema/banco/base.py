@@ -0,0 +1,22 @@
+import time
+
+from django.db.backends.postgresql import base
+
+from sistema.conexoes import medidor
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Backend do PostgreSQL que registra a espera para obter cada conexão
+    """
+    def get_new_connection(self, conn_params):
+        # No modo pool, a espera inclui a fila por uma conexão livre
+        inicio = time.perf_counter()
+        conexao = super().get_new_connection(conn_params)
+        medidor(self.alias).obtida(time.perf_counter() - inicio)
+        return conexao
+
+    def _close(self):
+        if self.connection is not None:
+            medidor(self.alias).devolvida()
+        return super()._close()
@@ -10,4 +10,34 @@ class LoginObrigatorio(LoginRequiredMixin):
     Redireciona para a página de login caso o usuário não esteja autenticado.
     """
     redirect_field_name = "next"
-    login_url = reverse_lazy('login')
\ No newline at end of file
+    login_url = reverse_lazy('login')
+
+class ObjetoMemorizado:
+    """
+    Mixin para views de objeto único (DetailView, UpdateView, DeleteView) que
+    busca o objeto uma única vez por requisição.
+
+    O mesmo objeto é entregue às verificações de permissão, aos efeitos
+    colaterais e à montagem do contexto. Relacionamentos usados pela view
+    devem ser declarados em ``select_related_objeto``.
+    """
+    select_related_objeto = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.select_related_objeto:
+            queryset = queryset.select_related(*self.select_related_objeto)
+        return queryset
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_objeto_memorizado'):
+            self._objeto_memorizado = super().get_object()
+            self.objeto_obtido(self._objeto_memorizado)
+        return self._objeto_memorizado
+
+    def objeto_obtido(self, obj):
+        """
+        Executado uma única vez, logo após a busca do objeto
+        """
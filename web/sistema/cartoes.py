@@ -0,0 +1,89 @@
+"""
+Cache dos cartões das listagens (biblioteca de templates ``cartoes``).
+
+Cada cartão é renderizado a partir de um template próprio e guardado no cache
+com uma chave que inclui o modelo, a chave primária, os campos de versão
+(``updated_at`` do objeto e dos relacionamentos exibidos), o idioma e o fuso
+horário ativos. Qualquer gravação muda ``updated_at`` e, com ele, a chave, então
+não há invalidação explícita; as entradas antigas expiram pela validade
+(``CARTOES_CACHE_VALIDADE``, 0 desliga).
+
+A página busca todos os cartões com um único ``get_many`` e grava os que
+faltavam com um ``set_many``. O template do cartão recebe apenas o objeto: o
+que depende do usuário (como os botões do dono) fica fora dele.
+
+Uso::
+
+    {% load cartoes %}
+    {% cartoes anuncios 'anuncio/cartao.html' 'updated_at' 'veiculo.updated_at' as itens %}
+    {% for anuncio, cartao in itens %}
+        <div class="card">{{ cartao }} ...</div>
+    {% endfor %}
+"""
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def validade():
+    return getattr(settings, 'CARTOES_CACHE_VALIDADE', 3600)
+
+
+def valor_campo(objeto, campo):
+    for atributo in campo.split('.'):
+        objeto = getattr(objeto, atributo)
+    return objeto
+
+
+def chave_cartao(objeto, template_nome, campos, variacao=''):
+    """
+    Returns:
+        str: Chave do cartão no cache
+    """
+    versao = ':'.join(
+        valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+        for valor in (valor_campo(objeto, campo) for campo in campos)
+    )
+    return 'cartao:{}:{}:{}:{}:{}:{}:{}'.format(
+        template_nome, objeto._meta.label_lower, objeto.pk, versao,
+        translation.get_language(), timezone.get_current_timezone_name(), variacao,
+    )
+
+
+@register.simple_tag
+def cartoes(objetos, template_nome, *campos, nome=None, variacao=''):
+    """
+    Args:
+        objetos: Objetos da página
+        template_nome (str): Template do cartão, que recebe o objeto em ``nome``
+            (por padrão, o nome do modelo)
+        campos: Campos de versão, com ponto para relacionamentos
+        variacao: Valor extra da chave, para cartões que dependem de outra coisa
+
+    Returns:
+        list: Pares (objeto, HTML do cartão), na ordem dos objetos
+    """
+    objetos = list(objetos)
+    if not objetos:
+        return []
+    nome = nome or objetos[0]._meta.model_name
+    if validade() <= 0:
+        return [(objeto, render_to_string(template_nome, {nome: objeto})) for objeto in objetos]
+
+    chaves = [chave_cartao(objeto, template_nome, campos, variacao) for objeto in objetos]
+    guardados = cache.get_many(chaves)
+    novos = {}
+    itens = []
+    for objeto, chave in zip(objetos, chaves):
+        html = guardados.get(chave)
+        if html is None:
+            html = novos[chave] = str(render_to_string(template_nome, {nome: objeto}))
+        itens.append((objeto, mark_safe(html)))
+    if novos:
+        cache.set_many(novos, validade())
+    return itens
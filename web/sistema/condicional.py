@@ -0,0 +1,122 @@
+"""
+Requisições condicionais (ETag) nas APIs.
+
+O validador da listagem vem de uma única consulta de agregação sobre o
+queryset filtrado (por padrão ``max(updated_at)`` e ``count(*)``), combinada
+com os parâmetros da requisição, o usuário, o formato da resposta e a data
+atual (campos como ``dias_ativo`` mudam a cada dia). Se o cliente envia o mesmo
+ETag em ``If-None-Match``, a resposta é 304 e a página não é consultada nem
+serializada.
+
+Na paginação por cursor (``sistema.paginacao``), que existe para não percorrer
+o conjunto filtrado inteiro, o validador é o conteúdo da própria página: ela é
+consultada e serializada, e só a transferência é evitada.
+
+No detalhe, o validador é montado a partir do objeto já carregado, antes da
+serialização.
+
+``alist`` e ``aretrieve`` são as versões para as views assíncronas
+(``sistema.assincrono``): o validador é lido com o ORM assíncrono.
+
+As respostas dependem do token, então levam ``Cache-Control: private, no-cache``
+(o cliente guarda, mas revalida a cada uso) e ``Vary: Authorization, Accept``.
+O ETag é fraco: exclusões aparecem na contagem, mas alterações que não mudam
+``updated_at`` (como o nome do usuário) só aparecem quando outro campo do
+validador mudar.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+
+
+class RespostaCondicionalMixin:
+    """
+    Mixin para as views de listagem e detalhe da API que adiciona ETag e 304.
+
+    ``agregados_etag`` define as agregações da listagem e ``campos_etag`` os
+    atributos do objeto no detalhe (com ponto para relacionamentos).
+    """
+    agregados_etag = {'atualizado': Max('updated_at'), 'total': Count('pk')}
+    campos_etag = ('pk', 'updated_at')
+
+    def etag_pela_pagina(self):
+        """
+        Returns:
+            bool: True se o validador deve vir da página (modo cursor), sem
+            agregar o conjunto filtrado inteiro
+        """
+        usa_cursor = getattr(self.paginator, 'usa_cursor', None)
+        return bool(usa_cursor and usa_cursor(self.request))
+
+    def resposta_pela_pagina(self, request, resposta):
+        etag = self.montar_etag(resposta.data)
+        return self.marcar_resposta(get_conditional_response(request, etag=etag) or resposta, etag)
+
+    def list(self, request, *args, **kwargs):
+        if self.etag_pela_pagina():
+            return self.resposta_pela_pagina(request, super().list(request, *args, **kwargs))
+        queryset = self.filter_queryset(self.get_queryset())
+        validador = queryset.order_by().aggregate(**self.agregados_etag)
+        etag = self.montar_etag(sorted(validador.items()))
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            resposta = super().list(request, *args, **kwargs)
+        return self.marcar_resposta(resposta, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instancia = self.get_object()
+        etag = self.montar_etag([self.valor_campo(instancia, campo) for campo in self.campos_etag])
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            resposta = Response(self.get_serializer(instancia).data)
+        return self.marcar_resposta(resposta, etag)
+
+    async def alist(self, request, *args, **kwargs):
+        if self.etag_pela_pagina():
+            resposta = await sync_to_async(super().list)(request, *args, **kwargs)
+            return self.resposta_pela_pagina(request, resposta)
+        queryset = self.filter_queryset(self.get_queryset())
+        validador = await queryset.order_by().aaggregate(**self.agregados_etag)
+        etag = self.montar_etag(sorted(validador.items()))
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            # O list() seguinte na hierarquia serializa a página, sem refazer o validador
+            resposta = await sync_to_async(super().list)(request, *args, **kwargs)
+        return self.marcar_resposta(resposta, etag)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instancia = await self.aget_object()
+        etag = self.montar_etag([self.valor_campo(instancia, campo) for campo in self.campos_etag])
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            resposta = Response(self.get_serializer(instancia).data)
+        return self.marcar_resposta(resposta, etag)
+
+    @staticmethod
+    def valor_campo(instancia, campo):
+        for atributo in campo.split('.'):
+            instancia = getattr(instancia, atributo)
+        return instancia
+
+    def montar_etag(self, validador):
+        """
+        Returns:
+            str: ETag fraco com o validador e o que mais muda a resposta
+        """
+        renderizador = getattr(self.request, 'accepted_media_type', '')
+        dados = repr((
+            validador, self.request.get_full_path(), self.request.user.pk,
+            renderizador, timezone.localdate(),
+        ))
+        return 'W/"{}"'.format(hashlib.md5(dados.encode('utf-8')).hexdigest())
+
+    def marcar_resposta(self, resposta, etag):
+        if resposta.status_code in (200, 304):
+            resposta['ETag'] = etag
+        patch_cache_control(resposta, private=True, no_cache=True)
+        patch_vary_headers(resposta, ('Authorization', 'Accept'))
+        return resposta
@@ -0,0 +1,88 @@
+"""
+Conexões com o banco: modos de conexão e métricas para monitoramento.
+
+``DB_CONEXOES`` escolhe o modo (ver ``settings.py``):
+
+* ``persistente``: cada thread mantém sua conexão entre requisições por
+  ``DB_CONN_MAX_AGE`` segundos; com ``DB_HEALTH_CHECKS``, a conexão é testada
+  antes de ser reaproveitada em uma nova requisição;
+* ``pool``: pool nativo do psycopg 3 (``psycopg[pool]``), compartilhado pelas
+  threads do processo, com tamanho mínimo e máximo, tempo máximo de espera
+  por uma conexão livre e verificação da conexão ao retirá-la do pool.
+
+O backend ``sistema.banco`` mede, nos dois modos, quanto tempo cada requisição
+esperou para obter uma conexão (abrir uma nova ou retirar do pool) e quantas
+estão em uso no processo. ``estatisticas()`` junta essas medidas às do pool.
+"""
+import os
+import threading
+
+from django.db import connections
+
+
+class MedidorConexoes:
+    """
+    Contadores das conexões obtidas e devolvidas por um alias, seguros entre threads
+    """
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.limpar()
+
+    def obtida(self, espera):
+        """
+        Args:
+            espera (float): Segundos gastos para obter a conexão
+        """
+        with self._trava:
+            self.obtidas += 1
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+
+    def devolvida(self):
+        with self._trava:
+            self.devolvidas += 1
+
+    def limpar(self):
+        self.obtidas = 0
+        self.devolvidas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                'conexoes_obtidas': self.obtidas,
+                'conexoes_em_uso': self.obtidas - self.devolvidas,
+                'espera_media_ms': round(self.espera_total / self.obtidas * 1000, 3) if self.obtidas else None,
+                'espera_maxima_ms': round(self.espera_maxima * 1000, 3),
+            }
+
+
+medidores = {}
+_trava_medidores = threading.Lock()
+
+
+def medidor(alias):
+    with _trava_medidores:
+        return medidores.setdefault(alias, MedidorConexoes())
+
+
+def estatisticas(alias='default'):
+    """
+    Returns:
+        dict: Medidas das conexões deste processo e, no modo ``pool``, as do
+        psycopg_pool (``pool_size``, ``pool_available``, ``requests_waiting``,
+        ``requests_wait_ms``...)
+    """
+    conexao = connections[alias]
+    pool = getattr(conexao, 'pool', None)
+    dados = {
+        'pid': os.getpid(),
+        'modo': 'pool' if pool is not None else 'persistente',
+        'conn_max_age': conexao.settings_dict['CONN_MAX_AGE'],
+        'health_checks': conexao.settings_dict['CONN_HEALTH_CHECKS'],
+    }
+    dados.update(medidor(alias).estatisticas())
+    if pool is not None:
+        dados['pool'] = pool.get_stats()
+    return dados
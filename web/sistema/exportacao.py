@@ -0,0 +1,187 @@
+"""
+Exportação em streaming (CSV e NDJSON) para as APIs do sistema.
+
+As linhas são lidas com ``values_list(...).iterator(chunk_size=...)``, que no
+PostgreSQL usa um cursor no servidor: nenhum objeto de modelo é criado e a
+memória fica constante, qualquer que seja o tamanho da exportação. A saída é
+escrita em blocos e, quando o cliente aceita, comprimida com gzip durante o
+envio.
+"""
+import csv
+import io
+import re
+import zlib
+from itertools import islice
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import CharField, F, Func
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import BasePermission
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+ACEITA_GZIP = re.compile(r'\bgzip\b')
+
+
+class PodeExportar(BasePermission):
+    """
+    Exige a permissão de exportação definida em ``permissao_exportacao`` na view
+    """
+    message = 'Você não tem permissão para exportar estes dados.'
+
+    def has_permission(self, request, view):
+        return request.user.has_perm(view.permissao_exportacao)
+
+
+class ExportacaoMixin:
+    """
+    Mixin para as views de listagem da API que adiciona a exportação.
+
+    A view reaproveita o ``get_queryset`` e os ``filter_backends`` da listagem,
+    então aceita os mesmos filtros. As colunas são definidas em
+    ``colunas_exportacao`` como ``(nome, campo)`` ou ``(nome, campo, conversor)``,
+    em que ``campo`` é um caminho do ORM (``veiculo__marca``) ou uma expressão
+    e ``conversor`` transforma o valor lido (por exemplo, o rótulo de uma opção).
+    Datas e horas devem usar ``data_hora_iso``: formatá-las no banco evita
+    converter e reformatar cada valor no Python, que é o custo dominante.
+
+    O formato é escolhido por ``?formato=csv`` (padrão) ou ``?formato=ndjson``.
+    """
+    permissao_exportacao = None
+    colunas_exportacao = ()
+    nome_exportacao = 'exportacao'
+    formato_query_param = 'formato'
+    lote_exportacao = 2000
+    tamanho_bloco = 64 * 1024
+
+    def get(self, request, *args, **kwargs):
+        formato = request.query_params.get(self.formato_query_param, 'csv')
+        if formato not in FORMATOS:
+            raise ValidationError({
+                self.formato_query_param: 'Formato inválido. Use: {}.'.format(', '.join(FORMATOS))
+            })
+        queryset = self.filter_queryset(self.get_queryset())
+        # As linhas são lidas depois do dispatch, durante o envio: fixa o banco
+        # escolhido agora (a réplica, nas views com LeituraReplicaMixin)
+        return self.exportar(queryset.using(queryset.db), formato)
+
+    def exportar(self, queryset, formato):
+        """
+        Monta a resposta em streaming com as linhas do queryset
+
+        Returns:
+            StreamingHttpResponse: Arquivo CSV ou NDJSON, comprimido se aceito
+        """
+        campos = []
+        for coluna in self.colunas_exportacao:
+            if coluna[1] not in campos:
+                campos.append(coluna[1])
+        # Colunas calculadas pelo banco entram como anotações
+        expressoes = {
+            '_coluna_{}'.format(posicao): campo
+            for posicao, campo in enumerate(campos) if not isinstance(campo, str)
+        }
+        nomes_campos = [
+            '_coluna_{}'.format(posicao) if not isinstance(campo, str) else campo
+            for posicao, campo in enumerate(campos)
+        ]
+        linhas = queryset.annotate(**expressoes).values_list(*nomes_campos).iterator(
+            chunk_size=self.lote_exportacao
+        )
+
+        conteudo = self.escrever(linhas, formato, campos)
+        comprimir = self.aceita_gzip()
+        if comprimir:
+            conteudo = comprimir_gzip(conteudo)
+
+        response = StreamingHttpResponse(conteudo, content_type=FORMATOS[formato])
+        response['Content-Disposition'] = 'attachment; filename="{}-{}.{}"'.format(
+            self.nome_exportacao, timezone.localdate().strftime('%Y%m%d'), formato
+        )
+        if comprimir:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def escrever(self, linhas, formato, campos):
+        """
+        Converte as linhas para o formato pedido, em blocos de ``tamanho_bloco``
+        """
+        nomes = [coluna[0] for coluna in self.colunas_exportacao]
+        posicoes = [campos.index(coluna[1]) for coluna in self.colunas_exportacao]
+        if len(posicoes) > 1:
+            selecionar = itemgetter(*posicoes)
+        else:
+            selecionar = lambda linha: (linha[posicoes[0]],)  # noqa: E731
+        conversoes = [
+            (indice, coluna[2]) for indice, coluna in enumerate(self.colunas_exportacao)
+            if len(coluna) > 2
+        ]
+
+        buffer = io.StringIO()
+        if formato == 'csv':
+            escritor = csv.writer(buffer)
+            escritor.writerow(nomes)
+            escrever_lote = escritor.writerows
+        else:
+            codificador = DjangoJSONEncoder(ensure_ascii=False)
+
+            def escrever_lote(lote):
+                for valores in lote:
+                    buffer.write(codificador.encode(dict(zip(nomes, valores))))
+                    buffer.write('\n')
+
+        # As linhas são tratadas em lotes, com uma passada por coluna convertida
+        while True:
+            lote = [list(selecionar(linha)) for linha in islice(linhas, self.lote_exportacao)]
+            if not lote:
+                break
+            for indice, conversor in conversoes:
+                for valores in lote:
+                    valores[indice] = conversor(valores[indice])
+            escrever_lote(lote)
+            if buffer.tell() >= self.tamanho_bloco:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    def aceita_gzip(self):
+        return bool(ACEITA_GZIP.search(self.request.META.get('HTTP_ACCEPT_ENCODING', '')))
+
+    def perform_content_negotiation(self, request, force=False):
+        # O formato vem de ?formato=; um Accept: text/csv não deve gerar 406
+        return super().perform_content_negotiation(request, force=True)
+
+
+def data_hora_iso(campo):
+    """
+    Data e hora formatada pelo banco em ISO 8601, em UTC
+
+    Returns:
+        Func: Expressão com o texto no formato ``2024-01-31T13:45:00.000000Z``
+    """
+    return Func(
+        F(campo),
+        template="""to_char(%(expressions)s AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"')""",
+        output_field=CharField(),
+    )
+
+
+def comprimir_gzip(blocos):
+    """
+    Comprime uma sequência de blocos de bytes em um único fluxo gzip
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
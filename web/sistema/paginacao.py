@@ -0,0 +1,193 @@
+"""
+Paginação por cursor (keyset) para as APIs do sistema.
+
+A paginação por número de página executa um COUNT(*) e um OFFSET a cada
+requisição, o que fica caro em páginas profundas de tabelas grandes. O modo
+cursor posiciona a consulta pelos valores da última linha entregue, usando
+uma ordenação estável e sem contagem.
+"""
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginacaoCursorMixin:
+    """
+    Mixin para classes de paginação do DRF que adiciona um modo cursor opcional.
+
+    O cliente ativa o modo com ``?paginacao=cursor`` (ou enviando um ``cursor``).
+    A ordenação é escolhida pelo parâmetro ``ordering`` entre as opções de
+    ``ordenacoes_cursor``; a chave vazia define a ordenação padrão. Cada
+    ordenação deve terminar em uma coluna única (normalmente ``id``).
+
+    O total não é calculado no modo cursor. Com ``?total=aproximado`` a resposta
+    inclui uma estimativa do planejador, mantida em cache por
+    ``total_cache_timeout`` segundos.
+    """
+    modo_query_param = 'paginacao'
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    ordenacoes_cursor = {'': ('-id',)}
+    total_cache_timeout = 300
+    cursor_invalido_mensagem = 'Cursor inválido.'
+
+    def usa_cursor(self, request):
+        """
+        Verifica se a requisição optou pelo modo cursor
+        """
+        return (
+            request.query_params.get(self.modo_query_param) == 'cursor' or
+            self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.modo_cursor = self.usa_cursor(request)
+        if not self.modo_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginar_por_cursor(queryset, request)
+
+    def get_paginated_response(self, data):
+        if not self.modo_cursor:
+            return super().get_paginated_response(data)
+
+        resposta = OrderedDict()
+        if self.total is not None:
+            resposta['count'] = self.total
+        resposta['next'] = self.proximo
+        resposta['previous'] = self.anterior
+        resposta['results'] = data
+        return Response(resposta)
+
+    def paginar_por_cursor(self, queryset, request):
+        """
+        Retorna a página posicionada pelo cursor da requisição
+        """
+        self.request = request
+        self.display_page_controls = False
+        self.campos = self.get_ordenacao(request)
+        tamanho = self.get_page_size(request)
+        valores, reverso = self.decodificar_cursor(queryset.model, request)
+
+        campos = [(nome, not desc) for nome, desc in self.campos] if reverso else self.campos
+        queryset = queryset.order_by(*[('-' if desc else '') + nome for nome, desc in campos])
+        if valores is not None:
+            queryset = queryset.filter(self.filtro_posicao(campos, valores))
+
+        itens = list(queryset[:tamanho + 1])
+        tem_mais = len(itens) > tamanho
+        itens = itens[:tamanho]
+        if reverso:
+            itens.reverse()
+
+        self.proximo = self.anterior = None
+        if itens:
+            if tem_mais or reverso:
+                self.proximo = self.montar_link(itens[-1], reverso=False)
+            if (tem_mais and reverso) or (valores is not None and not reverso):
+                self.anterior = self.montar_link(itens[0], reverso=True)
+
+        self.total = None
+        if request.query_params.get(self.total_query_param) == 'aproximado':
+            self.total = self.contar_aproximado(queryset.order_by())
+        return itens
+
+    def campos_ordenacao(self, request):
+        """
+        Campos lidos para montar o cursor (vazio fora do modo cursor)
+        """
+        if not self.usa_cursor(request):
+            return []
+        return [nome for nome, _desc in self.get_ordenacao(request)]
+
+    def get_ordenacao(self, request):
+        """
+        Retorna a ordenação do cursor como lista de pares (campo, descendente)
+        """
+        chave = request.query_params.get(api_settings.ORDERING_PARAM, '').strip()
+        if chave not in self.ordenacoes_cursor:
+            raise ValidationError({
+                api_settings.ORDERING_PARAM: 'Ordenação não suportada na paginação por cursor. '
+                'Opções: {}'.format(', '.join(sorted(c for c in self.ordenacoes_cursor if c)))
+            })
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.ordenacoes_cursor[chave]]
+
+    def filtro_posicao(self, campos, valores):
+        """
+        Monta a condição que seleciona as linhas posteriores à posição informada.
+
+        Para a ordenação (a, b, c) equivale a
+        ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)``,
+        trocando ``>`` por ``<`` nos campos descendentes.
+        """
+        filtro = Q()
+        iguais = {}
+        for (nome, desc), valor in zip(campos, valores):
+            filtro |= Q(**iguais, **{'{}__{}'.format(nome, 'lt' if desc else 'gt'): valor})
+            iguais[nome] = valor
+        return filtro
+
+    def codificar_cursor(self, item, reverso):
+        valores = []
+        for nome, _desc in self.campos:
+            valor = item[nome] if isinstance(item, dict) else getattr(item, nome)
+            valores.append(valor if isinstance(valor, (bool, int)) else str(valor))
+        dados = json.dumps({'v': valores, 'r': reverso}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(dados.encode('utf-8')).decode('ascii')
+
+    def decodificar_cursor(self, modelo, request):
+        """
+        Retorna os valores de posição e a direção do cursor da requisição
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            valores = [
+                modelo._meta.get_field(nome).to_python(valor)
+                for (nome, _desc), valor in zip(self.campos, dados['v'], strict=True)
+            ]
+            return valores, bool(dados['r'])
+        except Exception:
+            raise NotFound(self.cursor_invalido_mensagem)
+
+    def montar_link(self, item, reverso):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.modo_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.codificar_cursor(item, reverso))
+
+    def contar_aproximado(self, queryset):
+        """
+        Estima o total de linhas da consulta, com o resultado em cache.
+
+        No PostgreSQL usa a estimativa do planejador (EXPLAIN), que não percorre
+        a tabela; nos demais bancos recorre ao COUNT(*).
+        """
+        sql, params = queryset.query.sql_with_params()
+        chave = 'paginacao:total:{}'.format(
+            hashlib.md5('{}|{}|{}'.format(queryset.db, sql, params).encode('utf-8')).hexdigest()
+        )
+        total = cache.get(chave)
+        if total is None:
+            conexao = connections[queryset.db]
+            if conexao.vendor == 'postgresql':
+                with conexao.cursor() as cursor:
+                    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                    plano = cursor.fetchone()[0]
+                    if isinstance(plano, str):
+                        plano = json.loads(plano)
+                    total = int(plano[0]['Plan']['Plan Rows'])
+            else:
+                total = queryset.count()
+            cache.set(chave, total, self.total_cache_timeout)
+        return total
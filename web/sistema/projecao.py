@@ -0,0 +1,200 @@
+"""
+Serialização das listagens da API a partir de projeções ``values()``.
+
+Nas listagens, o custo dominante é criar os objetos de modelo (com os
+relacionamentos do ``select_related``) e passar cada um pelos campos do DRF.
+A ``Projecao`` lê a definição de um ``ModelSerializer``, uma vez por
+requisição, e monta:
+
+* a lista de caminhos para ``values()``, incluindo os serializadores
+  aninhados (``veiculo__marca``, ``usuario__username``...);
+* um conversor por campo: mapas pré-calculados para opções (``choices`` e
+  ``get_*_display``), identidade para inteiros, textos e booleanos, e o
+  ``to_representation`` do próprio campo nos demais (datas, decimais).
+
+Campos que não vêm de uma coluna (propriedades do modelo ou
+``SerializerMethodField``) são declarados no serializador em
+``calculados_projecao`` com ``Calculado``. O JSON resultante é idêntico ao do
+serializador.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.response import Response
+
+EXIBICAO = re.compile(r'^get_(\w+)_display$')
+# Campos do DRF cuja representação é o próprio valor lido do banco
+IDENTIDADE = (
+    serializers.BooleanField, serializers.CharField, serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class Calculado:
+    """
+    Campo calculado de uma projeção
+
+    Args:
+        campos (tuple): Campos do modelo usados no cálculo
+        preparar: Função que recebe o contexto do serializador e retorna a
+            função de cálculo, que recebe os valores de ``campos`` na ordem
+    """
+    def __init__(self, campos, preparar):
+        self.campos = tuple(campos)
+        self.preparar = preparar
+
+
+class Projecao:
+    """
+    Representação de um ``ModelSerializer`` montada a partir de ``values()``
+    """
+    def __init__(self, serializador):
+        self.campos = []
+        self.relacoes = []
+        self.montar = self._compilar(serializador, '')
+
+    def serializar(self, linhas):
+        """
+        Args:
+            linhas: Dicionários de ``queryset.values(*projecao.campos)``
+
+        Returns:
+            list: Um dicionário por linha, como o ``data`` do serializador
+        """
+        montar = self.montar
+        return [montar(linha) for linha in linhas]
+
+    def _caminho(self, caminho):
+        if caminho not in self.campos:
+            self.campos.append(caminho)
+        return caminho
+
+    def _compilar(self, serializador, prefixo):
+        modelo = serializador.Meta.model
+        calculados = getattr(serializador, 'calculados_projecao', {})
+        itens = []
+        for nome, campo in serializador.fields.items():
+            if campo.write_only:
+                continue
+            if nome in calculados:
+                itens.append((nome, None, self._calculado(calculados[nome], serializador.context, prefixo)))
+            elif isinstance(campo, serializers.BaseSerializer):
+                itens.append((nome, None, self._aninhado(campo, prefixo)))
+            else:
+                caminho, conversor = self._simples(modelo, nome, campo, prefixo)
+                itens.append((nome, caminho, conversor))
+        itens = tuple(itens)
+
+        def montar(linha):
+            dados = {}
+            for nome, caminho, conversor in itens:
+                if caminho is None:
+                    dados[nome] = conversor(linha)
+                    continue
+                valor = linha[caminho]
+                dados[nome] = valor if valor is None or conversor is None else conversor(valor)
+            return dados
+        return montar
+
+    def _calculado(self, calculado, contexto, prefixo):
+        caminhos = [self._caminho(prefixo + campo) for campo in calculado.campos]
+        funcao = calculado.preparar(contexto)
+        return lambda linha: funcao(*[linha[caminho] for caminho in caminhos])
+
+    def _aninhado(self, campo, prefixo):
+        if getattr(campo, 'many', False) or '.' in campo.source:
+            raise ImproperlyConfigured(
+                'Serializador aninhado "{}" não pode ser projetado.'.format(campo.field_name)
+            )
+        # A chave do relacionamento indica se ele é nulo
+        chave = self._caminho(prefixo + campo.source)
+        self.relacoes.append(chave)
+        montar = self._compilar(campo, prefixo + campo.source + '__')
+        return lambda linha: None if linha[chave] is None else montar(linha)
+
+    def _simples(self, modelo, nome, campo, prefixo):
+        """
+        Returns:
+            tuple: (caminho em ``values()``, conversor ou None para identidade)
+        """
+        exibicao = EXIBICAO.match(campo.source)
+        fonte = exibicao.group(1) if exibicao else campo.source
+        try:
+            campo_modelo = modelo._meta.get_field(fonte)
+        except FieldDoesNotExist:
+            campo_modelo = None
+        if campo_modelo is None or not campo_modelo.concrete or (exibicao and not campo_modelo.choices):
+            raise ImproperlyConfigured(
+                'Campo "{}" de {} não vem de uma coluna; declare-o em calculados_projecao.'.format(
+                    nome, type(campo.parent).__name__
+                )
+            )
+        caminho = self._caminho(prefixo + fonte)
+
+        if exibicao:
+            rotulos = {valor: str(rotulo) for valor, rotulo in campo_modelo.flatchoices}
+            return caminho, lambda valor: rotulos.get(valor, valor)
+        if isinstance(campo, serializers.ChoiceField):
+            mapa = {valor: campo.to_representation(valor) for valor in campo.choices}
+            return caminho, lambda valor: mapa.get(valor, valor)
+        if isinstance(campo, serializers.FileField):
+            return caminho, self._arquivo(campo, campo_modelo.storage)
+        if isinstance(campo, IDENTIDADE) and not getattr(campo, 'pk_field', None):
+            return caminho, None
+        if type(campo) is serializers.ReadOnlyField:
+            return caminho, None
+        return caminho, campo.to_representation
+
+    def _arquivo(self, campo, storage):
+        request = campo.context.get('request')
+        usar_url = getattr(campo, 'use_url', True)
+
+        def conversor(nome):
+            if not nome:
+                return None
+            if not usar_url:
+                return nome
+            url = storage.url(nome)
+            return request.build_absolute_uri(url) if request is not None else url
+        return conversor
+
+
+class ProjecaoMixin:
+    """
+    Projeção do serializador da view, montada uma vez por requisição
+    """
+    def get_projecao(self):
+        if getattr(self, '_projecao', None) is None:
+            self._projecao = Projecao(self.get_serializer())
+        return self._projecao
+
+    def campos_consulta(self):
+        """
+        Caminhos lidos do banco: os da projeção e os usados pelo cursor da paginação
+        """
+        campos = list(self.get_projecao().campos)
+        paginador = self.paginator
+        if paginador is not None and hasattr(paginador, 'campos_ordenacao'):
+            campos += [campo for campo in paginador.campos_ordenacao(self.request) if campo not in campos]
+        return campos
+
+
+class ListagemProjetadaMixin(ProjecaoMixin):
+    """
+    Mixin para ``ListAPIView`` que serializa a página com uma ``Projecao``.
+
+    Filtros, ordenação e paginação continuam os da view; só a leitura passa a
+    ser feita com ``values()``. Desligado com ``API_LISTAGEM_PROJETADA = False``.
+    """
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'API_LISTAGEM_PROJETADA', True):
+            return super().list(request, *args, **kwargs)
+
+        projecao = self.get_projecao()
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.campos_consulta())
+        pagina = self.paginate_queryset(queryset)
+        if pagina is not None:
+            return self.get_paginated_response(projecao.serializar(pagina))
+        return Response(projecao.serializar(queryset))
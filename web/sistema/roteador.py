@@ -0,0 +1,155 @@
+"""
+Réplicas de leitura.
+
+As réplicas são configuradas em ``DB_REPLICAS`` (ver ``settings.py``), que
+gera um alias por réplica (``replica1``, ``replica2``...). Sem réplicas, tudo
+vai para ``default``.
+
+Só vão para uma réplica as leituras feitas dentro de ``leitura_replica()``,
+usado pelas views de listagem e busca com ``LeituraReplicaMixin`` (em GET e
+HEAD). Todas as escritas e as demais leituras continuam no primário. Usuários,
+tokens, sessões e o cache em banco (``APPS_PRIMARIO``) são lidos do primário
+mesmo dentro de ``leitura_replica()``: a autenticação roda dentro do dispatch
+das views, e um token revogado ou um usuário desativado não podem continuar
+válidos enquanto a réplica está atrasada (nem um token recém-emitido ser
+recusado). Como já são lidos do primário, gravações nesses apps não fixam o
+cliente no primário.
+
+Leitura após escrita: o roteador percebe as escritas feitas durante a
+requisição e o ``PrimarioAposEscritaMiddleware`` responde com um cookie que
+mantém as leituras desse cliente no primário por ``DB_PRIMARIO_APOS_ESCRITA``
+segundos, tempo suficiente para a réplica alcançar o primário.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+COOKIE_PRIMARIO = 'ler_primario'
+METODOS_LEITURA = ('GET', 'HEAD')
+# Apps com dados de autenticação e o cache em banco (CACHE_BACKEND=banco, cujo
+# modelo falso tem app_label 'django_cache'), sempre lidos do primário
+APPS_PRIMARIO = ('auth', 'authtoken', 'sessions', 'django_cache')
+
+_leitura_replica = contextvars.ContextVar('leitura_replica', default=False)
+_escritas = contextvars.ContextVar('escritas', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DB_REPLICAS_ALIASES', [])
+
+
+@contextmanager
+def leitura_replica():
+    """
+    Envia para uma réplica as leituras feitas dentro do bloco
+    """
+    marca = _leitura_replica.set(True)
+    try:
+        yield
+    finally:
+        _leitura_replica.reset(marca)
+
+
+def fixado_no_primario(request):
+    """
+    Returns:
+        bool: True se o cliente escreveu há pouco e deve ler do primário
+    """
+    try:
+        return float(request.COOKIES.get(COOKIE_PRIMARIO, '')) > time.time()
+    except ValueError:
+        return False
+
+
+class RoteadorReplicas:
+    """
+    Roteador do Django: escritas no primário e leituras marcadas nas réplicas
+    """
+    def db_for_read(self, model, **hints):
+        disponiveis = replicas()
+        if disponiveis and _leitura_replica.get() and model._meta.app_label not in APPS_PRIMARIO:
+            return random.choice(disponiveis)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        escritas = _escritas.get()
+        if escritas is not None and model._meta.app_label not in APPS_PRIMARIO:
+            escritas.append(model._meta.app_label)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primário e réplicas têm os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o esquema pela replicação
+        return db not in replicas()
+
+
+class PrimarioAposEscritaMiddleware:
+    """
+    Mantém no primário, por alguns segundos, as leituras de quem acabou de escrever
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        marca = _escritas.set([])
+        try:
+            resposta = self.get_response(request)
+            escreveu = bool(_escritas.get())
+        finally:
+            _escritas.reset(marca)
+        return self.marcar(resposta, escreveu)
+
+    async def __acall__(self, request):
+        marca = _escritas.set([])
+        try:
+            resposta = await self.get_response(request)
+            escreveu = bool(_escritas.get())
+        finally:
+            _escritas.reset(marca)
+        return self.marcar(resposta, escreveu)
+
+    def marcar(self, resposta, escreveu):
+        janela = getattr(settings, 'DB_PRIMARIO_APOS_ESCRITA', 5)
+        if escreveu and replicas() and janela > 0:
+            resposta.set_cookie(
+                COOKIE_PRIMARIO, str(time.time() + janela), max_age=janela,
+                httponly=True, samesite='Lax',
+            )
+        return resposta
+
+
+class LeituraReplicaMixin:
+    """
+    Mixin para views de listagem e busca que leem das réplicas em GET e HEAD
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in METODOS_LEITURA or fixado_no_primario(request):
+            return super().dispatch(request, *args, **kwargs)
+        with leitura_replica():
+            resposta = super().dispatch(request, *args, **kwargs)
+            # A página do ListView é renderizada depois do dispatch: a paginação
+            # e o template também precisam ler da réplica
+            if hasattr(resposta, 'render') and not resposta.is_rendered:
+                resposta.render()
+        return resposta
+
+    async def adispatch(self, request, *args, **kwargs):
+        # Views assíncronas da API (sistema.assincrono)
+        if request.method not in METODOS_LEITURA or fixado_no_primario(request):
+            return await super().adispatch(request, *args, **kwargs)
+        with leitura_replica():
+            return await super().adispatch(request, *args, **kwargs)
@@ -0,0 +1,143 @@
+"""
+Seleção de campos nas APIs (``?fields=`` e ``?expand=``).
+
+* ``expand``: objetos aninhados incluídos na resposta (``veiculo_info``,
+  ``usuario_info``). Sem o parâmetro, todos são incluídos; ``expand=`` vazio
+  não inclui nenhum.
+* ``fields``: campos da resposta, separados por vírgula. Campos de um objeto
+  aninhado usam ponto (``veiculo_info.modelo``); o objeto precisa estar em
+  ``expand``. Sem o parâmetro, todos os campos são incluídos.
+
+Os nomes aceitos são os campos de leitura do serializador da view. A seleção
+poda o serializador e, a partir dele (``sistema.projecao``), as colunas e os
+JOINs da consulta: ``values()`` nas listagens projetadas e ``only()`` com
+``select_related`` nos demais casos.
+
+Exemplo, para a listagem do aplicativo::
+
+    /anuncio/api/?fields=id,preco,veiculo_info.marca,veiculo_info.modelo,veiculo_info.ano,veiculo_info.foto_variantes
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from sistema.projecao import ProjecaoMixin
+
+
+def separar(valor):
+    return [item.strip() for item in valor.split(',') if item.strip()]
+
+
+def ler_selecao(parametros, serializador, campos_param='fields', expansao_param='expand'):
+    """
+    Interpreta e valida os parâmetros de seleção
+
+    Returns:
+        dict: Campo → None (todos os subcampos) ou conjunto de subcampos; None
+        se a requisição não pediu seleção
+    """
+    campos_valor = parametros.get(campos_param)
+    expansao_valor = parametros.get(expansao_param)
+    if campos_valor is None and expansao_valor is None:
+        return None
+
+    legiveis = {nome: campo for nome, campo in serializador.fields.items() if not campo.write_only}
+    aninhados = {nome for nome, campo in legiveis.items() if isinstance(campo, serializers.BaseSerializer)}
+
+    if expansao_valor is None:
+        expandidos = aninhados
+    else:
+        expandidos = set(separar(expansao_valor))
+        invalidos = expandidos - aninhados
+        if invalidos:
+            raise ValidationError({expansao_param: 'Expansão inválida: {}. Opções: {}.'.format(
+                ', '.join(sorted(invalidos)), ', '.join(sorted(aninhados)) or 'nenhuma'
+            )})
+
+    if campos_valor is None:
+        return {nome: None for nome in legiveis if nome not in aninhados or nome in expandidos}
+
+    selecao = {}
+    erros = []
+    for item in separar(campos_valor):
+        nome, _, subcampo = item.partition('.')
+        if nome not in legiveis or (subcampo and nome not in aninhados):
+            erros.append('Campo inválido: {}.'.format(item))
+        elif nome in aninhados and nome not in expandidos:
+            erros.append('O campo {} exige {}={}.'.format(item, expansao_param, nome))
+        elif not subcampo:
+            selecao[nome] = None
+        elif subcampo not in legiveis[nome].fields or legiveis[nome].fields[subcampo].write_only:
+            erros.append('Campo inválido: {}.'.format(item))
+        elif nome not in selecao or selecao[nome] is not None:
+            selecao.setdefault(nome, set()).add(subcampo)
+    if erros:
+        raise ValidationError({campos_param: erros})
+    if not selecao:
+        raise ValidationError({campos_param: ['Informe ao menos um campo.']})
+    return selecao
+
+
+def podar(serializador, selecao):
+    """
+    Remove do serializador (e dos aninhados) os campos fora da seleção
+    """
+    for nome in list(serializador.fields):
+        if nome not in selecao:
+            del serializador.fields[nome]
+        elif selecao[nome]:
+            aninhado = serializador.fields[nome]
+            for subcampo in list(aninhado.fields):
+                if subcampo not in selecao[nome]:
+                    del aninhado.fields[subcampo]
+
+
+class SelecaoCamposMixin(ProjecaoMixin):
+    """
+    Mixin para as views da API que aceita ``?fields=`` e ``?expand=``
+    """
+    campos_query_param = 'fields'
+    expansao_query_param = 'expand'
+
+    def get_selecao(self, serializador):
+        if not hasattr(self, '_selecao'):
+            self._selecao = ler_selecao(
+                self.request.query_params, serializador, self.campos_query_param, self.expansao_query_param
+            )
+        return self._selecao
+
+    def get_serializer(self, *args, **kwargs):
+        serializador = super().get_serializer(*args, **kwargs)
+        alvo = getattr(serializador, 'child', serializador)
+        selecao = self.get_selecao(alvo)
+        if selecao is not None:
+            podar(alvo, selecao)
+        return serializador
+
+    def filter_queryset(self, queryset):
+        return self.podar_queryset(super().filter_queryset(queryset))
+
+    def podar_queryset(self, queryset, *obrigatorios):
+        """
+        Lê do banco só as colunas e os relacionamentos dos campos selecionados
+
+        Args:
+            obrigatorios: Campos usados pela view além dos serializados
+        """
+        parametros = self.request.query_params
+        if self.campos_query_param not in parametros and self.expansao_query_param not in parametros:
+            return queryset
+        campos = self.campos_consulta()
+        relacoes = list(self.get_projecao().relacoes)
+        for campo in obrigatorios:
+            # Campos de relacionamentos (veiculo__updated_at) também trazem a relação
+            relacao = campo.rpartition('__')[0]
+            for necessario in (relacao, campo):
+                if necessario and necessario not in campos:
+                    campos.append(necessario)
+            if relacao and relacao not in relacoes:
+                relacoes.append(relacao)
+        queryset = queryset.select_related(None)
+        if relacoes:
+            # Sem argumentos, select_related() seguiria todas as chaves estrangeiras
+            queryset = queryset.select_related(*relacoes)
+        return queryset.only(*campos)
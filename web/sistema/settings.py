@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_bootstrap5',
     'veiculo.apps.VeiculoConfig',
     'anuncio.apps.AnuncioConfig',
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'sistema.roteador.PrimarioAposEscritaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,6 +79,9 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'libraries': {
+                'cartoes': 'sistema.cartoes',
+            },
         },
     },
 ]
@@ -87,16 +92,48 @@ WSGI_APPLICATION = 'sistema.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Conexões com o banco (ver sistema/conexoes.py): 'persistente' (conexão por
+# thread reaproveitada por DB_CONN_MAX_AGE segundos) ou 'pool' (pool do psycopg 3,
+# exige psycopg[pool]). Com DB_HEALTH_CHECKS, a conexão é testada antes do reuso.
+DB_CONEXOES = os.environ.get('DB_CONEXOES', 'persistente')
+
 DATABASES = {
     'default': {
-       'ENGINE':'django.db.backends.postgresql_psycopg2',
-       'NAME':'sistema',
-       'USER':'postgres',
-       'PASSWORD':'postgres',
-       'HOST':'127.0.0.1',
-       'PORT':'5432',
+       'ENGINE': 'sistema.banco',
+       'NAME': os.environ.get('DB_NAME', 'sistema'),
+       'USER': os.environ.get('DB_USER', 'postgres'),
+       'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
+       'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+       'PORT': os.environ.get('DB_PORT', '5432'),
+       'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')) if DB_CONEXOES == 'persistente' else 0,
+       'CONN_HEALTH_CHECKS': os.environ.get('DB_HEALTH_CHECKS', 'True').lower() == 'true',
+       # Limiar da busca de veículos por similaridade (veiculo.busca)
+       'OPTIONS': {'options': '-c pg_trgm.word_similarity_threshold=0.3'},
     }
 }
+if DB_CONEXOES == 'pool':
+    # Tempos em segundos: espera por uma conexão livre, ociosidade e vida máxima
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '600')),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', '3600')),
+    }
+
+# Réplicas de leitura (ver sistema/roteador.py): 'host:porta' separados por vírgula,
+# com o mesmo banco e usuário do primário. Nos testes, as réplicas espelham o default.
+DB_REPLICAS_ALIASES = []
+for _numero, _endereco in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    _host, _, _porta = _endereco.strip().partition(':')
+    DATABASES['replica{}'.format(_numero)] = dict(
+        DATABASES['default'], HOST=_host, PORT=_porta or DATABASES['default']['PORT'],
+        TEST={'MIRROR': 'default'},
+    )
+    DB_REPLICAS_ALIASES.append('replica{}'.format(_numero))
+DATABASE_ROUTERS = ['sistema.roteador.RoteadorReplicas']
+# Segundos em que quem acabou de escrever continua lendo do primário
+DB_PRIMARIO_APOS_ESCRITA = int(os.environ.get('DB_PRIMARIO_APOS_ESCRITA', '5'))
 
 
 # Password validation
@@ -152,6 +189,63 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/'
 
+# Contador de visualizações dos anúncios ('buffer' ou 'sincrono')
+ANUNCIO_VISUALIZACOES_MODO = os.environ.get('ANUNCIO_VISUALIZACOES_MODO', 'buffer')
+ANUNCIO_VISUALIZACOES_INTERVALO = int(os.environ.get('ANUNCIO_VISUALIZACOES_INTERVALO', '10'))
+
+# Estatísticas de mercado (ver anuncio/estatisticas.py): anúncios necessários
+# para mostrar o preço de mercado de um modelo
+ANUNCIO_ESTATISTICAS_MINIMO = int(os.environ.get('ANUNCIO_ESTATISTICAS_MINIMO', '3'))
+
+# Regressão dos planos de consulta (ver anuncio/planos.py): anúncios gerados nos
+# testes e tempo máximo de cada consulta canônica no medir_planos, em milissegundos
+ANUNCIO_PLANOS_QUANTIDADE = int(os.environ.get('ANUNCIO_PLANOS_QUANTIDADE', '2000'))
+ANUNCIO_PLANOS_ORCAMENTO = float(os.environ.get('ANUNCIO_PLANOS_ORCAMENTO', '50'))
+
+# Entrega das fotos de veículos (ver veiculo/entrega.py)
+VEICULO_FOTOS_ASSINADAS = os.environ.get('VEICULO_FOTOS_ASSINADAS', 'False').lower() == 'true'
+VEICULO_FOTOS_VALIDADE = int(os.environ.get('VEICULO_FOTOS_VALIDADE', '3600'))
+# '' (Django envia o arquivo), 'x-accel-redirect' (nginx) ou 'x-sendfile' (Apache)
+VEICULO_FOTOS_OFFLOAD = os.environ.get('VEICULO_FOTOS_OFFLOAD', '')
+VEICULO_FOTOS_OFFLOAD_PREFIXO = os.environ.get('VEICULO_FOTOS_OFFLOAD_PREFIXO', '/protegido/')
+
+# Cache dos tokens da API (ver sistema/autenticacao.py), validades em segundos
+API_TOKENS_CACHE_LOCAL_VALIDADE = int(os.environ.get('API_TOKENS_CACHE_LOCAL_VALIDADE', '10'))
+API_TOKENS_CACHE_VALIDADE = int(os.environ.get('API_TOKENS_CACHE_VALIDADE', '300'))
+API_TOKENS_CACHE_TAMANHO = int(os.environ.get('API_TOKENS_CACHE_TAMANHO', '10000'))
+
+# Listagens da API serializadas a partir de values() (ver sistema/projecao.py)
+API_LISTAGEM_PROJETADA = os.environ.get('API_LISTAGEM_PROJETADA', 'True').lower() == 'true'
+
+# Views de leitura da API assíncronas (ver sistema/assincrono.py); ligado por padrão no sistema/asgi.py
+API_ASSINCRONA = os.environ.get('API_ASSINCRONA', 'False').lower() == 'true'
+
+# Cache compartilhado: 'locmem' (padrão, um por processo), 'arquivo', 'banco'
+# (exige manage.py createcachetable), 'redis' ou 'memcached'. Em produção use
+# um backend compartilhado entre os processos.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'sistema'),
+    'arquivo': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'banco': ('django.core.cache.backends.db.DatabaseCache', 'sistema_cache'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', 'sistema'),
+    }
+}
+
+# Páginas públicas da listagem de anúncios em cache (ver anuncio/cache_listagem.py),
+# validade em segundos (0 desliga)
+ANUNCIO_LISTAGEM_CACHE_VALIDADE = int(os.environ.get('ANUNCIO_LISTAGEM_CACHE_VALIDADE', '300'))
+
+# Cartões das listagens em cache (ver sistema/cartoes.py), validade em segundos (0 desliga)
+CARTOES_CACHE_VALIDADE = int(os.environ.get('CARTOES_CACHE_VALIDADE', '3600'))
+
 # Security settings
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
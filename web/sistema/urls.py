@@ -2,12 +2,14 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from sistema.views import Index, Login, Logout, LoginAPI
+from sistema.views import Index, Login, Logout, LoginAPI, EstatisticasAutenticacaoAPI, EstatisticasBancoAPI
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', Index.as_view(), name='index'),
     path('autenticacao-api/', LoginAPI.as_view(), name='autenticacao-api'),
+    path('autenticacao-api/estatisticas/', EstatisticasAutenticacaoAPI.as_view(), name='autenticacao-api-estatisticas'),
+    path('banco-api/estatisticas/', EstatisticasBancoAPI.as_view(), name='banco-api-estatisticas'),
     path('login/', Login.as_view(), name='login'),
     path('logout/', Logout.as_view(), name='logout'),
     path('veiculo/', include('veiculo.urls')),
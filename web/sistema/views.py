@@ -4,9 +4,14 @@ from django.views.generic import View
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.conf import settings
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from sistema.autenticacao import TokenEmCache, cache_tokens
+from sistema.conexoes import estatisticas as estatisticas_conexoes
 import logging
 
 logger = logging.getLogger('sistema')
@@ -77,6 +82,28 @@ class LoginAPI(ObtainAuthToken):
         })
 
 
+class EstatisticasAutenticacaoAPI(APIView):
+    """
+    Contadores do cache de tokens da API no processo que atendeu a requisição
+    """
+    authentication_classes = [TokenEmCache, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_tokens.estatisticas())
+
+
+class EstatisticasBancoAPI(APIView):
+    """
+    Conexões com o banco no processo que atendeu a requisição (espera e ocupação)
+    """
+    authentication_classes = [TokenEmCache, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(estatisticas_conexoes())
+
+
 class Logout(View):
     """
     Class Based View para logout de usuários
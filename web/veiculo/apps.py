@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class VeiculoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'veiculo'
+
+    def ready(self):
+        from veiculo import signals  # noqa: F401
+        # Invalidação do cache de tokens da API (sistema não é um app)
+        from sistema import autenticacao  # noqa: F401
@@ -0,0 +1,62 @@
+"""
+Busca de veículos pelo modelo.
+
+Combina a busca por trecho (``icontains``) com a similaridade de trigramas do
+``pg_trgm``, que tolera erros de digitação ("onyx" encontra "Onix"). As duas
+condições usam o índice GIN ``veiculo_modelo_trgm_idx``, criado sobre
+``UPPER(modelo)`` porque é essa a expressão que o Django gera para o
+``icontains`` no PostgreSQL.
+
+O limiar de similaridade é o ``pg_trgm.word_similarity_threshold`` da conexão,
+definido em ``DATABASES['default']['OPTIONS']``.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Upper
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from veiculo.catalogo import COMBUSTIVEIS, MARCAS
+
+
+def buscar_veiculos(queryset, termo):
+    """
+    Filtra os veículos cujo modelo contém o termo ou é parecido com ele, ou
+    cuja marca ou combustível começa pelo termo ("chev", "eletrico").
+
+    Returns:
+        QuerySet: Veículos encontrados, com a anotação ``similaridade``
+    """
+    condicao = (
+        Q(modelo__icontains=termo) |
+        Q(modelo_maiusculo__trigram_word_similar=termo)
+    )
+    marcas = MARCAS.buscar(termo)
+    if marcas:
+        condicao |= Q(marca__in=marcas)
+    combustiveis = COMBUSTIVEIS.buscar(termo)
+    if combustiveis:
+        condicao |= Q(combustivel__in=combustiveis)
+    return queryset.alias(modelo_maiusculo=Upper('modelo')).filter(condicao).annotate(
+        similaridade=TrigramWordSimilarity(termo, 'modelo')
+    )
+
+
+class BuscaVeiculosFilter(BaseFilterBackend):
+    """
+    Filtro do DRF que aplica a busca por modelo pelo parâmetro ``search``.
+
+    Sem ordenação explícita na requisição, os resultados saem dos mais
+    parecidos para os menos parecidos; por isso deve vir depois do
+    OrderingFilter em ``filter_backends``.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        termo = request.query_params.get(self.search_param, '').strip()
+        if not termo:
+            return queryset
+        queryset = buscar_veiculos(queryset, termo)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-similaridade', '-created_at')
+        return queryset
@@ -0,0 +1,108 @@
+"""
+Catálogo das opções de veículo (marcas, cores e combustíveis).
+
+As estruturas de consulta são montadas uma única vez, na importação, a partir
+de ``veiculo/consts.py`` e não podem ser alteradas depois:
+
+* valor → rótulo, usado pelos serializadores no lugar de ``get_*_display``;
+* rótulo normalizado → valores;
+* prefixo normalizado → valores, para a busca por texto livre.
+
+A normalização remove acentos, ignora maiúsculas e pontuação, então
+"eletrico" encontra ELÉTRICO e "chev" ou "gm" encontram CHEVROLET - GM, com
+uma única consulta a dicionário.
+"""
+import re
+import unicodedata
+from types import MappingProxyType
+
+from veiculo.consts import OPCOES_COMBUSTIVEIS, OPCOES_CORES, OPCOES_MARCAS
+
+
+def normalizar(texto):
+    """
+    Remove acentos e pontuação e coloca o texto em maiúsculas
+
+    Returns:
+        str: Palavras do texto normalizadas, separadas por um espaço
+    """
+    sem_acento = ''.join(
+        caractere for caractere in unicodedata.normalize('NFKD', str(texto))
+        if not unicodedata.combining(caractere)
+    )
+    return ' '.join(re.findall(r'\w+', sem_acento.upper()))
+
+
+class CatalogoOpcoes:
+    """
+    Índices imutáveis de um conjunto de opções (valor, rótulo)
+    """
+    def __init__(self, opcoes):
+        self.opcoes = tuple(opcoes)
+        self.rotulos = MappingProxyType(dict(self.opcoes))
+
+        por_rotulo = {}
+        por_prefixo = {}
+        for valor, rotulo in self.opcoes:
+            normalizado = normalizar(rotulo)
+            por_rotulo.setdefault(normalizado, set()).add(valor)
+            # Prefixos a partir de cada palavra: "GM" e "CHEVROLET G" também
+            # levam a CHEVROLET - GM
+            palavras = normalizado.split(' ')
+            for inicio in range(len(palavras)):
+                trecho = ' '.join(palavras[inicio:])
+                for fim in range(1, len(trecho) + 1):
+                    por_prefixo.setdefault(trecho[:fim].rstrip(), set()).add(valor)
+
+        self.por_rotulo = MappingProxyType({chave: frozenset(v) for chave, v in por_rotulo.items()})
+        self.por_prefixo = MappingProxyType({chave: frozenset(v) for chave, v in por_prefixo.items()})
+
+    def __deepcopy__(self, memo):
+        # Imutável: os serializadores do DRF copiam seus campos a cada uso
+        return self
+
+    def rotulo(self, valor):
+        """
+        Retorna o rótulo de um valor (o próprio valor se ele não existir)
+        """
+        return self.rotulos.get(valor, valor)
+
+    def buscar(self, termo):
+        """
+        Retorna os valores cujo rótulo tem alguma palavra começando pelo termo
+
+        Returns:
+            frozenset: Valores encontrados (vazio se nenhum)
+        """
+        return self.por_prefixo.get(normalizar(termo), frozenset())
+
+    def valor(self, texto):
+        """
+        Converte um código ("3") ou um rótulo completo ("Chevrolet - GM") no valor
+
+        Returns:
+            int: Valor da opção, ou None se o texto não identificar uma única opção
+        """
+        texto = str(texto).strip()
+        if texto.isdigit():
+            return int(texto) if int(texto) in self.rotulos else None
+        valores = self.por_rotulo.get(normalizar(texto), ())
+        return next(iter(valores)) if len(valores) == 1 else None
+
+    def resolver(self, termo):
+        """
+        Converte o parâmetro de um filtro em valores: aceita o próprio valor
+        ("3") ou um texto ("chev")
+
+        Returns:
+            frozenset: Valores correspondentes (vazio se nenhum)
+        """
+        termo = str(termo).strip()
+        if termo.isdigit():
+            return frozenset([int(termo)])
+        return self.buscar(termo)
+
+
+MARCAS = CatalogoOpcoes(OPCOES_MARCAS)
+CORES = CatalogoOpcoes(OPCOES_CORES)
+COMBUSTIVEIS = CatalogoOpcoes(OPCOES_COMBUSTIVEIS)
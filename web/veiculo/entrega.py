@@ -0,0 +1,232 @@
+"""
+Entrega das fotos de veículos pela view ``FotoVeiculo``.
+
+* URLs assinadas e com validade: a assinatura autoriza o acesso, então o
+  caminho comum não consulta o banco (nem a sessão do usuário). O horário da
+  assinatura é arredondado para ``JANELA_ASSINATURA``, de modo que a mesma foto
+  mantém a mesma URL (e o cache do navegador) durante a janela.
+* GET condicional: ``ETag`` e ``Last-Modified`` a partir do arquivo, com 304
+  para ``If-None-Match``/``If-Modified-Since``.
+* Faixas de bytes (``Range``/``If-Range``) com resposta 206.
+* Com ``VEICULO_FOTOS_OFFLOAD`` configurado, o corpo é enviado pelo proxy
+  (``X-Accel-Redirect`` do nginx ou ``X-Sendfile`` do Apache/lighttpd) e o
+  Django só responde os cabeçalhos.
+
+Configurações:
+
+* ``VEICULO_FOTOS_ASSINADAS``: se True, as URLs das fotos e miniaturas
+  apontam para ``FotoVeiculo`` com assinatura, em vez de ``MEDIA_URL``;
+* ``VEICULO_FOTOS_VALIDADE``: segundos de validade das URLs assinadas;
+* ``VEICULO_FOTOS_OFFLOAD``: ``''``, ``'x-accel-redirect'`` ou ``'x-sendfile'``;
+* ``VEICULO_FOTOS_OFFLOAD_PREFIXO``: location interna do nginx que aponta para
+  ``MEDIA_ROOT`` (usado com ``x-accel-redirect``).
+"""
+import mimetypes
+import os
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+DIRETORIO_FOTOS = 'veiculo/fotos'
+JANELA_ASSINATURA = 15 * 60
+TAMANHO_BLOCO = 64 * 1024
+FAIXA = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class AssinaturaFoto(signing.TimestampSigner):
+    """
+    Assinatura com o horário arredondado para ``JANELA_ASSINATURA``
+    """
+    def timestamp(self):
+        return signing.b62_encode(janela_atual())
+
+
+assinador = AssinaturaFoto(salt='veiculo.foto')
+
+
+def janela_atual():
+    """
+    Returns:
+        int: Início da janela de assinatura atual; as URLs assinadas não mudam dentro dela
+    """
+    return int(time.time()) // JANELA_ASSINATURA * JANELA_ASSINATURA
+
+
+def validade():
+    return getattr(settings, 'VEICULO_FOTOS_VALIDADE', 3600)
+
+
+def assinar(arquivo):
+    """
+    Returns:
+        str: Assinatura do nome do arquivo (horário e código)
+    """
+    return assinador.sign(arquivo)[len(arquivo) + 1:]
+
+
+def assinatura_valida(arquivo, assinatura):
+    """
+    Verifica a assinatura de um arquivo, considerando a validade
+    """
+    if not assinatura:
+        return False
+    try:
+        assinador.unsign('{}:{}'.format(arquivo, assinatura), max_age=validade() + JANELA_ASSINATURA)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def url_foto(nome):
+    """
+    URL assinada de uma foto (ou miniatura) do diretório de fotos
+
+    Args:
+        nome (str): Nome no armazenamento, ex.: ``veiculo/fotos/carro.640w.webp``
+    """
+    arquivo = os.path.basename(nome)
+    return '{}?assinatura={}'.format(
+        reverse('veiculo:foto-veiculo', args=[arquivo]), assinar(arquivo)
+    )
+
+
+def fotos_assinadas():
+    return getattr(settings, 'VEICULO_FOTOS_ASSINADAS', False)
+
+
+def _faixa(cabecalho, tamanho):
+    """
+    Interpreta um cabeçalho Range com uma única faixa
+
+    Returns:
+        tuple: (início, fim) inclusivos; None para ignorar o cabeçalho; ou
+        False se a faixa não puder ser atendida
+    """
+    encontrada = FAIXA.match(cabecalho.replace(' ', ''))
+    if not encontrada or encontrada.groups() == ('', ''):
+        # Formato desconhecido ou várias faixas: responde o arquivo inteiro
+        return None
+    inicio, fim = encontrada.groups()
+    if inicio == '':
+        # Sufixo: os últimos N bytes
+        inicio, fim = max(tamanho - int(fim), 0), tamanho - 1
+    else:
+        inicio, fim = int(inicio), min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        return False
+    return inicio, fim
+
+
+def _ler(caminho, inicio, quantidade):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        while quantidade > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, quantidade))
+            if not bloco:
+                break
+            quantidade -= len(bloco)
+            yield bloco
+
+
+def responder_foto(request, nome, cache_control='private'):
+    """
+    Responde uma foto do armazenamento local com GET condicional, faixas de
+    bytes e, se configurado, envio pelo proxy
+
+    Returns:
+        HttpResponse: 200, 206, 304, 412 ou 416; None se o arquivo não existir
+    """
+    caminho = default_storage.path(nome)
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    if not os.path.isfile(caminho):
+        return None
+
+    etag = quote_etag('{:x}-{:x}'.format(estado.st_mtime_ns, estado.st_size))
+    modificado = int(estado.st_mtime)
+    cabecalhos = {
+        'ETag': etag,
+        'Last-Modified': http_date(modificado),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+    }
+
+    resposta = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if resposta is not None:
+        for cabecalho, valor in cabecalhos.items():
+            resposta[cabecalho] = valor
+        return resposta
+
+    tipo = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+    offload = getattr(settings, 'VEICULO_FOTOS_OFFLOAD', '')
+    if offload:
+        # O proxy envia o corpo e trata faixas de bytes por conta própria
+        resposta = HttpResponse(content_type=tipo)
+        if offload == 'x-accel-redirect':
+            prefixo = getattr(settings, 'VEICULO_FOTOS_OFFLOAD_PREFIXO', '/protegido/')
+            resposta['X-Accel-Redirect'] = prefixo.rstrip('/') + '/' + nome
+        else:
+            resposta['X-Sendfile'] = caminho
+    else:
+        faixa = None
+        cabecalho_faixa = request.META.get('HTTP_RANGE')
+        if cabecalho_faixa and _if_range_atende(request, etag, modificado):
+            faixa = _faixa(cabecalho_faixa, estado.st_size)
+        if faixa is False:
+            resposta = HttpResponse(status=416)
+            resposta['Content-Range'] = 'bytes */{}'.format(estado.st_size)
+        elif faixa:
+            inicio, fim = faixa
+            resposta = StreamingHttpResponse(_ler(caminho, inicio, fim - inicio + 1), status=206, content_type=tipo)
+            resposta['Content-Range'] = 'bytes {}-{}/{}'.format(inicio, fim, estado.st_size)
+            resposta['Content-Length'] = fim - inicio + 1
+        else:
+            resposta = StreamingHttpResponse(_ler(caminho, 0, estado.st_size), content_type=tipo)
+            resposta['Content-Length'] = estado.st_size
+
+    for cabecalho, valor in cabecalhos.items():
+        resposta[cabecalho] = valor
+    return resposta
+
+
+def _if_range_atende(request, etag, modificado):
+    """
+    Com If-Range, a faixa só vale se o arquivo não mudou
+    """
+    condicao = request.META.get('HTTP_IF_RANGE')
+    if not condicao:
+        return True
+    if condicao.startswith(('"', 'W/')):
+        return condicao == etag
+    return parse_http_date_safe(condicao) == modificado
+
+
+async def _ler_assincrono(blocos):
+    # Cada leitura do disco roda fora do loop de eventos
+    proximo = sync_to_async(next, thread_sensitive=False)
+    while True:
+        bloco = await proximo(blocos, None)
+        if bloco is None:
+            break
+        yield bloco
+
+
+async def aresponder_foto(request, nome, cache_control='private'):
+    """
+    Versão de ``responder_foto`` para views assíncronas: o acesso ao disco
+    não bloqueia o loop de eventos e o corpo é um iterador assíncrono
+    """
+    resposta = await sync_to_async(responder_foto, thread_sensitive=False)(request, nome, cache_control)
+    if isinstance(resposta, StreamingHttpResponse) and not resposta.is_async:
+        resposta.streaming_content = _ler_assincrono(iter(resposta.streaming_content))
+    return resposta
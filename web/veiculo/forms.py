@@ -1,8 +1,8 @@
 from django import forms
 from veiculo.models import Veiculo
+from veiculo.validadores import validar_ano, validar_chassi, validar_placa
 
 
-from django.core.validators import RegexValidator
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
@@ -17,13 +17,7 @@ class FormularioVeiculo(forms.ModelForm):
     placa = forms.CharField(
         max_length=8,
         required=False,
-        validators=[
-            RegexValidator(
-                regex=r'^[A-Z]{3}[\-]?[0-9][0-9A-Z][0-9]{2}$',
-                message=_("Placa inválida. Use o formato AAA-0000 ou AAA0A00"),
-                code='invalid_plate'
-            )
-        ],
+        validators=[validar_placa],
         help_text=_("Formato: AAA-0000 ou AAA0A00 (Mercosul)")
     )
     
@@ -57,39 +51,13 @@ class FormularioVeiculo(forms.ModelForm):
         """
         Validação personalizada para o ano
         """
-        ano = self.cleaned_data.get('ano')
-        ano_atual = timezone.now().year
-        
-        if ano and (ano < 1900 or ano > ano_atual + 1):
-            raise forms.ValidationError(
-                _("O ano deve estar entre 1900 e %(ano_max)s."),
-                params={'ano_max': ano_atual + 1}
-            )
-        return ano
-        
+        return validar_ano(self.cleaned_data.get('ano'))
+
     def clean_chassi(self):
         """
         Validação personalizada para o chassi
         """
-        chassi = self.cleaned_data.get('chassi')
-        if chassi:
-            # Remover espaços e traços
-            chassi = chassi.upper().replace(' ', '').replace('-', '')
-            
-            # Verificar se contém caracteres inválidos (I, O, Q)
-            invalid_chars = ['I', 'O', 'Q']
-            if any(char in chassi for char in invalid_chars):
-                raise forms.ValidationError(
-                    _("Chassi não pode conter as letras I, O ou Q.")
-                )
-                
-            # Verificar comprimento
-            if len(chassi) != 17:
-                raise forms.ValidationError(
-                    _("Chassi deve ter exatamente 17 caracteres.")
-                )
-                
-        return chassi
+        return validar_chassi(self.cleaned_data.get('chassi'))
 
     class Meta:
         model = Veiculo
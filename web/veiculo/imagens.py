@@ -0,0 +1,159 @@
+"""
+Variantes responsivas das fotos de veículos.
+
+Para cada foto enviada são geradas miniaturas com larguras fixas
+(``LARGURAS``) em WebP e JPEG, sem os metadados EXIF (a orientação da câmera é
+aplicada antes). As variantes ficam no mesmo diretório da foto, com a largura
+no nome::
+
+    veiculo/fotos/carro.jpg -> veiculo/fotos/carro.320w.webp
+                               veiculo/fotos/carro.320w.jpg
+                               ...
+
+Como o nome de cada variante é derivado do nome da foto, as URLs e o
+``srcset`` são montados sem acessar o armazenamento. Fotos menores que uma
+largura não são ampliadas: a variante fica com o tamanho original.
+
+Com ``VEICULO_FOTOS_ASSINADAS``, as URLs apontam para a view ``FotoVeiculo``
+com assinatura (ver ``veiculo.entrega``) em vez de ``MEDIA_URL``.
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from veiculo.entrega import fotos_assinadas, url_foto
+
+logger = logging.getLogger('veiculo')
+
+LARGURAS = (320, 640, 1280)
+LARGURA_PADRAO = 640
+FORMATOS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def nome_variante(nome, largura, formato):
+    """
+    Nome da variante de uma foto no armazenamento
+
+    Returns:
+        str: Ex.: ``veiculo/fotos/carro.640w.webp``
+    """
+    raiz, _ = os.path.splitext(nome)
+    return '{}.{}w.{}'.format(raiz, largura, formato)
+
+
+def nomes_variantes(nome):
+    return [
+        nome_variante(nome, largura, formato)
+        for largura in LARGURAS for formato in FORMATOS
+    ]
+
+
+def gerar_variantes(nome, storage=default_storage):
+    """
+    Gera (ou regera) todas as variantes de uma foto
+
+    Returns:
+        int: Quantidade de arquivos gravados
+    """
+    with storage.open(nome, 'rb') as arquivo:
+        imagem = Image.open(arquivo)
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode not in ('RGB', 'L'):
+            imagem = imagem.convert('RGB')
+
+    gravados = 0
+    for largura in LARGURAS:
+        miniatura = imagem.copy()
+        # A altura não limita: só a largura é fixa
+        miniatura.thumbnail((largura, largura * 10), Image.LANCZOS)
+        for formato, opcoes in FORMATOS.items():
+            conteudo = io.BytesIO()
+            # Sem o parâmetro exif, o Pillow não grava os metadados
+            miniatura.save(conteudo, **opcoes)
+            destino = nome_variante(nome, largura, formato)
+            if storage.exists(destino):
+                storage.delete(destino)
+            storage.save(destino, ContentFile(conteudo.getvalue()))
+            gravados += 1
+    return gravados
+
+
+def remover_variantes(nome, storage=default_storage):
+    """
+    Remove as variantes de uma foto
+    """
+    for destino in nomes_variantes(nome):
+        if storage.exists(destino):
+            storage.delete(destino)
+
+
+def variantes_pendentes(nome, storage=default_storage):
+    """
+    Verifica se falta alguma variante de uma foto
+    """
+    return not all(storage.exists(destino) for destino in nomes_variantes(nome))
+
+
+def processar_foto(nome, todas=False):
+    """
+    Gera as variantes de uma foto no processo atual (usado pelo comando de
+    preenchimento, em um pool de processos)
+
+    Returns:
+        tuple: (nome, arquivos gravados, mensagem de erro ou None)
+    """
+    try:
+        if not todas and not variantes_pendentes(nome):
+            return nome, 0, None
+        return nome, gerar_variantes(nome), None
+    except Exception as erro:
+        return nome, 0, str(erro)
+
+
+class VariantesFoto:
+    """
+    URLs das variantes de uma foto, para uso em ``srcset``
+    """
+    def __init__(self, foto, absoluta=None):
+        self.foto = foto
+        self.absoluta = absoluta
+
+    def url(self, largura=LARGURA_PADRAO, formato='jpg'):
+        nome = nome_variante(self.foto.name, largura, formato)
+        url = url_foto(nome) if fotos_assinadas() else self.foto.storage.url(nome)
+        return self.absoluta(url) if self.absoluta else url
+
+    def srcset(self, formato='jpg'):
+        return ', '.join(
+            '{} {}w'.format(self.url(largura, formato), largura) for largura in LARGURAS
+        )
+
+    @property
+    def jpg(self):
+        return self.srcset('jpg')
+
+    @property
+    def webp(self):
+        return self.srcset('webp')
+
+    @property
+    def miniatura(self):
+        return self.url()
+
+    def como_dict(self, absoluta=None):
+        """
+        Args:
+            absoluta: Função que torna as URLs absolutas (``request.build_absolute_uri``)
+
+        Returns:
+            dict: ``srcset`` por formato e a URL da miniatura padrão
+        """
+        variantes = VariantesFoto(self.foto, absoluta) if absoluta else self
+        return {'miniatura': variantes.miniatura, 'jpg': variantes.jpg, 'webp': variantes.webp}
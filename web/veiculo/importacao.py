@@ -0,0 +1,187 @@
+"""
+Importação em massa de veículos a partir de arquivos CSV das revendas.
+
+O arquivo é lido em lotes. Cada linha passa pelas mesmas regras do cadastro
+(validadores dos campos do modelo e ``veiculo.validadores``). As linhas válidas
+são carregadas com ``COPY`` em uma tabela temporária e gravadas de uma vez com
+``INSERT ... ON CONFLICT (chassi) DO UPDATE``. As inválidas vão para um
+relatório CSV com o número da linha, o campo e a mensagem.
+
+Colunas aceitas no cabeçalho: marca, modelo, ano, cor, combustivel,
+quilometragem, placa e chassi. Marca, cor e combustível aceitam o código ou o
+nome da opção ("5" ou "Fiat").
+
+Linhas sem chassi são sempre inseridas. Quando um chassi se repete no
+arquivo, vale a última ocorrência.
+
+Como a gravação não passa pelo ``save()``, a importação envia o sinal
+``veiculo.signals.veiculos_importados`` com os veículos atualizados.
+"""
+import csv
+import io
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from veiculo.catalogo import COMBUSTIVEIS, CORES, MARCAS
+from veiculo.models import Veiculo
+from veiculo.signals import veiculos_importados
+from veiculo.validadores import validar_ano, validar_chassi
+
+COLUNAS = ('marca', 'modelo', 'ano', 'cor', 'combustivel', 'quilometragem', 'placa', 'chassi')
+OBRIGATORIAS = ('marca', 'modelo', 'ano', 'cor', 'combustivel')
+CATALOGOS = {'marca': MARCAS, 'cor': CORES, 'combustivel': COMBUSTIVEIS}
+LOTE_PADRAO = 5000
+
+# Já existe em uma segunda importação dentro da mesma transação externa
+TABELA_TEMPORARIA_SQL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS veiculo_importacao (
+    linha integer NOT NULL,
+    marca smallint NOT NULL,
+    modelo varchar(100) NOT NULL,
+    ano integer NOT NULL,
+    cor smallint NOT NULL,
+    combustivel smallint NOT NULL,
+    quilometragem integer NOT NULL,
+    placa varchar(8),
+    chassi varchar(17)
+) ON COMMIT DROP
+"""
+
+COPY_SQL = 'COPY veiculo_importacao ({}) FROM STDIN WITH (FORMAT csv)'.format(
+    ', '.join(('linha',) + COLUNAS)
+)
+
+GRAVAR_SQL = """
+WITH gravados AS (
+    INSERT INTO veiculo_veiculo ({colunas}, created_at, updated_at)
+    SELECT DISTINCT ON (coalesce(chassi, 'linha:' || linha)) {colunas}, now(), now()
+      FROM veiculo_importacao
+     ORDER BY coalesce(chassi, 'linha:' || linha), linha DESC
+    ON CONFLICT (chassi) DO UPDATE SET {atualizacao}, updated_at = EXCLUDED.updated_at
+    RETURNING id, (xmax = 0) AS inserido
+)
+SELECT count(*) FILTER (WHERE inserido), coalesce(array_agg(id) FILTER (WHERE NOT inserido), '{{}}')
+  FROM gravados
+""".format(
+    colunas=', '.join(COLUNAS),
+    atualizacao=', '.join('{0} = EXCLUDED.{0}'.format(coluna) for coluna in COLUNAS if coluna != 'chassi'),
+)
+
+
+def validar_linha(dados):
+    """
+    Valida e converte uma linha do arquivo
+
+    Returns:
+        tuple: (valores na ordem de ``COLUNAS``, lista de erros (campo, mensagem))
+    """
+    valores = []
+    erros = []
+    for coluna in COLUNAS:
+        bruto = (dados.get(coluna) or '').strip()
+        try:
+            if not bruto:
+                if coluna in OBRIGATORIAS:
+                    raise ValidationError('Campo obrigatório.')
+                valor = 0 if coluna == 'quilometragem' else None
+            elif coluna in CATALOGOS:
+                valor = CATALOGOS[coluna].valor(bruto)
+                if valor is None:
+                    raise ValidationError('Opção inválida: {}.'.format(bruto))
+            else:
+                if coluna == 'placa':
+                    bruto = bruto.upper()
+                elif coluna == 'chassi':
+                    bruto = validar_chassi(bruto)
+                valor = Veiculo._meta.get_field(coluna).clean(bruto, None)
+                if coluna == 'ano':
+                    validar_ano(valor)
+        except ValidationError as erro:
+            erros.extend((coluna, mensagem) for mensagem in erro.messages)
+            valor = None
+        valores.append(valor)
+    return valores, erros
+
+
+def _copiar(cursor, dados):
+    bruto = cursor.cursor
+    if hasattr(bruto, 'copy_expert'):
+        # psycopg2
+        bruto.copy_expert(COPY_SQL, dados)
+    else:
+        # psycopg 3
+        with bruto.copy(COPY_SQL) as copia:
+            copia.write(dados.getvalue())
+
+
+def importar_veiculos(arquivo, relatorio=None, lote=LOTE_PADRAO, simular=False):
+    """
+    Importa os veículos de um arquivo CSV
+
+    Args:
+        arquivo: Arquivo texto aberto, com cabeçalho
+        relatorio: Arquivo texto aberto para o relatório de erros (opcional)
+        lote (int): Linhas validadas e copiadas por vez
+        simular (bool): Valida e prepara tudo, mas desfaz a gravação no fim
+
+    Returns:
+        dict: Estatísticas da importação (lidas, validas, invalidas, inseridas,
+        atualizadas, repetidas, segundos e linhas_por_segundo)
+    """
+    inicio = time.monotonic()
+    leitor = csv.DictReader(arquivo)
+    faltando = [coluna for coluna in OBRIGATORIAS if coluna not in (leitor.fieldnames or ())]
+    if faltando:
+        raise ValueError('Colunas obrigatórias ausentes no cabeçalho: {}'.format(', '.join(faltando)))
+
+    escritor_erros = csv.writer(relatorio) if relatorio else None
+    if escritor_erros:
+        escritor_erros.writerow(['linha', 'campo', 'erro'] + list(leitor.fieldnames))
+
+    estatisticas = dict.fromkeys(('lidas', 'validas', 'invalidas', 'inseridas', 'atualizadas', 'repetidas'), 0)
+    # A primeira linha de dados é a linha 2 do arquivo
+    linhas = enumerate(leitor, start=2)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(TABELA_TEMPORARIA_SQL)
+        cursor.execute('TRUNCATE veiculo_importacao')
+        while True:
+            bloco = list(islice(linhas, lote))
+            if not bloco:
+                break
+            dados = io.StringIO()
+            escritor = csv.writer(dados)
+            for numero, registro in bloco:
+                valores, erros = validar_linha(registro)
+                if erros:
+                    estatisticas['invalidas'] += 1
+                    if escritor_erros:
+                        originais = [registro.get(coluna) for coluna in leitor.fieldnames]
+                        for campo, mensagem in erros:
+                            escritor_erros.writerow([numero, campo, mensagem] + originais)
+                    continue
+                escritor.writerow([numero] + valores)
+                estatisticas['validas'] += 1
+            estatisticas['lidas'] += len(bloco)
+            dados.seek(0)
+            _copiar(cursor, dados)
+
+        cursor.execute(GRAVAR_SQL)
+        estatisticas['inseridas'], atualizados = cursor.fetchone()
+        estatisticas['atualizadas'] = len(atualizados)
+        estatisticas['repetidas'] = (
+            estatisticas['validas'] - estatisticas['inseridas'] - estatisticas['atualizadas']
+        )
+        if simular:
+            transaction.set_rollback(True)
+        else:
+            veiculos_importados.send(
+                sender=Veiculo, inseridos=estatisticas['inseridas'], atualizados=atualizados
+            )
+
+    estatisticas['segundos'] = round(time.monotonic() - inicio, 2)
+    estatisticas['linhas_por_segundo'] = int(estatisticas['lidas'] / max(estatisticas['segundos'], 0.01))
+    return estatisticas
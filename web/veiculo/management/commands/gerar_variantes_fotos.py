@@ -0,0 +1,52 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand
+
+from veiculo.imagens import processar_foto
+from veiculo.models import Veiculo
+
+
+class Command(BaseCommand):
+    """
+    Gera as miniaturas das fotos já cadastradas, em paralelo.
+
+    Cada foto é processada em um processo do pool (um por núcleo, por padrão);
+    as fotos que já têm todas as variantes são puladas, salvo com --todas.
+    """
+    help = 'Gera as variantes (miniaturas WebP/JPEG) das fotos de veículos existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=os.cpu_count(),
+                            help='Quantidade de processos (padrão: um por núcleo)')
+        parser.add_argument('--todas', action='store_true',
+                            help='Regera também as fotos que já têm variantes')
+
+    def handle(self, *args, **options):
+        nomes = list(
+            Veiculo.objects.exclude(foto='').exclude(foto__isnull=True)
+            .order_by('pk').values_list('foto', flat=True).distinct()
+        )
+        # Os processos do pool só leem e gravam arquivos, sem acessar o banco
+        inicio = time.monotonic()
+        processadas = arquivos = falhas = 0
+        with ProcessPoolExecutor(max_workers=options['processos'], initializer=django.setup) as pool:
+            tarefa = partial(processar_foto, todas=options['todas'])
+            for nome, gravados, erro in pool.map(tarefa, nomes, chunksize=4):
+                if erro:
+                    falhas += 1
+                    self.stderr.write('{}: {}'.format(nome, erro))
+                elif gravados:
+                    processadas += 1
+                    arquivos += gravados
+
+        self.stdout.write(
+            '{} foto(s) processada(s), {} arquivo(s) gravado(s), {} falha(s), '
+            '{} já completa(s), em {:.2f}s'.format(
+                processadas, arquivos, falhas, len(nomes) - processadas - falhas,
+                time.monotonic() - inicio
+            )
+        )
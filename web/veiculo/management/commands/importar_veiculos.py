@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from veiculo.importacao import LOTE_PADRAO, importar_veiculos
+
+
+class Command(BaseCommand):
+    """
+    Importa o estoque de uma revenda a partir de um arquivo CSV.
+
+    Os veículos são atualizados pelo chassi: um chassi já cadastrado tem seus
+    dados substituídos pelos do arquivo. Veículos de anúncios ativos que forem
+    atualizados podem mudar de posição nos anúncios similares; rode
+    reconstruir_similares depois de importações grandes.
+    """
+    help = 'Importa veículos de um arquivo CSV (COPY + upsert pelo chassi)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo CSV com cabeçalho')
+        parser.add_argument('--erros', default=None,
+                            help='Relatório de linhas inválidas (padrão: <arquivo>.erros.csv)')
+        parser.add_argument('--lote', type=int, default=LOTE_PADRAO,
+                            help='Linhas validadas e copiadas por vez')
+        parser.add_argument('--encoding', default='utf-8-sig',
+                            help='Codificação do arquivo')
+        parser.add_argument('--simular', action='store_true',
+                            help='Valida e prepara a importação, mas não grava')
+
+    def handle(self, *args, **options):
+        caminho_erros = options['erros'] or '{}.erros.csv'.format(options['arquivo'])
+        try:
+            with open(options['arquivo'], newline='', encoding=options['encoding']) as arquivo, \
+                    open(caminho_erros, 'w', newline='', encoding='utf-8') as relatorio:
+                estatisticas = importar_veiculos(
+                    arquivo, relatorio, lote=options['lote'], simular=options['simular']
+                )
+        except (OSError, ValueError) as erro:
+            raise CommandError(erro)
+
+        self.stdout.write(
+            '{lidas} linha(s) lida(s): {validas} válida(s), {invalidas} inválida(s). '
+            '{inseridas} veículo(s) inserido(s), {atualizadas} atualizado(s), '
+            '{repetidas} chassi(s) repetido(s) no arquivo. '
+            '{segundos:.2f}s ({linhas_por_segundo} linhas/s)'.format(**estatisticas)
+        )
+        if estatisticas['invalidas']:
+            self.stdout.write('Relatório de erros: {}'.format(caminho_erros))
+        if options['simular']:
+            self.stdout.write('Simulação: nada foi gravado.')
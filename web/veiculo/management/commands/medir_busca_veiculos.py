@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from veiculo.busca import buscar_veiculos
+from veiculo.consts import OPCOES_COMBUSTIVEIS, OPCOES_CORES, OPCOES_MARCAS
+from veiculo.models import Veiculo
+
+MODELOS = (
+    'Onix', 'Onix Plus', 'Cruze', 'Tracker', 'Civic', 'Fit', 'HR-V', 'Corolla',
+    'Corolla Cross', 'Hilux', 'Gol', 'Polo', 'Virtus', 'T-Cross', 'Uno', 'Argo',
+    'Strada', 'Ka', 'Ranger', 'HB20', 'Creta', 'Compass', 'Renegade', 'Kwid',
+)
+
+
+class Command(BaseCommand):
+    """
+    Mede a busca de veículos por modelo com e sem o índice de trigramas.
+
+    Gera uma massa de veículos dentro de uma transação que é desfeita no fim,
+    então pode rodar em uma cópia do banco de produção sem deixar resíduos.
+    "Sem índice" desliga as varreduras por índice na transação, que é o que o
+    banco faz para o ``icontains`` quando só existe o índice B-tree.
+    """
+    help = 'Compara a latência da busca por modelo com e sem o índice pg_trgm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=100000,
+                            help='Quantidade de veículos gerados')
+        parser.add_argument('--repeticoes', type=int, default=20,
+                            help='Execuções de cada busca')
+        parser.add_argument('termos', nargs='*', default=['onix', 'onyx', 'corola', 'hb2'],
+                            help='Termos pesquisados')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.gerar(options['quantidade'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE veiculo_veiculo')
+
+            self.stdout.write('{:<10} {:>10} {:>12} {:>12} {:>8}'.format(
+                'termo', 'resultados', 'com índice', 'sem índice', 'ganho'
+            ))
+            for termo in options['termos']:
+                resultados, com_indice = self.medir(termo, options['repeticoes'])
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_bitmapscan = off')
+                    cursor.execute('SET LOCAL enable_indexscan = off')
+                _, sem_indice = self.medir(termo, options['repeticoes'])
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET enable_bitmapscan')
+                    cursor.execute('RESET enable_indexscan')
+                self.stdout.write('{:<10} {:>10} {:>10.2f}ms {:>10.2f}ms {:>7.1f}x'.format(
+                    termo, resultados, com_indice, sem_indice, sem_indice / com_indice
+                ))
+            transaction.set_rollback(True)
+
+    def gerar(self, quantidade):
+        marcas = [valor for valor, _ in OPCOES_MARCAS]
+        cores = [valor for valor, _ in OPCOES_CORES]
+        combustiveis = [valor for valor, _ in OPCOES_COMBUSTIVEIS]
+        for inicio in range(0, quantidade, 5000):
+            Veiculo.objects.bulk_create([
+                Veiculo(
+                    marca=random.choice(marcas),
+                    modelo='{} {}'.format(random.choice(MODELOS), random.randint(1, 9999)),
+                    ano=random.randint(1990, 2025),
+                    cor=random.choice(cores),
+                    combustivel=random.choice(combustiveis),
+                    quilometragem=random.randint(0, 300000),
+                )
+                for _ in range(min(5000, quantidade - inicio))
+            ])
+
+    def medir(self, termo, repeticoes):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultados = len(
+                buscar_veiculos(Veiculo.objects.all(), termo).order_by('-similaridade', '-created_at')[:10]
+            )
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return resultados, statistics.median(tempos)
@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-18 02:30
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veiculo', '0005_alter_veiculo_options_veiculo_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='veiculo',
+            options={'ordering': ['-created_at'], 'permissions': [('can_view_detailed_info', 'Pode visualizar informações detalhadas'), ('can_export_veiculos', 'Pode exportar lista de veículos')], 'verbose_name': 'Veículo', 'verbose_name_plural': 'Veículos'},
+        ),
+        migrations.RenameIndex(
+            model_name='veiculo',
+            new_name='veiculo_marca_modelo_idx',
+            old_name='veiculo_vei_marca_1ae9aa_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='veiculo',
+            new_name='veiculo_ano_idx',
+            old_name='veiculo_vei_ano_74ceff_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='veiculo',
+            new_name='veiculo_created_at_idx',
+            old_name='veiculo_vei_created_5d1d54_idx',
+        ),
+        migrations.AddField(
+            model_name='veiculo',
+            name='chassi',
+            field=models.CharField(blank=True, help_text='Número do chassi do veículo', max_length=17, null=True, unique=True, validators=[django.core.validators.RegexValidator(code='invalid_chassi', message='Chassi inválido. Deve conter 17 caracteres alfanuméricos (sem I, O, Q)', regex='^[A-HJ-NPR-Z0-9]{17}$')], verbose_name='Chassi'),
+        ),
+        migrations.AddField(
+            model_name='veiculo',
+            name='placa',
+            field=models.CharField(blank=True, help_text='Placa do veículo (formato: AAA-0000 ou AAA0A00)', max_length=8, null=True, validators=[django.core.validators.RegexValidator(code='invalid_plate', message='Placa inválida. Use o formato AAA-0000 ou AAA0A00', regex='^[A-Z]{3}[\\-]?[0-9][0-9A-Z][0-9]{2}$')], verbose_name='Placa'),
+        ),
+        migrations.AlterField(
+            model_name='veiculo',
+            name='ano',
+            field=models.IntegerField(db_index=True, help_text='Ano de fabricação do veículo', validators=[django.core.validators.MinValueValidator(1900, message='O ano não pode ser anterior a 1900'), django.core.validators.MaxValueValidator(2027, message='O ano não pode ser futuro')], verbose_name='Ano'),
+        ),
+        migrations.AlterField(
+            model_name='veiculo',
+            name='combustivel',
+            field=models.SmallIntegerField(choices=[(1, 'ETANOL'), (2, 'DIESEL'), (3, 'FLEX'), (4, 'GASOLINA'), (5, 'GNV'), (6, 'ELÉTRICO'), (7, 'HÍBRIDO'), (8, 'BIOCOMBUSTÍVEL')], db_index=True, help_text='Selecione o tipo de combustível', verbose_name='Combustível'),
+        ),
+        migrations.AlterField(
+            model_name='veiculo',
+            name='marca',
+            field=models.SmallIntegerField(choices=[(1, 'AUDI'), (2, 'BMW'), (3, 'CHEVROLET - GM'), (4, 'FERRARI'), (5, 'FIAT'), (6, 'FORD'), (7, 'HONDA'), (8, 'HYUNDAI'), (9, 'VOLKSWAGEN'), (10, 'JAGUAR'), (11, 'JEEP'), (12, 'KIA'), (13, 'MERCEDES-BENZ'), (14, 'NISSAN'), (15, 'PEUGEOT'), (16, 'RENAULT'), (17, 'SUZUKI'), (18, 'TOYOTA'), (19, 'VOLVO'), (20, 'BYD')], db_index=True, help_text='Selecione a marca do veículo', verbose_name='Marca'),
+        ),
+        migrations.AlterField(
+            model_name='veiculo',
+            name='modelo',
+            field=models.CharField(db_index=True, help_text='Digite o modelo do veículo', max_length=100, verbose_name='Modelo'),
+        ),
+        migrations.AlterField(
+            model_name='veiculo',
+            name='quilometragem',
+            field=models.PositiveIntegerField(default=0, help_text='Quilometragem atual do veículo', validators=[django.core.validators.MinValueValidator(0, message='A quilometragem não pode ser negativa')], verbose_name='Quilometragem'),
+        ),
+        migrations.AddIndex(
+            model_name='veiculo',
+            index=models.Index(fields=['combustivel'], name='veiculo_combustivel_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 02:41
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação, e evita travar
+    # a escrita na tabela de veículos enquanto o índice é construído.
+    atomic = False
+
+    dependencies = [
+        ('veiculo', '0006_alter_veiculo_options_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='veiculo',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('modelo'), name='gin_trgm_ops'), name='veiculo_modelo_trgm_idx'),
+        ),
+    ]
@@ -1,8 +1,28 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from veiculo.consts import OPCOES_MARCAS, OPCOES_CORES, OPCOES_COMBUSTIVEIS
+from veiculo.imagens import VariantesFoto
+
+
+def categoria_por_idade(anos):
+    """
+    Retorna a categoria de um veículo com a idade informada
+
+    Returns:
+        str: Categoria do veículo (Novo, Seminovo, Usado, Antigo)
+    """
+    if anos == 0:
+        return _("Novo")
+    elif anos <= 3:
+        return _("Seminovo")
+    elif anos <= 10:
+        return _("Usado")
+    else:
+        return _("Antigo")
 
 
 class Veiculo(models.Model):
@@ -85,6 +105,13 @@ class Veiculo(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Criado em"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Atualizado em"))
 
+    @property
+    def foto_variantes(self):
+        """
+        Retorna as URLs das miniaturas da foto (``srcset``), ou None sem foto
+        """
+        return VariantesFoto(self.foto) if self.foto else None
+
     def __str__(self):
         return f'{self.get_marca_display()} {self.modelo} ({self.ano}) - {self.get_cor_display()}'
 
@@ -125,15 +152,7 @@ class Veiculo(models.Model):
         Returns:
             str: Categoria do veículo (Novo, Seminovo, Usado, Antigo)
         """
-        anos = self.anos_de_uso()
-        if anos == 0:
-            return _("Novo")
-        elif anos <= 3:
-            return _("Seminovo")
-        elif anos <= 10:
-            return _("Usado")
-        else:
-            return _("Antigo")
+        return categoria_por_idade(self.anos_de_uso())
             
     @property
     def ficha_completa(self):
@@ -162,6 +181,8 @@ class Veiculo(models.Model):
             models.Index(fields=['ano'], name='veiculo_ano_idx'),
             models.Index(fields=['combustivel'], name='veiculo_combustivel_idx'),
             models.Index(fields=['created_at'], name='veiculo_created_at_idx'),
+            # Busca por trecho e por similaridade do modelo (veiculo.busca)
+            GinIndex(OpClass(Upper('modelo'), name='gin_trgm_ops'), name='veiculo_modelo_trgm_idx'),
         ]
         permissions = [
             ('can_view_detailed_info', _('Pode visualizar informações detalhadas')),
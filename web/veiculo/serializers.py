@@ -1,17 +1,85 @@
 # -*- coding: utf-8 -*-
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
 from rest_framework import serializers
-from veiculo.models import Veiculo
+from sistema.projecao import Calculado
+from veiculo.catalogo import COMBUSTIVEIS, CORES, MARCAS
+from veiculo.imagens import VariantesFoto
+from veiculo.models import Veiculo, categoria_por_idade
+
+
+class CampoRotulo(serializers.ReadOnlyField):
+    """
+    Rótulo de uma opção, lido do catálogo em vez de ``get_*_display``
+    """
+    def __init__(self, catalogo, **kwargs):
+        self.catalogo = catalogo
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.catalogo.rotulo(value)
+
 
 class SerializadorVeiculo(serializers.ModelSerializer):
     """ 
     Serializador para o objeto Veiculo
     """
-    marca_display = serializers.CharField(source='get_marca_display', read_only=True)
-    cor_display = serializers.CharField(source='get_cor_display', read_only=True)
-    combustivel_display = serializers.CharField(source='get_combustivel_display', read_only=True)
+    marca_display = CampoRotulo(MARCAS, source='marca')
+    cor_display = CampoRotulo(CORES, source='cor')
+    combustivel_display = CampoRotulo(COMBUSTIVEIS, source='combustivel')
     categoria = serializers.CharField(source='categoria_idade', read_only=True)
     tempo_uso = serializers.IntegerField(source='anos_de_uso', read_only=True)
+    foto_variantes = serializers.SerializerMethodField()
     
     class Meta:
         model = Veiculo
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    # Campos calculados na listagem por projeção (sistema.projecao)
+    calculados_projecao = {
+        'categoria': Calculado(('ano',), lambda contexto: categoria_projecao()),
+        'tempo_uso': Calculado(('ano',), lambda contexto: lambda ano: timezone.now().year - ano),
+        'foto_variantes': Calculado(('foto',), lambda contexto: variantes_projecao(contexto)),
+    }
+
+    def get_foto_variantes(self, obj):
+        """
+        URLs das miniaturas da foto: ``miniatura`` e os ``srcset`` em JPEG e WebP
+        """
+        variantes = obj.foto_variantes
+        if variantes is None:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return variantes.como_dict()
+        return variantes.como_dict(request.build_absolute_uri)
+
+
+def categoria_projecao():
+    """
+    Equivalente a ``categoria_idade``, traduzindo cada categoria uma única vez
+    """
+    rotulos = {}
+
+    def categoria(ano):
+        anos = timezone.now().year - ano
+        rotulo = rotulos.get(anos)
+        if rotulo is None:
+            rotulo = rotulos[anos] = str(categoria_por_idade(anos))
+        return rotulo
+    return categoria
+
+
+def variantes_projecao(contexto):
+    """
+    Equivalente a ``get_foto_variantes`` a partir do nome da foto
+    """
+    campo = Veiculo._meta.get_field('foto')
+    request = contexto.get('request')
+    absoluta = request.build_absolute_uri if request is not None else None
+
+    def variantes(nome):
+        if not nome:
+            return None
+        return VariantesFoto(FieldFile(None, campo, nome)).como_dict(absoluta)
+    return variantes
@@ -0,0 +1,55 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from veiculo.imagens import gerar_variantes, remover_variantes
+from veiculo.models import Veiculo
+
+logger = logging.getLogger('veiculo')
+
+# Enviado por veiculo.importacao após gravar um arquivo (a gravação não passa
+# pelo save() e não dispara post_save), dentro da transação da importação.
+# Argumentos: ``inseridos`` (quantidade) e ``atualizados`` (ids dos veículos)
+veiculos_importados = Signal()
+
+
+def _nome_foto(instance):
+    # Lido do __dict__ para não carregar o campo quando ele foi adiado (defer)
+    valor = instance.__dict__.get('foto')
+    return getattr(valor, 'name', valor) or ''
+
+
+@receiver(post_init, sender=Veiculo)
+def guardar_foto_original(sender, instance, **kwargs):
+    instance._foto_original = _nome_foto(instance)
+
+
+@receiver(post_save, sender=Veiculo)
+def atualizar_variantes_foto(sender, instance, raw=False, **kwargs):
+    """
+    Gera as miniaturas de uma foto nova e remove as da foto substituída
+    """
+    nova, antiga = _nome_foto(instance), instance._foto_original
+    if raw or nova == antiga:
+        return
+    instance._foto_original = nova
+
+    def processar():
+        try:
+            if antiga:
+                remover_variantes(antiga)
+            if nova:
+                gerar_variantes(nova)
+        except Exception:
+            logger.exception('Falha ao gerar as variantes da foto %s', nova)
+
+    transaction.on_commit(processar)
+
+
+@receiver(post_delete, sender=Veiculo)
+def remover_variantes_foto(sender, instance, **kwargs):
+    nome = _nome_foto(instance)
+    if nome:
+        transaction.on_commit(lambda: remover_variantes(nome))
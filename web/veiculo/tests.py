@@ -1,9 +1,28 @@
-from django.contrib.auth.models import User
-from django.test import TestCase, Client
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from veiculo.catalogo import COMBUSTIVEIS, MARCAS
 from veiculo.models import Veiculo
+from veiculo.serializers import SerializadorVeiculo
 from veiculo.forms import FormularioVeiculo
+from veiculo.entrega import janela_atual, url_foto
+from veiculo.imagens import FORMATOS, LARGURAS, nome_variante, variantes_pendentes
+from veiculo.importacao import importar_veiculos, validar_linha
+from anuncio.models import Anuncio, AnuncioSimilar
 
 
 class TestesModelVeiculo(TestCase):
@@ -33,7 +52,7 @@ class TestesViewListarVeiculos(TestCase):
             password='teste123',
         )
         self.client.force_login(self.user)
-        self.url = reverse('listar-veiculos')
+        self.url = reverse('veiculo:listar-veiculos')
         Veiculo(marca=1, modelo='ABCDE', ano=2002, cor=1, combustivel=1).save()
 
     def test_get(self):
@@ -41,6 +60,20 @@ class TestesViewListarVeiculos(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['veiculos']), 1)
 
+    def test_cartoes_em_cache(self):
+        primeira = self.client.get(self.url)
+        Veiculo.objects.update(modelo='FGHIJ')
+        self.assertContains(self.client.get(self.url), 'ABCDE')
+        veiculo = Veiculo.objects.get()
+        veiculo.save()
+        self.assertContains(self.client.get(self.url), 'FGHIJ')
+        self.assertEqual(primeira.context['variacao_cartoes'], '')
+
+    @override_settings(VEICULO_FOTOS_ASSINADAS=True)
+    def test_cartoes_mudam_com_a_janela_das_fotos(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['variacao_cartoes'], janela_atual())
+
 
 class TestesViewCriarVeiculos(TestCase):
     def setUp(self):
@@ -49,7 +82,7 @@ class TestesViewCriarVeiculos(TestCase):
             password='teste123',
         )
         self.client.force_login(self.user)
-        self.url = reverse('criar-veiculo')
+        self.url = reverse('veiculo:criar-veiculo')
 
     def test_get(self):
         response = self.client.get(self.url)
@@ -62,11 +95,12 @@ class TestesViewCriarVeiculos(TestCase):
             'modelo': 'Celta',
             'ano': 2002,
             'cor': 1,
-            'combustivel': 1
+            'combustivel': 1,
+            'quilometragem': 0
         }
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, 302)
-        self.assertRedirects(response, reverse('listar-veiculos'))
+        self.assertRedirects(response, reverse('veiculo:listar-veiculos'))
         self.assertEqual(Veiculo.objects.count(), 1)
         self.assertEqual(Veiculo.objects.first().modelo, 'Celta')
 
@@ -81,7 +115,10 @@ class TestesViewEditarVeiculos(TestCase):
         self.instancia = Veiculo.objects.create(
             marca=1, modelo='Celta', ano=2002, cor=1, combustivel=1
         )
-        self.url = reverse('editar-veiculo', kwargs={'pk': self.instancia.pk})
+        Anuncio.objects.create(
+            descricao='Celta', preco=Decimal('10000.00'), veiculo=self.instancia, usuario=self.user
+        )
+        self.url = reverse('veiculo:editar-veiculo', kwargs={'pk': self.instancia.pk})
 
     def test_get(self):
         response = self.client.get(self.url)
@@ -97,11 +134,12 @@ class TestesViewEditarVeiculos(TestCase):
             'modelo': 'Celta',
             'ano': 2002,
             'cor': 1,
-            'combustivel': 1
+            'combustivel': 1,
+            'quilometragem': 0
         }
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, 302)
-        self.assertRedirects(response, reverse('listar-veiculos'))
+        self.assertRedirects(response, reverse('veiculo:listar-veiculos'))
         self.assertEqual(Veiculo.objects.count(), 1)
         self.assertEqual(Veiculo.objects.first().modelo, 'Celta')
         self.assertEqual(Veiculo.objects.first().pk, self.instancia.pk)
@@ -117,7 +155,10 @@ class TestesViewDeletarVeiculos(TestCase):
         self.instancia = Veiculo.objects.create(
             marca=1, modelo='Celta', ano=2002, cor=1, combustivel=1
         )
-        self.url = reverse('deletar-veiculo', kwargs={'pk': self.instancia.pk})
+        Anuncio.objects.create(
+            descricao='Celta', preco=Decimal('10000.00'), veiculo=self.instancia, usuario=self.user
+        )
+        self.url = reverse('veiculo:deletar-veiculo', kwargs={'pk': self.instancia.pk})
 
     def test_get(self):
         response = self.client.get(self.url)
@@ -128,5 +169,350 @@ class TestesViewDeletarVeiculos(TestCase):
     def test_post(self):
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 302)
-        self.assertRedirects(response, reverse('listar-veiculos'))
+        self.assertRedirects(response, reverse('veiculo:listar-veiculos'))
         self.assertEqual(Veiculo.objects.count(), 0)
+
+
+class TestesConsultasViewsVeiculo(TestCase):
+    """
+    As views de edição e exclusão buscam o veículo uma única vez por requisição
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.client.force_login(self.user)
+        self.instancia = Veiculo.objects.create(marca=1, modelo='Celta', ano=2002, cor=1, combustivel=1)
+        Anuncio.objects.create(
+            descricao='Celta', preco=Decimal('10000.00'), veiculo=self.instancia, usuario=self.user
+        )
+
+    def test_editar(self):
+        # sessão, usuário, veículo e verificação de dono
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('veiculo:editar-veiculo', kwargs={'pk': self.instancia.pk}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_deletar(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('veiculo:deletar-veiculo', kwargs={'pk': self.instancia.pk}))
+        self.assertEqual(response.status_code, 200)
+
+
+class TestesBuscaVeiculos(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.client.force_login(self.user)
+        self.url = reverse('veiculo:listar-veiculos')
+        self.onix = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        self.onix_plus = Veiculo.objects.create(marca=3, modelo='Onix Plus', ano=2021, cor=1, combustivel=3)
+        self.civic = Veiculo.objects.create(marca=7, modelo='Civic', ano=2019, cor=1, combustivel=3)
+
+    def pesquisar(self, termo):
+        return list(self.client.get(self.url, {'pesquisa': termo}).context['veiculos'])
+
+    def test_trecho_do_modelo(self):
+        self.assertEqual(set(self.pesquisar('nix')), {self.onix, self.onix_plus})
+
+    def test_erro_de_digitacao(self):
+        self.assertEqual(set(self.pesquisar('onyx')), {self.onix, self.onix_plus})
+        self.assertEqual(self.pesquisar('civik'), [self.civic])
+
+    def test_nome_da_marca(self):
+        self.assertEqual(self.pesquisar('honda'), [self.civic])
+
+    def test_combustivel(self):
+        eletrico = Veiculo.objects.create(marca=20, modelo='Dolphin', ano=2024, cor=1, combustivel=6)
+        self.assertEqual(self.pesquisar('eletrico'), [eletrico])
+
+    def test_filtro_por_nome(self):
+        response = self.client.get(self.url, {'marca': 'chev'})
+        self.assertEqual(set(response.context['veiculos']), {self.onix, self.onix_plus})
+
+    def test_api(self):
+        token = Token.objects.create(user=self.user)
+        response = self.client.get(
+            reverse('veiculo:api-listar-veiculos'), {'search': 'onyx'},
+            HTTP_AUTHORIZATION='Token {}'.format(token.key)
+        )
+        self.assertEqual(
+            {veiculo['id'] for veiculo in response.json()['results']}, {self.onix.id, self.onix_plus.id}
+        )
+
+
+class TestesCatalogo(TestCase):
+    def test_busca_por_prefixo_sem_acento(self):
+        self.assertEqual(MARCAS.buscar('chev'), {3})
+        self.assertEqual(MARCAS.buscar('gm'), {3})
+        self.assertEqual(MARCAS.buscar('Chevrolet-GM'), {3})
+        self.assertEqual(MARCAS.buscar('rolet'), set())
+        self.assertEqual(COMBUSTIVEIS.buscar('eletrico'), {6})
+        self.assertEqual(COMBUSTIVEIS.buscar('HÍB'), {7})
+        self.assertEqual(MARCAS.buscar(''), set())
+
+    def test_resolver(self):
+        self.assertEqual(MARCAS.resolver('3'), {3})
+        self.assertEqual(MARCAS.resolver(' mercedes '), {13})
+
+    def test_rotulo(self):
+        self.assertEqual(COMBUSTIVEIS.rotulo(6), 'ELÉTRICO')
+        self.assertEqual(COMBUSTIVEIS.rotulo(99), 99)
+        with self.assertRaises(TypeError):
+            MARCAS.rotulos[99] = 'OUTRA'
+
+    def test_serializador(self):
+        veiculo = Veiculo(marca=3, modelo='Onix', ano=2020, cor=5, combustivel=6)
+        dados = SerializadorVeiculo(veiculo).data
+        self.assertEqual(dados['marca_display'], veiculo.get_marca_display())
+        self.assertEqual(dados['cor_display'], veiculo.get_cor_display())
+        self.assertEqual(dados['combustivel_display'], veiculo.get_combustivel_display())
+
+
+class TestesExportarVeiculos(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='teste123')
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('veiculo:api-exportar-veiculos')
+        self.onix = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=6)
+        Veiculo.objects.create(marca=7, modelo='Civic', ano=2019, cor=1, combustivel=3)
+
+    def exportar(self, **params):
+        return self.client.get(self.url, params, HTTP_AUTHORIZATION='Token {}'.format(self.token.key))
+
+    def test_requer_permissao(self):
+        self.assertEqual(self.exportar().status_code, 403)
+
+    def test_csv_com_filtros(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='can_export_veiculos'))
+        response = self.exportar(marca='chev')
+        conteudo = b''.join(response.streaming_content).decode()
+        linhas = list(csv.DictReader(io.StringIO(conteudo)))
+        self.assertEqual([linha['id'] for linha in linhas], [str(self.onix.id)])
+        self.assertEqual(linhas[0]['combustivel_display'], 'ELÉTRICO')
+
+
+class TestesImportacaoVeiculos(TestCase):
+    CABECALHO = 'marca,modelo,ano,cor,combustivel,quilometragem,placa,chassi\n'
+
+    def importar(self, conteudo, **opcoes):
+        relatorio = io.StringIO()
+        estatisticas = importar_veiculos(io.StringIO(self.CABECALHO + conteudo), relatorio, **opcoes)
+        relatorio.seek(0)
+        return estatisticas, list(csv.DictReader(relatorio))
+
+    def test_insere_e_atualiza_pelo_chassi(self):
+        existente = Veiculo.objects.create(
+            marca=5, modelo='Uno', ano=2015, cor=1, combustivel=3, chassi='9BWZZZ377VT004251'
+        )
+        estatisticas, erros = self.importar(
+            'Fiat,Uno Way,2016,Preto,Flex,50000,abc1d23,9bwzzz377vt004251\n'
+            '3,Onix,2020,1,3,,,\n'
+            'Chevrolet - GM,Onix,2021,Branco,Elétrico,10,,9BWZZZ377VT004252\n'
+            'Chevrolet - GM,Onix Plus,2022,Branco,Elétrico,10,,9BWZZZ377VT004252\n',
+            lote=2
+        )
+        self.assertEqual(erros, [])
+        self.assertEqual(
+            {chave: estatisticas[chave] for chave in ('lidas', 'validas', 'inseridas', 'atualizadas', 'repetidas')},
+            {'lidas': 4, 'validas': 4, 'inseridas': 2, 'atualizadas': 1, 'repetidas': 1}
+        )
+        existente.refresh_from_db()
+        self.assertEqual((existente.modelo, existente.ano, existente.cor, existente.placa), ('Uno Way', 2016, 5, 'ABC1D23'))
+        self.assertEqual(Veiculo.objects.get(chassi='9BWZZZ377VT004252').modelo, 'Onix Plus')
+        self.assertEqual(Veiculo.objects.get(chassi__isnull=True).quilometragem, 0)
+
+    def test_relatorio_de_erros(self):
+        estatisticas, erros = self.importar(
+            'Fiat,Uno,1800,Branco,Flex,0,XX,9BWZZZ377VT00425I\n'
+            'Tesla,,2020,Branco,Flex,0,,\n'
+        )
+        self.assertEqual((estatisticas['validas'], estatisticas['invalidas']), (0, 2))
+        self.assertEqual(
+            [(erro['linha'], erro['campo']) for erro in erros],
+            [('2', 'ano'), ('2', 'placa'), ('2', 'chassi'), ('3', 'marca'), ('3', 'modelo')]
+        )
+        self.assertFalse(Veiculo.objects.exists())
+
+    def test_mesmas_regras_do_formulario(self):
+        chassi = '9BWZZZ377VT00425Q'
+        formulario = FormularioVeiculo(data={
+            'marca': 5, 'modelo': 'Uno', 'ano': 2015, 'cor': 1, 'combustivel': 3,
+            'quilometragem': 0, 'chassi': chassi
+        })
+        self.assertIn('chassi', formulario.errors)
+        _, erros = validar_linha({'marca': '5', 'modelo': 'Uno', 'ano': '2015', 'cor': '1',
+                                  'combustivel': '3', 'chassi': chassi})
+        self.assertEqual(erros, [('chassi', formulario.errors['chassi'][0])])
+
+    def test_duas_importacoes_na_mesma_transacao(self):
+        with transaction.atomic():
+            self.importar('Fiat,Uno,2015,Branco,Flex,0,,\n')
+            estatisticas, _ = self.importar('Fiat,Palio,2012,Branco,Flex,0,,\n')
+        self.assertEqual(estatisticas['inseridas'], 1)
+        self.assertEqual(sorted(Veiculo.objects.values_list('modelo', flat=True)), ['Palio', 'Uno'])
+
+    def test_atualiza_similares(self):
+        user = User.objects.create_user(username='teste', password='teste123')
+        uno = Veiculo.objects.create(marca=5, modelo='Uno', ano=2015, cor=1, combustivel=3, chassi='9BWZZZ377VT004251')
+        onix = Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3)
+        anuncio = Anuncio.objects.create(descricao='Uno', preco=Decimal('40000.00'), veiculo=uno, usuario=user)
+        similar = Anuncio.objects.create(descricao='Onix', preco=Decimal('50000.00'), veiculo=onix, usuario=user)
+        self.assertFalse(AnuncioSimilar.objects.filter(anuncio=anuncio).exists())
+        self.importar('Chevrolet - GM,Onix,2020,Branco,Flex,0,,9BWZZZ377VT004251\n')
+        self.assertTrue(AnuncioSimilar.objects.filter(anuncio=anuncio, similar=similar).exists())
+
+    def test_simular(self):
+        estatisticas, _ = self.importar('Fiat,Uno,2015,Branco,Flex,0,,\n', simular=True)
+        self.assertEqual(estatisticas['inseridas'], 1)
+        self.assertFalse(Veiculo.objects.exists())
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'estoque.csv')
+            with open(caminho, 'w') as arquivo:
+                arquivo.write(self.CABECALHO + 'Fiat,Uno,2015,Branco,Flex,0,,\nFiat,Uno,1800,Branco,Flex,0,,\n')
+            saida = io.StringIO()
+            call_command('importar_veiculos', caminho, stdout=saida)
+            self.assertIn('1 veículo(s) inserido(s)', saida.getvalue())
+            with open(caminho + '.erros.csv') as relatorio:
+                self.assertEqual(len(list(csv.DictReader(relatorio))), 1)
+
+
+class TestesVariantesFoto(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=self.media.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def foto(self, nome='carro.jpg', largura=2000, altura=1000):
+        conteudo = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        Image.new('RGB', (largura, altura), 'red').save(conteudo, 'JPEG', exif=exif)
+        return SimpleUploadedFile(nome, conteudo.getvalue(), content_type='image/jpeg')
+
+    def criar(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Veiculo.objects.create(marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3, **kwargs)
+
+    def test_gera_variantes_sem_exif(self):
+        veiculo = self.criar(foto=self.foto())
+        for largura in LARGURAS:
+            for formato in FORMATOS:
+                with default_storage.open(nome_variante(veiculo.foto.name, largura, formato)) as arquivo:
+                    imagem = Image.open(arquivo)
+                    self.assertEqual(imagem.size, (largura, largura // 2))
+                    self.assertEqual(len(imagem.getexif()), 0)
+        self.assertIn('.320w.webp 320w', veiculo.foto_variantes.webp)
+
+    def test_troca_da_foto_remove_variantes_antigas(self):
+        veiculo = self.criar(foto=self.foto())
+        antiga = nome_variante(veiculo.foto.name, 320, 'jpg')
+        veiculo = Veiculo.objects.get(pk=veiculo.pk)
+        veiculo.foto = self.foto('outro.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            veiculo.save()
+        self.assertFalse(default_storage.exists(antiga))
+        self.assertTrue(default_storage.exists(nome_variante(veiculo.foto.name, 320, 'jpg')))
+
+    def test_serializador(self):
+        self.assertIsNone(SerializadorVeiculo(self.criar()).data['foto_variantes'])
+        dados = SerializadorVeiculo(self.criar(foto=self.foto())).data['foto_variantes']
+        self.assertEqual(set(dados), {'miniatura', 'jpg', 'webp'})
+        self.assertTrue(dados['miniatura'].endswith('.640w.jpg'))
+
+    def test_preencher_existentes(self):
+        veiculo = self.criar()
+        Veiculo.objects.filter(pk=veiculo.pk).update(foto=default_storage.save('veiculo/fotos/antiga.jpg', self.foto()))
+        saida = io.StringIO()
+        call_command('gerar_variantes_fotos', '--processos', '2', stdout=saida)
+        self.assertIn('1 foto(s) processada(s)', saida.getvalue())
+        self.assertFalse(variantes_pendentes('veiculo/fotos/antiga.jpg'))
+
+
+class TestesEntregaFoto(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=self.media.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.conteudo = bytes(range(256)) * 4
+        self.nome = default_storage.save('veiculo/fotos/carro.jpg', io.BytesIO(self.conteudo))
+        self.veiculo = Veiculo.objects.create(
+            marca=3, modelo='Onix', ano=2020, cor=1, combustivel=3, foto=self.nome
+        )
+        self.url = url_foto(self.nome)
+
+    def conteudo_resposta(self, response):
+        # Iterar a resposta também consome o corpo assíncrono (API_ASSINCRONA)
+        return b''.join(response)
+
+    def test_url_assinada_sem_login_e_sem_consultas(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.conteudo_resposta(response), self.conteudo)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertTrue(response['Cache-Control'].startswith('private, max-age='))
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_url_estavel_na_janela(self):
+        self.assertEqual(url_foto(self.nome), self.url)
+
+    def test_get_condicional(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_faixa_de_bytes(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(self.conteudo_resposta(response), self.conteudo[10:20])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(self.conteudo_resposta(response), self.conteudo[-4:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        # If-Range com ETag antiga: responde o arquivo inteiro
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"antiga"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_assinatura_invalida_exige_login(self):
+        url = reverse('veiculo:foto-veiculo', args=['carro.jpg'])
+        response = self.client.get(url + '?assinatura=invalida')
+        self.assertEqual(response.status_code, 302)
+        # URL de outro arquivo não vale para este
+        response = self.client.get(url.replace('carro.jpg', 'outro.jpg') + self.url[self.url.index('?'):])
+        self.assertEqual(response.status_code, 302)
+        with override_settings(VEICULO_FOTOS_VALIDADE=-3600):
+            self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_sem_assinatura_com_login(self):
+        self.client.force_login(User.objects.create_user(username='teste', password='teste123'))
+        url = reverse('veiculo:foto-veiculo', args=['carro.jpg'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        response = self.client.get(url.replace('carro.jpg', 'outro.jpg'))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(VEICULO_FOTOS_OFFLOAD='x-accel-redirect', VEICULO_FOTOS_OFFLOAD_PREFIXO='/protegido/')
+    def test_offload_nginx(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protegido/' + self.nome)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(VEICULO_FOTOS_OFFLOAD='x-sendfile')
+    def test_offload_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.nome))
+
+    @override_settings(VEICULO_FOTOS_ASSINADAS=True)
+    def test_variantes_com_urls_assinadas(self):
+        miniatura = self.veiculo.foto_variantes.miniatura
+        self.assertIn('carro.640w.jpg?assinatura=', miniatura)
@@ -1,5 +1,6 @@
 from django.urls import path
-from veiculo.views import ListarVeiculos, FotoVeiculo, CriarVeiculos, EditarVeiculos, DeletarVeiculos, APIListarVeiculos
+from sistema.assincrono import visao
+from veiculo.views import ListarVeiculos, FotoVeiculo, CriarVeiculos, EditarVeiculos, DeletarVeiculos, APIListarVeiculos, APIExportarVeiculos
 
 app_name = 'veiculo'
 
@@ -8,6 +9,7 @@ urlpatterns = [
     path('novo/', CriarVeiculos.as_view(), name='criar-veiculo'),
     path('<int:pk>/', EditarVeiculos.as_view(), name='editar-veiculo'),
     path('deletar/<int:pk>/', DeletarVeiculos.as_view(), name='deletar-veiculo'),
-    path('fotos/<str:arquivo>', FotoVeiculo.as_view(), name='foto-veiculo'),
-    path('api/', APIListarVeiculos.as_view(), name='api-listar-veiculos')
+    path('fotos/<str:arquivo>', visao(FotoVeiculo), name='foto-veiculo'),
+    path('api/', visao(APIListarVeiculos), name='api-listar-veiculos'),
+    path('api/exportar/', APIExportarVeiculos.as_view(), name='api-exportar-veiculos'),
 ]
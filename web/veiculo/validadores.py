@@ -0,0 +1,50 @@
+"""
+Regras de validação de veículos compartilhadas pelo formulário e pela importação.
+"""
+from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+validar_placa = RegexValidator(
+    regex=r'^[A-Z]{3}[\-]?[0-9][0-9A-Z][0-9]{2}$',
+    message=_("Placa inválida. Use o formato AAA-0000 ou AAA0A00"),
+    code='invalid_plate'
+)
+
+
+def validar_ano(ano):
+    """
+    Verifica se o ano está entre 1900 e o próximo ano
+
+    Returns:
+        int: O próprio ano
+    """
+    ano_atual = timezone.now().year
+    if ano and (ano < 1900 or ano > ano_atual + 1):
+        raise ValidationError(
+            _("O ano deve estar entre 1900 e %(ano_max)s."),
+            params={'ano_max': ano_atual + 1}
+        )
+    return ano
+
+
+def validar_chassi(chassi):
+    """
+    Normaliza o chassi (maiúsculas, sem espaços e traços) e verifica o formato
+
+    Returns:
+        str: Chassi normalizado
+    """
+    if chassi:
+        chassi = chassi.upper().replace(' ', '').replace('-', '')
+
+        # Verificar se contém caracteres inválidos (I, O, Q)
+        if any(char in chassi for char in ('I', 'O', 'Q')):
+            raise ValidationError(_("Chassi não pode conter as letras I, O ou Q."))
+
+        # Verificar comprimento
+        if len(chassi) != 17:
+            raise ValidationError(_("Chassi deve ter exatamente 17 caracteres."))
+
+    return chassi
@@ -2,23 +2,36 @@
 from django.shortcuts import render
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View
 from django.db import models
-from django.http import FileResponse, Http404, JsonResponse
-from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
+from django.http import Http404, JsonResponse
+from django.core.exceptions import PermissionDenied
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
 from rest_framework.generics import ListAPIView
-from rest_framework.authentication import TokenAuthentication
 from rest_framework import permissions, filters
 from rest_framework.pagination import PageNumberPagination
 
-from sistema.bibliotecas import LoginObrigatorio
+from sistema.assincrono import APIAssincronaMixin
+from sistema.autenticacao import TokenEmCache
+from sistema.bibliotecas import LoginObrigatorio, ObjetoMemorizado
+from sistema.condicional import RespostaCondicionalMixin
+from sistema.exportacao import ExportacaoMixin, PodeExportar, data_hora_iso
+from sistema.paginacao import PaginacaoCursorMixin
+from sistema.projecao import ListagemProjetadaMixin
+from sistema.roteador import LeituraReplicaMixin
+from sistema.selecao import SelecaoCamposMixin
+from veiculo.busca import BuscaVeiculosFilter, buscar_veiculos
+from veiculo.catalogo import COMBUSTIVEIS, CORES, MARCAS
+from veiculo.entrega import (
+    DIRETORIO_FOTOS, aresponder_foto, assinatura_valida, fotos_assinadas, janela_atual, responder_foto, validade,
+)
 from veiculo.models import Veiculo
 from veiculo.serializers import SerializadorVeiculo
 from veiculo.forms import FormularioVeiculo
 from veiculo.consts import OPCOES_MARCAS, OPCOES_COMBUSTIVEIS
 
 
-class ListarVeiculos(LoginObrigatorio, ListView):
+class ListarVeiculos(LeituraReplicaMixin, LoginObrigatorio, ListView):
     """
     View para listar veículos cadastrados
     """
@@ -33,18 +46,12 @@ class ListarVeiculos(LoginObrigatorio, ListView):
         # Filtro por pesquisa
         pesquisa = self.request.GET.get('pesquisa', '').strip()
         if pesquisa:
-            queryset = queryset.filter(
-                models.Q(modelo__icontains=pesquisa) |
-                models.Q(marca__in=[
-                    choice[0] for choice in OPCOES_MARCAS 
-                    if pesquisa.upper() in choice[1].upper()
-                ])
-            )
+            queryset = buscar_veiculos(queryset, pesquisa)
         
         # Filtro por marca
         marca = self.request.GET.get('marca')
         if marca:
-            queryset = queryset.filter(marca=marca)
+            queryset = queryset.filter(marca__in=MARCAS.resolver(marca))
             
         # Filtro por ano
         ano_min = self.request.GET.get('ano_min')
@@ -57,9 +64,12 @@ class ListarVeiculos(LoginObrigatorio, ListView):
         # Filtro por combustível
         combustivel = self.request.GET.get('combustivel')
         if combustivel:
-            queryset = queryset.filter(combustivel=combustivel)
+            queryset = queryset.filter(combustivel__in=COMBUSTIVEIS.resolver(combustivel))
             
-        return queryset.select_related().order_by('-created_at')
+        queryset = queryset.select_related()
+        if pesquisa:
+            return queryset.order_by('-similaridade', '-created_at')
+        return queryset.order_by('-created_at')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -72,6 +82,8 @@ class ListarVeiculos(LoginObrigatorio, ListView):
             'ano_max': self.request.GET.get('ano_max', ''),
             'combustivel': self.request.GET.get('combustivel', ''),
         }
+        # URLs assinadas das fotos mudam a cada janela, então o cartão também
+        context['variacao_cartoes'] = janela_atual() if fotos_assinadas() else ''
         return context
 
 
@@ -87,8 +99,8 @@ class VeiculoOwnerMixin(UserPassesTestMixin):
         obj = self.get_object()
         return (
             self.request.user.is_staff or
-            self.request.user.has_perm('veiculo.can_view_detailed_info') or
-            obj.anuncios.filter(usuario=self.request.user).exists()
+            obj.anuncios.filter(usuario=self.request.user).exists() or
+            self.request.user.has_perm('veiculo.can_view_detailed_info')
         )
         
     def handle_no_permission(self):
@@ -100,17 +112,65 @@ class VeiculoOwnerMixin(UserPassesTestMixin):
 
 class FotoVeiculo(LoginObrigatorio, View):
     """
-    View para mostrar imagem de um veículo
+    View para mostrar imagem de um veículo (ou uma de suas miniaturas).
+
+    Com uma assinatura válida em ``?assinatura=`` (URLs de ``veiculo.entrega``)
+    o arquivo é entregue sem exigir sessão e sem consultar o banco. Sem ela,
+    exige login e que a foto pertença a um veículo cadastrado.
     """
+    assinada = False
+
+    def dispatch(self, request, *args, **kwargs):
+        if assinatura_valida(kwargs['arquivo'], request.GET.get('assinatura')):
+            self.assinada = True
+            # Pula a verificação de login do LoginObrigatorio
+            return View.dispatch(self, request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
 
     def get(self, request, arquivo):
-        try:
-            veiculo = Veiculo.objects.get(foto='veiculo/fotos/{}'.format(arquivo))
-            return FileResponse(veiculo.foto)
-        except ObjectDoesNotExist:
-            raise Http404("Veículo não encontrado")
-        except Exception as exception:
-            raise exception
+        nome = '{}/{}'.format(DIRETORIO_FOTOS, arquivo)
+        if self.assinada:
+            cache_control = 'private, max-age={}'.format(validade())
+        else:
+            if not Veiculo.objects.filter(foto=nome).exists():
+                raise Http404("Veículo não encontrado")
+            # Revalida a cada uso (com ETag), pois o acesso depende da sessão
+            cache_control = 'private, no-cache'
+        resposta = responder_foto(request, nome, cache_control)
+        if resposta is None:
+            raise Http404("Foto não encontrada")
+        return resposta
+
+    @classmethod
+    def as_view_assincrona(cls, **initkwargs):
+        return FotoVeiculoAssincrona.as_view(**initkwargs)
+
+
+class FotoVeiculoAssincrona(FotoVeiculo):
+    """
+    Versão assíncrona de ``FotoVeiculo`` (``API_ASSINCRONA``): o usuário e o
+    veículo são consultados com o ORM assíncrono e o arquivo é lido fora do
+    loop de eventos
+    """
+    def dispatch(self, request, *args, **kwargs):
+        # O login é verificado em get(), com request.auser()
+        return View.dispatch(self, request, *args, **kwargs)
+
+    async def get(self, request, arquivo):
+        nome = '{}/{}'.format(DIRETORIO_FOTOS, arquivo)
+        if assinatura_valida(arquivo, request.GET.get('assinatura')):
+            cache_control = 'private, max-age={}'.format(validade())
+        else:
+            usuario = await request.auser()
+            if not usuario.is_authenticated:
+                return redirect_to_login(request.get_full_path(), self.get_login_url(), self.get_redirect_field_name())
+            if not await Veiculo.objects.filter(foto=nome).aexists():
+                raise Http404("Veículo não encontrado")
+            cache_control = 'private, no-cache'
+        resposta = await aresponder_foto(request, nome, cache_control)
+        if resposta is None:
+            raise Http404("Foto não encontrada")
+        return resposta
 
 
 class CriarVeiculos(LoginObrigatorio, CreateView):
@@ -123,7 +183,7 @@ class CriarVeiculos(LoginObrigatorio, CreateView):
     success_url = reverse_lazy('veiculo:listar-veiculos')
 
 
-class EditarVeiculos(LoginObrigatorio, VeiculoOwnerMixin, UpdateView):
+class EditarVeiculos(LoginObrigatorio, VeiculoOwnerMixin, ObjetoMemorizado, UpdateView):
     """
     View para editar veículos já cadastrados.
     """
@@ -133,7 +193,7 @@ class EditarVeiculos(LoginObrigatorio, VeiculoOwnerMixin, UpdateView):
     success_url = reverse_lazy('veiculo:listar-veiculos')
 
 
-class DeletarVeiculos(LoginObrigatorio, VeiculoOwnerMixin, DeleteView):
+class DeletarVeiculos(LoginObrigatorio, VeiculoOwnerMixin, ObjetoMemorizado, DeleteView):
     """
     View para deletar veículos.
     """
@@ -142,29 +202,41 @@ class DeletarVeiculos(LoginObrigatorio, VeiculoOwnerMixin, DeleteView):
     success_url = reverse_lazy('veiculo:listar-veiculos')
 
 
-class VeiculoApiPagination(PageNumberPagination):
+class VeiculoApiPagination(PaginacaoCursorMixin, PageNumberPagination):
     """
     Configuração de paginação para API de Veículos
+
+    Aceita ``?paginacao=cursor`` para paginação por cursor, sem contagem.
     """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 50
+    ordenacoes_cursor = {
+        '': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+    }
 
 
-class APIListarVeiculos(ListAPIView):
+class APIListarVeiculos(
+    LeituraReplicaMixin, RespostaCondicionalMixin, SelecaoCamposMixin, ListagemProjetadaMixin, APIAssincronaMixin,
+    ListAPIView
+):
     """
     API endpoint que permite listar veículos
     
     * Requer autenticação por token
-    * Suporta filtragem por marca, ano e combustível
+    * Suporta filtragem por marca, ano e combustível (código ou nome, como ``?marca=chev``)
+    * Suporta busca por modelo tolerante a erros de digitação (``search``)
     * Suporta ordenação por ano, marca
+    * Aceita ``fields`` (ver ``sistema.selecao``)
+    * Responde 304 para ``If-None-Match`` (ver ``sistema.condicional``)
     """
     serializer_class = SerializadorVeiculo
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenEmCache]
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = VeiculoApiPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['modelo']
+    filter_backends = [filters.OrderingFilter, BuscaVeiculosFilter]
     ordering_fields = ['ano', 'quilometragem', 'marca']
     ordering = ['-created_at']
 
@@ -174,7 +246,7 @@ class APIListarVeiculos(ListAPIView):
         # Filtro por marca
         marca = self.request.query_params.get('marca')
         if marca:
-            queryset = queryset.filter(marca=marca)
+            queryset = queryset.filter(marca__in=MARCAS.resolver(marca))
             
         # Filtro por ano
         ano = self.request.query_params.get('ano')
@@ -184,6 +256,34 @@ class APIListarVeiculos(ListAPIView):
         # Filtro por combustível
         combustivel = self.request.query_params.get('combustivel')
         if combustivel:
-            queryset = queryset.filter(combustivel=combustivel)
+            queryset = queryset.filter(combustivel__in=COMBUSTIVEIS.resolver(combustivel))
             
         return queryset
+
+
+class APIExportarVeiculos(ExportacaoMixin, APIListarVeiculos):
+    """
+    API endpoint que exporta os veículos em CSV ou NDJSON (``?formato=``)
+
+    * Requer autenticação por token e a permissão ``can_export_veiculos``
+    * Aceita os mesmos filtros, busca e ordenação da listagem
+    """
+    permission_classes = [permissions.IsAuthenticated, PodeExportar]
+    permissao_exportacao = 'veiculo.can_export_veiculos'
+    nome_exportacao = 'veiculos'
+    colunas_exportacao = (
+        ('id', 'id'),
+        ('marca', 'marca'),
+        ('marca_display', 'marca', MARCAS.rotulo),
+        ('modelo', 'modelo'),
+        ('ano', 'ano'),
+        ('cor', 'cor'),
+        ('cor_display', 'cor', CORES.rotulo),
+        ('combustivel', 'combustivel'),
+        ('combustivel_display', 'combustivel', COMBUSTIVEIS.rotulo),
+        ('quilometragem', 'quilometragem'),
+        ('placa', 'placa'),
+        ('chassi', 'chassi'),
+        ('created_at', data_hora_iso('created_at')),
+        ('updated_at', data_hora_iso('updated_at')),
+    )